@@ -0,0 +1,27 @@
+from django.contrib import admin
+from .models import SpendRollup, ApprovalCycleRollup
+
+
+@admin.register(SpendRollup)
+class SpendRollupAdmin(admin.ModelAdmin):
+    list_display = ('dimension', 'key', 'label', 'status', 'request_count', 'total_amount', 'updated_at')
+    list_filter = ('dimension', 'status')
+    search_fields = ('key', 'label')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ApprovalCycleRollup)
+class ApprovalCycleRollupAdmin(admin.ModelAdmin):
+    list_display = ('level', 'month', 'decisions', 'total_seconds', 'max_seconds', 'updated_at')
+    list_filter = ('level',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
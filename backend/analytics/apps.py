@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class AnalyticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'analytics'
+
+    def ready(self):
+        # Keep the rollup tables in sync with WorkflowEngine
+        from . import receivers  # noqa: F401
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import AnalyticsRollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the analytics rollup tables from purchase requests and approval steps. "
+        "Run after bulk loads or admin edits that bypass the workflow."
+    )
+
+    def handle(self, *args, **options):
+        spend_rows, cycle_rows = AnalyticsRollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {spend_rows} spend rollup rows and {cycle_rows} cycle-time rows."
+        ))
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApprovalCycleRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('month', models.CharField(max_length=7)),
+                ('decisions', models.IntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('max_seconds', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['level', 'month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SpendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('vendor', 'Vendor'), ('requester', 'Requester'), ('month', 'Month'), ('status', 'Status')], max_length=20)),
+                ('key', models.CharField(max_length=255)),
+                ('label', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(max_length=20)),
+                ('request_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='approvalcyclerollup',
+            constraint=models.UniqueConstraint(fields=('level', 'month'), name='cycle_rollup_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='spendrollup',
+            index=models.Index(fields=['dimension', 'status', '-total_amount'], name='spend_rollup_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='spendrollup',
+            constraint=models.UniqueConstraint(fields=('dimension', 'key', 'status'), name='spend_rollup_unique'),
+        ),
+    ]
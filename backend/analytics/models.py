@@ -0,0 +1,60 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SpendRollup(models.Model):
+    """
+    Pre-aggregated request count and amount per (dimension, key, status).
+    Maintained incrementally from WorkflowEngine signals, so reports read
+    a handful of rows instead of scanning purchase requests.
+    """
+    class Dimension(models.TextChoices):
+        VENDOR = 'vendor', _('Vendor')
+        REQUESTER = 'requester', _('Requester')
+        MONTH = 'month', _('Month')
+        STATUS = 'status', _('Status')
+
+    dimension = models.CharField(max_length=20, choices=Dimension.choices)
+    # Vendor name, requester id, 'YYYY-MM' of submission, or the status itself
+    key = models.CharField(max_length=255)
+    # Display name (requester username); empty for the other dimensions
+    label = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20)
+    request_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key', 'status'], name='spend_rollup_unique'),
+        ]
+        indexes = [
+            # Top-N per dimension and status
+            models.Index(fields=['dimension', 'status', '-total_amount'], name='spend_rollup_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.key} [{self.status}]: {self.total_amount}"
+
+
+class ApprovalCycleRollup(models.Model):
+    """
+    Review turnaround per approval level and month of review. A level's
+    cycle time runs from the previous level's review (or submission, for
+    the first level) to its own review. Level 0 is submission to final decision.
+    """
+    level = models.PositiveSmallIntegerField()
+    month = models.CharField(max_length=7)
+    decisions = models.IntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    max_seconds = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['level', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['level', 'month'], name='cycle_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"L{self.level} {self.month}: {self.decisions} decisions"
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from procurement.models import PurchaseRequest
+from procurement.signals import (
+    request_created, request_status_changed, request_vendor_changed, approval_steps_reviewed
+)
+from .rollups import AnalyticsRollups, vendor_of
+
+
+@receiver(request_created)
+def add_requests(sender, requests, **kwargs):
+    AnalyticsRollups.apply_spend([AnalyticsRollups.fact_of(request) for request in requests])
+
+
+@receiver(request_status_changed)
+def move_status(sender, request_ids, old_status, new_status, **kwargs):
+    AnalyticsRollups.move_status(request_ids, old_status, new_status)
+
+
+@receiver(request_vendor_changed)
+def move_vendors(sender, changes, **kwargs):
+    AnalyticsRollups.move_vendors(changes)
+
+
+@receiver(approval_steps_reviewed)
+def record_reviews(sender, steps, final, **kwargs):
+    AnalyticsRollups.record_reviews(steps, final)
+
+
+@receiver(post_delete, sender=PurchaseRequest)
+def remove_request(sender, instance, **kwargs):
+    # Labels are only written on insert, so the (possibly deleted) creator is not needed
+    AnalyticsRollups.apply_spend([{
+        'id': instance.id,
+        'status': instance.status,
+        'amount': instance.amount,
+        'created_by_id': instance.created_by_id,
+        'created_at': instance.created_at,
+        'vendor': vendor_of(instance.ai_metadata),
+    }], -1)
@@ -0,0 +1,269 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import CharField, Count, Sum, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from procurement.models import PurchaseRequest, ApprovalStep
+from .models import SpendRollup, ApprovalCycleRollup
+
+# Same fallback the PO renderer prints when extraction found no vendor
+UNKNOWN_VENDOR = 'Unknown Vendor'
+
+Dimension = SpendRollup.Dimension
+
+
+def month_key(value):
+    return timezone.localtime(value).strftime('%Y-%m')
+
+
+def vendor_of(ai_metadata):
+    return (ai_metadata or {}).get('vendor_name') or UNKNOWN_VENDOR
+
+
+def upsert_increments(model, unique_fields, rows, counters, maxima=(), batch_size=100):
+    """
+    Inserts `rows`, or on a unique conflict adds their `counters` to the
+    existing row and keeps the larger of `maxima`. One INSERT ... ON
+    CONFLICT statement per batch (PostgreSQL and SQLite), so the query
+    count does not grow with the number of rollup rows touched, and
+    concurrent writers never lose an increment.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = list(rows[0])
+    fields = [model._meta.get_field(column) for column in columns]
+
+    assignments = [f"{qn(c)} = {table}.{qn(c)} + excluded.{qn(c)}" for c in counters]
+    assignments += [
+        f"{qn(c)} = CASE WHEN excluded.{qn(c)} > {table}.{qn(c)} THEN excluded.{qn(c)} ELSE {table}.{qn(c)} END"
+        for c in maxima
+    ]
+    assignments += [f"{qn(c)} = excluded.{qn(c)}" for c in columns if c == 'updated_at']
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(row[field.name], connection)
+                for row in batch for field in fields
+            ]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({', '.join(qn(c) for c in unique_fields)}) "
+                f"DO UPDATE SET {', '.join(assignments)}",
+                params
+            )
+
+
+class AnalyticsRollups:
+    """
+    Maintains SpendRollup and ApprovalCycleRollup.
+
+    Incremental updates add or subtract a request's contribution with a
+    batched upsert, so concurrent writers never overwrite each other.
+    `rebuild` recomputes everything from the source tables; use it after
+    bulk loads or admin edits that bypass WorkflowEngine.
+    """
+
+    # Fields needed to place a request in every spend dimension
+    FACT_FIELDS = ('id', 'status', 'amount', 'created_by_id', 'created_by__username', 'created_at')
+
+    @staticmethod
+    def facts(request_ids):
+        """Spend facts of the given requests, one dict per request."""
+        return list(
+            PurchaseRequest.objects.filter(id__in=request_ids)
+            .annotate(vendor=Coalesce(KeyTextTransform('vendor_name', 'ai_metadata'), Value(UNKNOWN_VENDOR), output_field=CharField()))
+            .values('vendor', *AnalyticsRollups.FACT_FIELDS)
+        )
+
+    @staticmethod
+    def fact_of(request):
+        """Spend facts of an in-memory request (no query)."""
+        return {
+            'id': request.id,
+            'status': request.status,
+            'amount': request.amount,
+            'created_by_id': request.created_by_id,
+            'created_by__username': request.created_by.username,
+            'created_at': request.created_at,
+            'vendor': vendor_of(request.ai_metadata),
+        }
+
+    @staticmethod
+    def keys(fact, dimensions=Dimension.values):
+        """(dimension, key, label) cells a request contributes to."""
+        cells = {
+            Dimension.VENDOR: (fact['vendor'], ''),
+            Dimension.REQUESTER: (str(fact['created_by_id']), fact.get('created_by__username') or ''),
+            Dimension.MONTH: (month_key(fact['created_at']), ''),
+            Dimension.STATUS: (fact['status'], ''),
+        }
+        return [(dimension, *cells[dimension]) for dimension in dimensions]
+
+    @staticmethod
+    def spend_deltas(facts, sign=1, status=None, dimensions=Dimension.values, deltas=None):
+        """
+        Accumulates the contribution of `facts` (sign=1 adds, sign=-1
+        removes) into {(dimension, key, status): [label, count, amount]}.
+        `status` overrides the facts' status, e.g. to remove a request from
+        the status it just left.
+        """
+        deltas = deltas if deltas is not None else defaultdict(lambda: ['', 0, Decimal('0')])
+        for fact in facts:
+            fact_status = status or fact['status']
+            cell_fact = {**fact, 'status': fact_status}
+            for dimension, key, label in AnalyticsRollups.keys(cell_fact, dimensions):
+                delta = deltas[(dimension, key, fact_status)]
+                delta[0] = label
+                delta[1] += sign
+                delta[2] += sign * Decimal(fact['amount'])
+        return deltas
+
+    @staticmethod
+    def apply_spend(facts, sign=1, status=None, dimensions=Dimension.values):
+        AnalyticsRollups.flush_spend(AnalyticsRollups.spend_deltas(facts, sign, status, dimensions))
+
+    @staticmethod
+    def flush_spend(deltas):
+        now = timezone.now()
+        upsert_increments(SpendRollup, ('dimension', 'key', 'status'), [
+            {
+                'dimension': dimension, 'key': key, 'label': label, 'status': status,
+                'request_count': count, 'total_amount': amount, 'updated_at': now,
+            }
+            for (dimension, key, status), (label, count, amount) in sorted(deltas.items())
+        ], counters=('request_count', 'total_amount'))
+
+    @staticmethod
+    def move_status(request_ids, old_status, new_status):
+        facts = AnalyticsRollups.facts(request_ids)
+        deltas = AnalyticsRollups.spend_deltas(facts, -1, status=old_status)
+        AnalyticsRollups.flush_spend(AnalyticsRollups.spend_deltas(facts, 1, status=new_status, deltas=deltas))
+
+    @staticmethod
+    def move_vendors(changes):
+        """changes: (request_id, old_vendor, new_vendor) tuples, moved with one read and one upsert."""
+        vendors = {request_id: (old_vendor, new_vendor) for request_id, old_vendor, new_vendor in changes}
+        facts = AnalyticsRollups.facts(list(vendors))
+        dimensions = [Dimension.VENDOR]
+        deltas = AnalyticsRollups.spend_deltas(
+            [{**fact, 'vendor': vendors[fact['id']][0] or UNKNOWN_VENDOR} for fact in facts], -1, dimensions=dimensions
+        )
+        AnalyticsRollups.flush_spend(AnalyticsRollups.spend_deltas(
+            [{**fact, 'vendor': vendors[fact['id']][1] or UNKNOWN_VENDOR} for fact in facts], 1,
+            dimensions=dimensions, deltas=deltas
+        ))
+
+    @staticmethod
+    def record_reviews(steps, final):
+        """Adds the cycle times of freshly reviewed steps (and final decisions, as level 0)."""
+        # Reviews of earlier levels; levels the policy skipped have no step
+        earlier = defaultdict(list)
+        if any(step.level > 1 for step in steps):
+            for request_id, level, reviewed_at in ApprovalStep.objects.filter(
+                request_id__in=[step.request_id for step in steps],
+                level__lt=max(step.level for step in steps),
+                reviewed_at__isnull=False,
+            ).values_list('request_id', 'level', 'reviewed_at'):
+                earlier[request_id].append((level, reviewed_at))
+
+        samples = []
+        for step in steps:
+            previous = max(
+                ((level, reviewed_at) for level, reviewed_at in earlier[step.request_id] if level < step.level),
+                default=None
+            )
+            started = previous[1] if previous else step.request.created_at
+            samples.append((step.level, step.reviewed_at, (step.reviewed_at - started).total_seconds()))
+            if final:
+                samples.append((0, step.reviewed_at, (step.reviewed_at - step.request.created_at).total_seconds()))
+        AnalyticsRollups.apply_cycles(samples)
+
+    @staticmethod
+    def apply_cycles(samples):
+        """samples: (level, reviewed_at, seconds) tuples."""
+        deltas = defaultdict(lambda: [0, 0.0, 0.0])
+        for level, reviewed_at, seconds in samples:
+            delta = deltas[(level, month_key(reviewed_at))]
+            delta[0] += 1
+            delta[1] += seconds
+            delta[2] = max(delta[2], seconds)
+
+        now = timezone.now()
+        upsert_increments(ApprovalCycleRollup, ('level', 'month'), [
+            {
+                'level': level, 'month': month, 'decisions': decisions,
+                'total_seconds': total, 'max_seconds': longest, 'updated_at': now,
+            }
+            for (level, month), (decisions, total, longest) in sorted(deltas.items())
+        ], counters=('decisions', 'total_seconds'), maxima=('max_seconds',))
+
+    @staticmethod
+    @transaction.atomic
+    def rebuild():
+        """
+        Recomputes both rollup tables from scratch. Spend is aggregated by
+        the database; cycle times stream over reviewed steps once.
+        Returns (spend rows, cycle rows).
+        """
+        SpendRollup.objects.all().delete()
+        ApprovalCycleRollup.objects.all().delete()
+
+        # 1. Spend: one GROUP BY per dimension
+        requests = PurchaseRequest.objects.annotate(
+            vendor=Coalesce(KeyTextTransform('vendor_name', 'ai_metadata'), Value(UNKNOWN_VENDOR), output_field=CharField()),
+            month=TruncMonth('created_at'),
+        )
+        groupings = {
+            Dimension.VENDOR: ('vendor',),
+            Dimension.REQUESTER: ('created_by_id', 'created_by__username'),
+            Dimension.MONTH: ('month',),
+            Dimension.STATUS: (),
+        }
+        rows = []
+        for dimension, fields in groupings.items():
+            for group in requests.values('status', *fields).annotate(
+                request_count=Count('id'), total_amount=Sum('amount')
+            ).order_by():
+                if dimension == Dimension.VENDOR:
+                    key, label = group['vendor'], ''
+                elif dimension == Dimension.REQUESTER:
+                    key, label = str(group['created_by_id']), group['created_by__username']
+                elif dimension == Dimension.MONTH:
+                    key, label = group['month'].strftime('%Y-%m'), ''
+                else:
+                    key, label = group['status'], ''
+                rows.append(SpendRollup(
+                    dimension=dimension, key=key, label=label, status=group['status'],
+                    request_count=group['request_count'], total_amount=group['total_amount'],
+                ))
+        SpendRollup.objects.bulk_create(rows, batch_size=1000)
+
+        # 2. Cycle times: steps in (request, level) order carry the previous review forward
+        samples = []
+        current_request, stage_start = None, None
+        steps = ApprovalStep.objects.filter(reviewed_at__isnull=False).order_by('request_id', 'level').values_list(
+            'request_id', 'level', 'status', 'reviewed_at', 'request__created_at', 'request__status'
+        )
+        decided = {}
+        for request_id, level, status, reviewed_at, created_at, request_status in steps.iterator(chunk_size=5000):
+            if request_id != current_request:
+                current_request, stage_start = request_id, created_at
+            samples.append((level, reviewed_at, (reviewed_at - stage_start).total_seconds()))
+            stage_start = reviewed_at
+            if request_status != PurchaseRequest.Status.PENDING:
+                # The last reviewed step of a decided request is its decision
+                decided[request_id] = (reviewed_at, (reviewed_at - created_at).total_seconds())
+        samples.extend((0, reviewed_at, seconds) for reviewed_at, seconds in decided.values())
+        AnalyticsRollups.apply_cycles(samples)
+
+        return SpendRollup.objects.count(), ApprovalCycleRollup.objects.count()
@@ -0,0 +1,24 @@
+from rest_framework import serializers
+from .models import ApprovalCycleRollup
+
+
+class SpendRowSerializer(serializers.Serializer):
+    key = serializers.CharField()
+    label = serializers.CharField()
+    request_count = serializers.IntegerField()
+    total_amount = serializers.DecimalField(max_digits=16, decimal_places=2)
+
+
+class ApprovalCycleSerializer(serializers.ModelSerializer):
+    average_hours = serializers.SerializerMethodField()
+    max_hours = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ApprovalCycleRollup
+        fields = ['level', 'month', 'decisions', 'average_hours', 'max_hours']
+
+    def get_average_hours(self, obj):
+        return round(obj.total_seconds / obj.decisions / 3600, 2) if obj.decisions else None
+
+    def get_max_hours(self, obj):
+        return round(obj.max_seconds / 3600, 2)
@@ -0,0 +1,105 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import User
+from procurement.jobs import JobQueue
+from procurement.utils.ai_processor import DocumentProcessor
+from .models import SpendRollup, ApprovalCycleRollup
+from .rollups import AnalyticsRollups
+
+EXTRACTED = {"vendor_name": "Acme Hardware", "items": []}
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'extraction': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'analytics-tests'},
+})
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.approver_l2 = User.objects.create_user(username='charlie', password='password', role=User.Role.APPROVER_L2)
+        self.finance = User.objects.create_user(username='dave', password='password', role=User.Role.FINANCE)
+
+    def create(self, amount):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post('/api/requests/', {
+            "title": "Rack", "description": "Analytics", "amount": amount,
+            "proforma_file": SimpleUploadedFile("quote.pdf", b"%PDF-1.4 " + str(amount).encode()),
+        }, format='multipart')
+        return response.data['id']
+
+    def review(self, user, request_id, action='approve'):
+        self.client.force_authenticate(user=user)
+        self.client.patch(f'/api/requests/{request_id}/review/', {'action': action}, format='json')
+
+    def spend(self):
+        return {
+            (row.dimension, row.key, row.status): (row.request_count, row.total_amount)
+            for row in SpendRollup.objects.all() if row.request_count
+        }
+
+    def run_workflow(self):
+        with mock.patch.object(DocumentProcessor, '_extract_proforma', return_value=EXTRACTED):
+            approved, rejected, pending = self.create(1000), self.create(250), self.create(40)
+            JobQueue.run_pending()
+        self.review(self.approver_l1, approved)
+        self.review(self.approver_l2, approved)
+        self.review(self.approver_l1, rejected, 'reject')
+        return approved, rejected, pending
+
+    def test_workflow_updates_rollups_incrementally(self):
+        self.run_workflow()
+        spend = self.spend()
+
+        self.assertEqual(spend[('status', 'APPROVED', 'APPROVED')], (1, Decimal('1000.00')))
+        self.assertEqual(spend[('status', 'REJECTED', 'REJECTED')], (1, Decimal('250.00')))
+        self.assertEqual(spend[('vendor', 'Acme Hardware', 'PENDING')], (1, Decimal('40.00')))
+        self.assertEqual(spend[('requester', str(self.staff.id), 'APPROVED')], (1, Decimal('1000.00')))
+        # Extraction moved every request away from the placeholder vendor
+        self.assertNotIn(('vendor', 'Unknown Vendor', 'PENDING'), spend)
+
+        # L1 twice, L2 once, and two final decisions
+        decisions = {row.level: row.decisions for row in ApprovalCycleRollup.objects.all()}
+        self.assertEqual(decisions, {0: 2, 1: 2, 2: 1})
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.run_workflow()
+        incremental = self.spend()
+        cycles = {(row.level, row.month): row.decisions for row in ApprovalCycleRollup.objects.all()}
+
+        AnalyticsRollups.rebuild()
+
+        self.assertEqual(self.spend(), incremental)
+        self.assertEqual({(row.level, row.month): row.decisions for row in ApprovalCycleRollup.objects.all()}, cycles)
+
+    def test_endpoints_are_finance_only(self):
+        self.run_workflow()
+
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get('/api/analytics/spend/').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.finance)
+        response = self.client.get('/api/analytics/spend/', {'by': 'vendor', 'status': 'APPROVED'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['key'], 'Acme Hardware')
+        self.assertEqual(response.data['results'][0]['total_amount'], '1000.00')
+
+        response = self.client.get('/api/analytics/spend/', {'by': 'requester'})
+        self.assertEqual(response.data['results'][0]['label'], 'alice')
+        self.assertEqual(response.data['results'][0]['request_count'], 3)
+
+        response = self.client.get('/api/analytics/cycle-times/', {'level': 0})
+        self.assertEqual(response.data['results'][0]['decisions'], 2)
+
+        self.assertEqual(self.client.get('/api/analytics/spend/', {'by': 'color'}).status_code, status.HTTP_400_BAD_REQUEST)
+        for limit in ('-1', '0', 'ten'):
+            response = self.client.get('/api/analytics/spend/', {'limit': limit})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.client.get('/api/analytics/spend/', {'limit': 1}).data['results']), 1)
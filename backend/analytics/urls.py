@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import SpendView, ApprovalCycleView
+
+urlpatterns = [
+    path('spend/', SpendView.as_view(), name='analytics_spend'),
+    path('cycle-times/', ApprovalCycleView.as_view(), name='analytics_cycle_times'),
+]
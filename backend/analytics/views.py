@@ -0,0 +1,69 @@
+from django.db.models import Sum, Max
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from procurement.models import PurchaseRequest
+from procurement.permissions import IsFinance
+from .models import SpendRollup, ApprovalCycleRollup
+from .serializers import SpendRowSerializer, ApprovalCycleSerializer
+
+MAX_LIMIT = 1000
+
+
+class SpendView(APIView):
+    """
+    Spend per vendor, requester, month or status, read from SpendRollup.
+    Query: ?by=vendor|requester|month|status (default vendor),
+           ?status=APPROVED (default: all statuses), ?limit=100
+    The cost depends on the number of distinct keys, not on the number of requests.
+    """
+    permission_classes = [IsAuthenticated, IsFinance]
+
+    def get(self, request):
+        dimension = request.query_params.get('by', SpendRollup.Dimension.VENDOR)
+        if dimension not in SpendRollup.Dimension.values:
+            return Response(
+                {"detail": f"Invalid 'by'. Use one of: {', '.join(SpendRollup.Dimension.values)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        status_filter = request.query_params.get('status')
+        if status_filter and status_filter not in PurchaseRequest.Status.values:
+            return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = request.query_params.get('limit', '100')
+        if not limit.isdigit() or int(limit) < 1:
+            return Response({"detail": "'limit' must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(int(limit), MAX_LIMIT)
+
+        rows = SpendRollup.objects.filter(dimension=dimension)
+        if status_filter:
+            rows = rows.filter(status=status_filter)
+        rows = rows.values('key').annotate(
+            label=Max('label'), request_count=Sum('request_count'), total_amount=Sum('total_amount')
+        ).filter(request_count__gt=0)
+        # Months read chronologically, everything else biggest spend first
+        rows = rows.order_by('key') if dimension == SpendRollup.Dimension.MONTH else rows.order_by('-total_amount', 'key')
+
+        return Response({
+            "by": dimension,
+            "status": status_filter,
+            "results": SpendRowSerializer(rows[:limit], many=True).data
+        })
+
+
+class ApprovalCycleView(APIView):
+    """
+    Review turnaround per approval level and month, read from ApprovalCycleRollup.
+    Level 0 is submission to final decision. Query: ?level=1
+    """
+    permission_classes = [IsAuthenticated, IsFinance]
+
+    def get(self, request):
+        rows = ApprovalCycleRollup.objects.all()
+        level = request.query_params.get('level')
+        if level is not None:
+            if not level.isdigit():
+                return Response({"detail": "'level' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+            rows = rows.filter(level=int(level))
+        return Response({"results": ApprovalCycleSerializer(rows, many=True).data})
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        # Keep cached token user state in sync with User changes
+        from . import receivers  # noqa: F401
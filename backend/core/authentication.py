@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import ClaimsUser, User
+
+# Claims CustomTokenObtainPairSerializer adds to every token
+USER_CLAIMS = ('username', 'email', 'role')
+
+
+def _cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+class UserStateCache:
+    """
+    Short-lived cache of the fields authentication depends on (claims plus
+    is_active), keyed by user id. Disabled when AUTH_USER_CACHE_TIMEOUT is 0.
+
+    Saves and deletes of a User refresh their entry (core.receivers). The
+    default LocMemCache is per process, so with several workers other
+    processes only notice a change once their entry expires; point
+    CACHES['default'] at a shared cache to make changes visible at once.
+    """
+
+    @staticmethod
+    def enabled():
+        return settings.AUTH_USER_CACHE_TIMEOUT > 0
+
+    @staticmethod
+    def state_of(user):
+        return {
+            'username': user.username, 'email': user.email, 'role': user.role, 'is_active': user.is_active,
+        }
+
+    @staticmethod
+    def get(user_id):
+        """The cached state of a user, loaded on a miss. None if the user does not exist."""
+        state = cache.get(_cache_key(user_id))
+        if state is None:
+            state = User.objects.filter(pk=user_id).values(*USER_CLAIMS, 'is_active').first()
+            if state is None:
+                return None
+            cache.set(_cache_key(user_id), state, settings.AUTH_USER_CACHE_TIMEOUT)
+        return state
+
+    @staticmethod
+    def store(user):
+        if UserStateCache.enabled():
+            cache.set(_cache_key(user.pk), UserStateCache.state_of(user), settings.AUTH_USER_CACHE_TIMEOUT)
+
+    @staticmethod
+    def invalidate(user_id):
+        if UserStateCache.enabled():
+            cache.delete(_cache_key(user_id))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from the token's claims
+    (id, username, email, role) instead of loading the User row.
+
+    With AUTH_USER_CACHE_TIMEOUT > 0 the claims are checked against
+    UserStateCache, so role changes and deactivations apply within the
+    timeout (at once where the cache is shared) at the cost of one query
+    per user per timeout. With 0 the claims are trusted until the token
+    expires and no user query is made at all. Tokens issued without the
+    claims fall back to the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        if UserStateCache.enabled():
+            state = UserStateCache.get(user_id)
+            if state is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        else:
+            state = {claim: validated_token[claim] for claim in USER_CLAIMS}
+            state['is_active'] = True
+
+        if not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return ClaimsUser.from_claims(user_id, *(state[claim] for claim in USER_CLAIMS))
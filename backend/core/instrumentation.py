@@ -0,0 +1,222 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import FileSystemStorage
+from django.db import connections
+
+# Histogram bucket upper bounds (+Inf is implicit)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+LABEL_NAMES = ('view', 'action', 'method')
+
+_current = ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    """
+    A thread-safe Prometheus histogram keyed by label values.
+
+    Values live in this process only; with several gunicorn workers each
+    worker exposes its own series, so scrape every worker or run one.
+    """
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(b), s, c)) for labels, (b, s, c) in self._series.items())
+        for labels, (counts, total, count) in series:
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(LABEL_NAMES, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total!r}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+REQUEST_DURATION = Histogram('p2p_request_duration_seconds', "Wall time per request.", LATENCY_BUCKETS)
+SQL_QUERIES = Histogram('p2p_request_sql_queries', "SQL statements executed per request.", QUERY_BUCKETS)
+SQL_DURATION = Histogram('p2p_request_sql_duration_seconds', "Time spent in SQL per request.", LATENCY_BUCKETS)
+SERIALIZER_DURATION = Histogram(
+    'p2p_request_serializer_duration_seconds', "Time spent in DRF serializers per request.", LATENCY_BUCKETS
+)
+STORAGE_DURATION = Histogram(
+    'p2p_request_storage_duration_seconds', "Time spent in file storage I/O per request.", LATENCY_BUCKETS
+)
+
+HISTOGRAMS = (REQUEST_DURATION, SQL_QUERIES, SQL_DURATION, SERIALIZER_DURATION, STORAGE_DURATION)
+
+
+def render_metrics():
+    """All histograms in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    """Per-request counters filled in while the request is being handled."""
+
+    def __init__(self):
+        self.view = '<unresolved>'
+        self.action = ''
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.times = {'serializer': 0.0, 'storage': 0.0}
+        self.active = set()
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: counts and times every statement."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+
+
+@contextmanager
+def timed(component):
+    """
+    Adds the duration of the block to the current request's `component`
+    time. Nested blocks of the same component are only counted once, and
+    outside an instrumented request this does nothing.
+    """
+    stats = _current.get()
+    if stats is None or component in stats.active:
+        yield
+        return
+
+    stats.active.add(component)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.times[component] += time.perf_counter() - started
+        stats.active.discard(component)
+
+
+class TimedSerializerMixin:
+    """Counts a serializer's to_representation toward the request's serializer time."""
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class InstrumentedFileSystemStorage(FileSystemStorage):
+    """FileSystemStorage that counts opens, saves and deletes toward storage time."""
+
+    def _open(self, name, mode='rb'):
+        with timed('storage'):
+            return super()._open(name, mode)
+
+    def _save(self, name, content):
+        with timed('storage'):
+            return super()._save(name, content)
+
+    def delete(self, name):
+        with timed('storage'):
+            return super().delete(name)
+
+
+class InstrumentationMiddleware:
+    """
+    Opt-in (INSTRUMENTATION_ENABLED) per-request instrumentation.
+
+    Records wall time, SQL count and time, serializer time and storage I/O
+    time per view and DRF action into the histograms served at /metrics,
+    and writes a cProfile dump for INSTRUMENTATION_PROFILE_RATE of requests.
+    Place it first in MIDDLEWARE so the wall time covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        profiler = None
+        if random.random() < settings.INSTRUMENTATION_PROFILE_RATE:
+            profiler = cProfile.Profile()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.sql_wrapper))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        wall = time.perf_counter() - started
+
+        labels = (stats.view, stats.action, request.method)
+        REQUEST_DURATION.observe(labels, wall)
+        SQL_QUERIES.observe(labels, stats.sql_count)
+        SQL_DURATION.observe(labels, stats.sql_time)
+        SERIALIZER_DURATION.observe(labels, stats.times['serializer'])
+        STORAGE_DURATION.observe(labels, stats.times['storage'])
+
+        if profiler is not None:
+            self.dump_profile(profiler, stats)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _current.get()
+        match = request.resolver_match
+        stats.view = match.view_name if match else view_func.__name__
+        # DRF viewsets map HTTP methods to actions ('get' -> 'list')
+        actions = getattr(view_func, 'actions', None) or {}
+        stats.action = actions.get(request.method.lower(), '')
+
+    @staticmethod
+    def dump_profile(profiler, stats):
+        directory = settings.INSTRUMENTATION_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        name = re.sub(r'[^\w.-]+', '_', f"{stats.view}.{stats.action or 'view'}")
+        profiler.dump_stats(os.path.join(directory, f"{name}.{time.time_ns()}.prof"))
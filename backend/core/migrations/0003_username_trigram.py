@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# Supports `created_by__username` in the procurement admin search (PostgreSQL only).
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS "user_username_trgm_idx" ON "core_user" '
+        'USING gin ((UPPER("username"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS "user_username_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_user_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
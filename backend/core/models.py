@@ -24,4 +24,27 @@ class User(AbstractUser):
     )
 
     def __str__(self):
-        return f"{self.username} ({self.get_role_display()})"
\ No newline at end of file
+        return f"{self.username} ({self.get_role_display()})"
+
+class ClaimsUser(User):
+    """
+    A User built from signed JWT claims instead of a database row (see
+    core.authentication). It can be used wherever a User is expected
+    (foreign keys, filters, role checks) but holds only the claimed fields,
+    so it refuses to be saved or deleted.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_claims(cls, user_id, username, email, role):
+        user = cls(id=user_id, username=username, email=email, role=role, is_active=True)
+        user._state.adding = False
+        return user
+
+    def save(self, *args, **kwargs):
+        raise TypeError("ClaimsUser is built from token claims; load the User to modify it.")
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("ClaimsUser is built from token claims; load the User to delete it.")
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import UserStateCache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def refresh_user_state(sender, instance, **kwargs):
+    # Role and is_active changes reach token authentication without waiting for expiry
+    UserStateCache.store(instance)
+
+
+@receiver(post_delete, sender=User)
+def forget_user_state(sender, instance, **kwargs):
+    UserStateCache.invalidate(instance.pk)
@@ -12,8 +12,17 @@ class UserSerializer(serializers.ModelSerializer):
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Customizes the JWT response to include user details (role, username)
-    alongside the access and refresh tokens.
+    alongside the access and refresh tokens, and signs the same details
+    into the tokens for core.authentication.ClaimsJWTAuthentication.
     """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['email'] = user.email
+        token['role'] = user.role
+        return token
+
     def validate(self, attrs):
         data = super().validate(attrs)
         data['username'] = self.user.username
@@ -1,6 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from .instrumentation import render_metrics
 from .serializers import UserSerializer
 
 class UserProfileView(APIView):
@@ -8,4 +13,21 @@ class UserProfileView(APIView):
 
     def get(self, request):
         serializer = UserSerializer(request.user)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint for InstrumentationMiddleware histograms.
+    Scrapers send INSTRUMENTATION_METRICS_TOKEN as a bearer token; without
+    a configured token only signed-in Django staff (the admin) can read it.
+    """
+    if not settings.INSTRUMENTATION_ENABLED:
+        raise Http404
+    token = settings.INSTRUMENTATION_METRICS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -23,9 +23,12 @@ INSTALLED_APPS = [
     'corsheaders',
     'core',
     'procurement',
+    'analytics',
 ]
 
 MIDDLEWARE = [
+    # First so its wall time covers the whole stack; inert unless INSTRUMENTATION_ENABLED
+    'core.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,6 +67,45 @@ DATABASES = {
     )
 }
 
+# Uploads
+# Procurement documents are streamed chunk by chunk to FILE_UPLOAD_TEMP_DIR
+# (see procurement.upload_handlers) and then moved into MEDIA_ROOT. Keep both
+# on the same filesystem so the move is a rename rather than a copy.
+FILE_UPLOAD_TEMP_DIR = os.environ.get('FILE_UPLOAD_TEMP_DIR') or None
+PROCUREMENT_MAX_UPLOAD_SIZE = int(os.environ.get('PROCUREMENT_MAX_UPLOAD_SIZE', 25 * 1024 * 1024))  # bytes
+PROCUREMENT_DOCUMENT_FIELDS = ('proforma_file', 'receipt_file')
+PROCUREMENT_ALLOWED_DOCUMENT_TYPES = ('application/pdf', 'image/png', 'image/jpeg', 'image/tiff')
+
+# Caches
+# 'extraction' holds document extraction results keyed by file SHA-256.
+# It lives on disk so the web and worker processes share it.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'extraction': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('EXTRACTION_CACHE_DIR', str(BASE_DIR / '.cache' / 'extraction')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
+}
+EXTRACTION_CACHE_ALIAS = 'extraction'
+EXTRACTION_CACHE_TIMEOUT = int(os.environ.get('EXTRACTION_CACHE_TIMEOUT', 60 * 60 * 24 * 30))  # 30 days
+# Proforma text extraction: the ProformaExtractor class (part of the cache
+# key) and how long reading one page may take, from when its read starts
+PROFORMA_EXTRACTOR = os.environ.get('PROFORMA_EXTRACTOR', 'procurement.utils.extractors.LocalExtractor')
+EXTRACTION_PAGE_TIMEOUT = int(os.environ.get('EXTRACTION_PAGE_TIMEOUT', 30))  # seconds
+
+# Receipt reconciliation (procurement.utils.reconciliation)
+# Amounts match when they differ by at most max(absolute, relative * expected).
+RECONCILIATION_ABSOLUTE_TOLERANCE = float(os.environ.get('RECONCILIATION_ABSOLUTE_TOLERANCE', 0.50))
+RECONCILIATION_RELATIVE_TOLERANCE = float(os.environ.get('RECONCILIATION_RELATIVE_TOLERANCE', 0.01))
+# Minimum description similarity (0-1) for a receipt line to match a PO line
+RECONCILIATION_MATCH_THRESHOLD = float(os.environ.get('RECONCILIATION_MATCH_THRESHOLD', 0.5))
+RECONCILIATION_BATCH_SIZE = int(os.environ.get('RECONCILIATION_BATCH_SIZE', 200))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -82,6 +124,20 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    # FileSystemStorage that reports its I/O time to the instrumentation middleware
+    'default': {'BACKEND': 'core.instrumentation.InstrumentedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Request instrumentation (core.instrumentation); histograms are served at /metrics
+INSTRUMENTATION_ENABLED = bool(int(os.environ.get('INSTRUMENTATION_ENABLED', 0)))
+# Fraction of requests profiled with cProfile (0.0 - 1.0); dumps go to INSTRUMENTATION_PROFILE_DIR
+INSTRUMENTATION_PROFILE_RATE = float(os.environ.get('INSTRUMENTATION_PROFILE_RATE', 0.0))
+INSTRUMENTATION_PROFILE_DIR = os.environ.get('INSTRUMENTATION_PROFILE_DIR', str(BASE_DIR / '.profiles'))
+# Bearer token required to scrape /metrics; when empty, only Django staff users can read it
+INSTRUMENTATION_METRICS_TOKEN = os.environ.get('INSTRUMENTATION_METRICS_TOKEN', '')
+
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 CSRF_TRUSTED_ORIGINS = ["http://*", "https://*"]
@@ -92,21 +148,80 @@ AUTH_USER_MODEL = 'core.User'
 # REST Framework Config
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+# Default page size for cursor-paginated /api/requests/ (?page_size= overrides, up to 200)
+REQUESTS_PAGE_SIZE = int(os.environ.get('REQUESTS_PAGE_SIZE', 50))
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     "TOKEN_OBTAIN_SERIALIZER": "core.serializers.CustomTokenObtainPairSerializer",
 }
+# How long token authentication may use cached user state (role, is_active)
+# before re-reading it; 0 trusts the token claims until the token expires
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))  # seconds
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# How long a process keeps the compiled approval policy (procurement.policies)
+APPROVAL_POLICY_CACHE_TIMEOUT = int(os.environ.get('APPROVAL_POLICY_CACHE_TIMEOUT', 60))  # seconds
+
+# Maximum number of requests accepted by POST /api/requests/bulk-review/
+BULK_REVIEW_MAX_ITEMS = int(os.environ.get('BULK_REVIEW_MAX_ITEMS', 500))
+
+# Background Job Queue (see `python manage.py run_worker`)
+JOB_QUEUE_CONCURRENCY = int(os.environ.get('JOB_QUEUE_CONCURRENCY', 4))
+JOB_QUEUE_POLL_INTERVAL = float(os.environ.get('JOB_QUEUE_POLL_INTERVAL', 1.0))
+JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get('JOB_QUEUE_MAX_ATTEMPTS', 3))
+JOB_QUEUE_RETRY_BACKOFF = float(os.environ.get('JOB_QUEUE_RETRY_BACKOFF', 5.0))  # seconds, doubled per attempt
+JOB_QUEUE_STALE_AFTER = int(os.environ.get('JOB_QUEUE_STALE_AFTER', 600))  # seconds without a heartbeat before a RUNNING job is reclaimed
+JOB_QUEUE_HEARTBEAT = int(os.environ.get('JOB_QUEUE_HEARTBEAT', 60))  # seconds between heartbeats of RUNNING jobs; keep well below STALE_AFTER
+JOB_QUEUE_PROCESSES = int(os.environ.get('JOB_QUEUE_PROCESSES', 2))  # process pool for CPU-bound work (PO rendering, page extraction)
+PO_RENDER_TIMEOUT = int(os.environ.get('PO_RENDER_TIMEOUT', 60))  # seconds
+# Monthly PO export: rows fetched per database round trip, and the page cap
+# of the combined PDF (ReportLab holds it in memory until saved; ZIP is unbounded)
+PO_EXPORT_CHUNK_SIZE = int(os.environ.get('PO_EXPORT_CHUNK_SIZE', 200))
+PO_EXPORT_MAX_PDF_DOCUMENTS = int(os.environ.get('PO_EXPORT_MAX_PDF_DOCUMENTS', 2000))
+# Finance audit export (`manage.py export_requests`, /api/requests/export/):
+# requests fetched per database round trip, with their approval steps
+AUDIT_EXPORT_CHUNK_SIZE = int(os.environ.get('AUDIT_EXPORT_CHUNK_SIZE', 2000))
+# `manage.py gc_documents` leaves unreferenced files younger than this alone:
+# uploads and renders are stored shortly before the row pointing at them commits
+DOCUMENT_GC_MIN_AGE = int(os.environ.get('DOCUMENT_GC_MIN_AGE', 3600))  # seconds
+# Request imports (`manage.py import_requests`, POST /api/requests/import/):
+# rows validated and inserted per chunk, errors listed in the summary, and
+# the size cap of an uploaded CSV/JSONL file or proforma ZIP
+REQUEST_IMPORT_CHUNK_SIZE = int(os.environ.get('REQUEST_IMPORT_CHUNK_SIZE', 500))
+REQUEST_IMPORT_MAX_ERRORS = int(os.environ.get('REQUEST_IMPORT_MAX_ERRORS', 100))
+REQUEST_IMPORT_MAX_UPLOAD_SIZE = int(os.environ.get('REQUEST_IMPORT_MAX_UPLOAD_SIZE', 4 * 1024 ** 3))  # bytes
+# Duplicate and split-purchase detection (procurement.detection): how far
+# apart (in days) requests may be to count as the same or a split purchase,
+# the estimated line-item similarity that flags a pair, and the requests
+# scanned per chunk by `manage.py detect_duplicates`
+DUPLICATE_WINDOW_DAYS = int(os.environ.get('DUPLICATE_WINDOW_DAYS', 30))
+DUPLICATE_ITEMS_SIMILARITY = float(os.environ.get('DUPLICATE_ITEMS_SIMILARITY', 0.8))
+DUPLICATE_SCAN_CHUNK_SIZE = int(os.environ.get('DUPLICATE_SCAN_CHUNK_SIZE', 1000))
+# Full-text request search (?q=): PostgreSQL text search configuration
+# (stemming and stop words) of the indexed documents and the queries
+REQUEST_SEARCH_CONFIG = os.environ.get('REQUEST_SEARCH_CONFIG', 'english')
+# Server-sent request events (/api/events/, served over ASGI). 'postgres'
+# fans out with LISTEN/NOTIFY across processes (web and worker); 'local'
+# only reaches clients of the publishing process
+EVENTS_BACKEND = os.environ.get(
+    'EVENTS_BACKEND', 'postgres' if DATABASES['default']['ENGINE'].endswith('postgresql') else 'local'
+)
+EVENTS_CHANNEL = os.environ.get('EVENTS_CHANNEL', 'p2p_request_events')
+EVENTS_HEARTBEAT = int(os.environ.get('EVENTS_HEARTBEAT', 15))  # seconds between keep-alive comments
+EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE', 100))  # events buffered per client before a resync
+EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 3000))  # EventSource reconnect delay
+EVENTS_TICKET_TTL = int(os.environ.get('EVENTS_TICKET_TTL', 30))  # seconds a stream ticket stays valid
+
 SWAGGER_SETTINGS = {
    'SECURITY_DEFINITIONS': {
       'Bearer': {
@@ -11,8 +11,8 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
-from procurement.views import PurchaseRequestViewSet
-from core.views import UserProfileView
+from procurement.views import EventTicketView, PurchaseRequestViewSet, request_events
+from core.views import UserProfileView, metrics
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -30,10 +30,14 @@ router.register(r'requests', PurchaseRequestViewSet, basename='requests')
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
+    path('api/analytics/', include('analytics.urls')),
+    path('api/events/', request_events, name='request_events'),
+    path('api/events/ticket/', EventTicketView.as_view(), name='event_ticket'),
     path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/auth/me/', UserProfileView.as_view(), name='user_profile'),
     path('accounts/', include('rest_framework.urls')),
+    path('metrics', metrics, name='metrics'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
 
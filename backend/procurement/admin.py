@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import PurchaseRequest, ApprovalStep
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.utils import timezone
+from .models import PurchaseRequest, ApprovalLevel, ApprovalStep, Job, RequestFlag
+from .search import RequestSearch
 
 class ApprovalStepInline(admin.TabularInline):
     """
@@ -11,21 +15,62 @@ class ApprovalStepInline(admin.TabularInline):
     readonly_fields = ('reviewed_at',)
     can_delete = False
 
+class RequestFlagInline(admin.TabularInline):
+    """
+    Possible duplicates or split purchases found by DuplicateDetector.
+    """
+    model = RequestFlag
+    fk_name = 'request'
+    extra = 0
+    fields = ('kind', 'related', 'score', 'detail', 'created_at')
+    readonly_fields = fields
+    can_delete = False
+
 @admin.register(PurchaseRequest)
 class PurchaseRequestAdmin(admin.ModelAdmin):
-    list_display = ('id', 'title', 'created_by', 'amount', 'status', 'created_at')
-    list_filter = ('status', 'created_at')
+    list_display = ('id', 'title', 'created_by', 'amount', 'status', 'extraction_status', 'po_status', 'created_at')
+    list_filter = ('status', 'extraction_status', 'po_status', 'created_at')
     search_fields = ('title', 'description', 'created_by__username')
     readonly_fields = ('ai_metadata', 'receipt_validation_data', 'purchase_order_doc')
     
-    inlines = [ApprovalStepInline]
+    inlines = [ApprovalStepInline, RequestFlagInline]
     
     actions = ['reset_to_pending']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Also find requests by vendor, invoice number or line item through the full-text index
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term.strip():
+            results |= RequestSearch.matching(queryset, search_term)
+        return results, may_have_duplicates
+
     @admin.action(description='Reset selected requests to PENDING')
     def reset_to_pending(self, request, queryset):
-        """Helper action for testing workflow"""
-        queryset.update(status=PurchaseRequest.Status.PENDING)
+        """
+        Helper action for testing workflow. Deliberately outside the
+        transition table: the requests and all their steps start over.
+        """
+        now = timezone.now()
+        steps = ApprovalStep.objects.filter(request=OuterRef('pk'))
+        with transaction.atomic():
+            ApprovalStep.objects.filter(request__in=queryset).update(
+                status=ApprovalStep.Status.PENDING, approver=None, reviewed_at=None, updated_at=now
+            )
+            # Requests approved on submission have no steps to start over
+            queryset.filter(Exists(steps)).update(
+                status=PurchaseRequest.Status.PENDING,
+                current_level=Subquery(steps.order_by('level').values('level')[:1]),
+                version=F('version') + 1, updated_at=now
+            )
+
+@admin.register(ApprovalLevel)
+class ApprovalLevelAdmin(admin.ModelAdmin):
+    """
+    The approval policy. Changes apply to requests submitted afterwards.
+    """
+    list_display = ('level', 'name', 'approver_role', 'min_amount', 'is_active')
+    list_editable = ('min_amount', 'is_active')
+    ordering = ('level',)
 
 @admin.register(ApprovalStep)
 class ApprovalStepAdmin(admin.ModelAdmin):
@@ -33,4 +78,24 @@ class ApprovalStepAdmin(admin.ModelAdmin):
     Separate view for approval steps if needed for debugging.
     """
     list_display = ('request', 'level', 'approver', 'status', 'reviewed_at')
-    list_filter = ('status', 'level')
\ No newline at end of file
+    list_filter = ('status', 'level')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Steps are part of the request's API representation and validators
+        PurchaseRequest.objects.filter(pk=obj.request_id).update(updated_at=obj.updated_at)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Background job monitoring. Failed jobs can be re-queued from here.
+    """
+    list_display = ('id', 'kind', 'request', 'status', 'attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('last_error', 'started_at', 'finished_at')
+
+    actions = ['requeue']
+
+    @admin.action(description='Re-queue selected jobs')
+    def requeue(self, request, queryset):
+        queryset.update(status=Job.Status.QUEUED, attempts=0, run_after=timezone.now())
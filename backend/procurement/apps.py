@@ -2,4 +2,10 @@ from django.apps import AppConfig
 
 class ProcurementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'procurement'
\ No newline at end of file
+    name = 'procurement'
+
+    def ready(self):
+        # Register background job handlers
+        from . import tasks  # noqa: F401
+        # Reload the approval policy when its levels change
+        from . import receivers  # noqa: F401
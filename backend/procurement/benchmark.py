@@ -0,0 +1,259 @@
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import PurchaseRequest, ApprovalStep
+from .policies import ApprovalPolicy
+from core.models import User
+
+OPERATIONS = ('list', 'create', 'review', 'submit_receipt')
+
+DEFAULT_MIX = {'list': 70, 'create': 10, 'review': 15, 'submit_receipt': 5}
+
+# Smallest bodies the upload handler accepts as a PDF
+PROFORMA_BYTES = b"%PDF-1.4 benchmark proforma"
+RECEIPT_BYTES = b"%PDF-1.4 benchmark receipt"
+
+# Metrics compared against a baseline; lower is better for all of them
+COMPARED_METRICS = ('p95_ms', 'queries_max')
+
+
+def parse_mix(value):
+    """Parses 'list=70,create=10' into {'list': 70, 'create': 10}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}'. Choose from {', '.join(OPERATIONS)}.")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+class Workload:
+    """
+    The shared state of a mixed API workload: who acts, and which requests
+    are still waiting for a review or a receipt. Targets are handed out from
+    deques (pop/append are atomic) so concurrent threads never review the
+    same request twice. Levels and their reviewers come from the current
+    ApprovalPolicy; each pending target carries the levels it still has to
+    pass after the current one.
+    """
+
+    def __init__(self, users, mix=None, limit=10000):
+        self.users = users
+        self.mix = mix or DEFAULT_MIX
+        self.owners = {u.id: u for u in users[User.Role.STAFF]}
+        self.everyone = [u for role_users in users.values() for u in role_users]
+        self.policy = ApprovalPolicy.current()
+        self.reviewers = {
+            level: users[role] for role, level in self.policy.roles.items() if users.get(role)
+        }
+
+        # 1. Pending requests per reviewable level, with the levels left after it
+        owned = PurchaseRequest.objects.filter(created_by__in=list(self.owners))
+        pending = {
+            level: list(owned.filter(
+                status=PurchaseRequest.Status.PENDING, current_level=level
+            ).order_by('-id').values_list('id', 'created_by_id')[:limit])
+            for level in self.reviewers
+        }
+        later = {}
+        for request_id, level in ApprovalStep.objects.filter(
+            request__in=[request_id for rows in pending.values() for request_id, _ in rows],
+            status=ApprovalStep.Status.PENDING
+        ).order_by('level').values_list('request_id', 'level'):
+            later.setdefault(request_id, []).append(level)
+        self.pending = {
+            level: deque(
+                (request_id, owner_id, tuple(step for step in later.get(request_id, ()) if step > level))
+                for request_id, owner_id in rows
+            )
+            for level, rows in pending.items()
+        }
+        self.awaiting_receipt = deque(owned.filter(
+            Q(receipt_file='') | Q(receipt_file__isnull=True),
+            status=PurchaseRequest.Status.APPROVED
+        ).order_by('-id').values_list('id', 'created_by_id')[:limit])
+
+    def pick(self, rng):
+        names = list(self.mix)
+        return rng.choices(names, weights=[self.mix[n] for n in names])[0]
+
+    # Each operation returns (response, expected status), or (None, None) when no target is left
+
+    def list(self, client, rng):
+        user = rng.choice(self.everyone)
+        client.force_authenticate(user=user)
+        params = {}
+        if self.policy.level_of(user.role) is not None and rng.random() < 0.5:
+            params['status'] = PurchaseRequest.Status.PENDING
+        return client.get('/api/requests/', params), 200
+
+    def create(self, client, rng):
+        client.force_authenticate(user=rng.choice(self.users[User.Role.STAFF]))
+        data = {
+            "title": "Benchmark request",
+            "description": "Created by the API benchmark",
+            "amount": rng.randint(10, 5000),
+            "proforma_file": SimpleUploadedFile("quote.pdf", PROFORMA_BYTES, content_type="application/pdf"),
+        }
+        return client.post('/api/requests/', data, format='multipart'), 201
+
+    def review(self, client, rng):
+        if not self.pending:
+            return None, None
+        level = rng.choice(list(self.pending))
+        try:
+            request_id, owner_id, later = self.pending[level].popleft()
+        except IndexError:
+            return None, None
+
+        client.force_authenticate(user=rng.choice(self.reviewers[level]))
+        action = 'approve' if rng.random() < 0.8 else 'reject'
+        response = client.patch(
+            f'/api/requests/{request_id}/review/', {"action": action, "comment": "benchmark"}, format='json'
+        )
+
+        # 1. Feed approved requests to the next stage of the workload
+        if response.status_code == 200 and action == 'approve':
+            if not later:
+                self.awaiting_receipt.append((request_id, owner_id))
+            elif later[0] in self.pending:
+                self.pending[later[0]].append((request_id, owner_id, later[1:]))
+        return response, 200
+
+    def submit_receipt(self, client, rng):
+        try:
+            request_id, owner_id = self.awaiting_receipt.popleft()
+        except IndexError:
+            return None, None
+
+        client.force_authenticate(user=self.owners[owner_id])
+        data = {"receipt_file": SimpleUploadedFile("receipt.pdf", RECEIPT_BYTES, content_type="application/pdf")}
+        return client.post(f'/api/requests/{request_id}/submit-receipt/', data, format='multipart'), 200
+
+
+class BenchmarkRunner:
+    """
+    Replays a Workload in process through the DRF test client and records
+    latency and query count per operation. With more than one thread each
+    thread gets its own client and database connection.
+    """
+
+    def __init__(self, workload, iterations=1000, warmup=50, seed=0):
+        self.workload = workload
+        self.iterations = iterations
+        self.warmup = warmup
+        self.seed = seed
+
+    def run(self, threads=1):
+        """Runs the workload with `threads` concurrent clients. Returns a scenario summary."""
+        # 1. Warm up caches, connections and lazily imported code (not recorded)
+        self._replay(self.warmup, random.Random(self.seed - 1), samples=None)
+
+        # 2. Split the iterations over the threads
+        shares = [self.iterations // threads + (i < self.iterations % threads) for i in range(threads)]
+        samples = [[] for _ in range(threads)]
+
+        started = time.perf_counter()
+        if threads == 1:
+            self._replay(shares[0], random.Random(self.seed), samples[0])
+        else:
+            workers = [
+                threading.Thread(target=self._thread, args=(shares[i], random.Random(self.seed + i), samples[i]))
+                for i in range(threads)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        wall = time.perf_counter() - started
+
+        return summarize([row for rows in samples for row in rows], wall, threads)
+
+    def _thread(self, count, rng, samples):
+        try:
+            self._replay(count, rng, samples)
+        finally:
+            connection.close()
+
+    def _replay(self, count, rng, samples):
+        client = APIClient(raise_request_exception=False)
+        for _ in range(count):
+            name = self.workload.pick(rng)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response, expected = getattr(self.workload, name)(client, rng)
+                elapsed = time.perf_counter() - started
+            if response is None:
+                # Nothing left to review / receipt; not a measurement
+                continue
+            if samples is not None:
+                samples.append((name, elapsed, len(queries), response.status_code == expected))
+
+
+def summarize(samples, wall, threads):
+    """Latency percentiles, query counts and throughput from (op, seconds, queries, ok) samples."""
+    operations = {}
+    for name in OPERATIONS:
+        rows = [row for row in samples if row[0] == name]
+        if not rows:
+            continue
+        latency_ms = np.array([row[1] for row in rows]) * 1000
+        # Failed calls may abort mid-way (or log retried statements), so
+        # query counts describe successful calls only
+        queries = np.array([row[2] for row in rows if row[3]])
+        p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+        operations[name] = {
+            "count": len(rows),
+            "errors": sum(1 for row in rows if not row[3]),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "mean_ms": round(float(latency_ms.mean()), 2),
+            "queries_mean": round(float(queries.mean()), 2) if queries.size else None,
+            "queries_max": int(queries.max()) if queries.size else None,
+        }
+
+    return {
+        "threads": threads,
+        "requests": len(samples),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+        "operations": operations,
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Lists regressions of `report` against `baseline`: a latency metric more
+    than `tolerance` (fractional) above the baseline, or more queries per
+    request than the baseline ever issued.
+    """
+    regressions = []
+    for scenario, current in report['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(scenario)
+        if previous is None:
+            continue
+        for name, metrics in current['operations'].items():
+            before = previous['operations'].get(name)
+            if before is None:
+                continue
+            for metric in COMPARED_METRICS:
+                if metrics[metric] is None or before[metric] is None:
+                    continue
+                allowed = before[metric] if metric.startswith('queries') else before[metric] * (1 + tolerance)
+                if metrics[metric] > allowed:
+                    regressions.append(
+                        f"{scenario} {name} {metric}: {metrics[metric]} > {before[metric]} (baseline)"
+                    )
+    return regressions
@@ -0,0 +1,223 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PurchaseRequest, RequestFingerprint, LineItemBand, RequestFlag
+from .policies import ApprovalPolicy
+
+# MinHash signature length, split into LSH bands of ROWS values. Requests
+# whose item sets have Jaccard similarity s share a band with probability
+# 1 - (1 - s**ROWS)**BANDS: ~0.98 at s=0.8, ~0.05 at s=0.3.
+BANDS = 8
+ROWS = 4
+PRIME = (1 << 61) - 1
+# Fixed seed: signatures must stay comparable across processes and releases
+_rng = random.Random(20240501)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(BANDS * ROWS)]
+
+# Dropped from the end of vendor names, so "Acme Hardware Ltd." matches "ACME Hardware"
+LEGAL_SUFFIXES = {'co', 'corp', 'corporation', 'company', 'inc', 'llc', 'ltd', 'limited', 'plc', 'gmbh', 'ag', 'sa', 'bv'}
+
+
+def normalize_vendor(name):
+    words = re.findall(r'[a-z0-9]+', str(name or '').lower())
+    while words and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return ' '.join(words)[:255]
+
+
+def normalize_invoice(number):
+    """'inv-0042 ' and 'INV 0042' are the same invoice."""
+    return re.sub(r'[^A-Z0-9]', '', str(number or '').upper())[:100]
+
+
+def _hash64(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+
+def minhash(tokens):
+    """MinHash signature of a set of strings; empty for an empty set."""
+    if not tokens:
+        return []
+    hashes = [_hash64(token) for token in tokens]
+    return [min((a * h + b) % PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+
+def band_keys(signature):
+    """One signed 64-bit key per LSH band (BigIntegerField range)."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(repr((band, signature[band * ROWS:(band + 1) * ROWS])).encode(), digest_size=8).digest(),
+            'big', signed=True
+        )
+        for band in range(BANDS)
+    ] if signature else []
+
+
+def similarity(a, b):
+    """Jaccard similarity estimated from two signatures."""
+    if not a or not b:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class DuplicateDetector:
+    """
+    Flags requests that look like an earlier one (RequestFlag):
+
+    - DUPLICATE_INVOICE: same vendor and invoice number, at any time
+    - SAME_AMOUNT: same vendor and amount within DUPLICATE_WINDOW_DAYS
+    - SIMILAR_ITEMS: line items at least DUPLICATE_ITEMS_SIMILARITY alike
+      (estimated from MinHash signatures) within the window
+    - SPLIT_PURCHASE: the same requester's purchases from one vendor within
+      the window, each below an approval threshold but over it together
+
+    Each request is indexed as a RequestFingerprint (normalized vendor,
+    invoice number, amount, time bucket) with LSH band keys of its line
+    items, so candidates come from indexed key lookups, never from pairwise
+    scans: checking a batch costs the same few queries whatever its size or
+    the size of the history. Vendor and items are only known once the
+    proforma is extracted, so checks run when extraction completes (see
+    procurement.receivers); `manage.py detect_duplicates` scans the backlog.
+    """
+
+    @staticmethod
+    def fingerprint(req):
+        metadata = req.ai_metadata or {}
+        items = [item.get('description') for item in metadata.get('items') or [] if isinstance(item, dict)]
+        tokens = {word for description in items for word in re.findall(r'[a-z0-9]+', str(description or '').lower())}
+        return RequestFingerprint(
+            request_id=req.id,
+            created_by_id=req.created_by_id,
+            created_at=req.created_at,
+            amount=req.amount,
+            vendor=normalize_vendor(metadata.get('vendor_name')),
+            invoice_number=normalize_invoice(metadata.get('invoice_number')),
+            bucket=timezone.localtime(req.created_at).date().toordinal() // settings.DUPLICATE_WINDOW_DAYS,
+            minhash=minhash(tokens),
+        )
+
+    @staticmethod
+    def index(requests):
+        """Replaces the fingerprints and band keys of `requests`. Returns the fingerprints."""
+        fingerprints = [DuplicateDetector.fingerprint(req) for req in requests]
+        with transaction.atomic():
+            RequestFingerprint.objects.filter(request__in=[req.id for req in requests]).delete()
+            RequestFingerprint.objects.bulk_create(fingerprints)
+            LineItemBand.objects.bulk_create([
+                LineItemBand(fingerprint_id=fp.request_id, key=key)
+                for fp in fingerprints for key in band_keys(fp.minhash)
+            ])
+        return fingerprints
+
+    @staticmethod
+    def scan(requests):
+        """Indexes `requests` (amount, creator, created_at and ai_metadata loaded) and stores their flags."""
+        flags = DuplicateDetector.detect(DuplicateDetector.index(requests))
+        RequestFlag.objects.bulk_create(flags, ignore_conflicts=True)
+        return flags
+
+    @staticmethod
+    def check(request_ids):
+        """Loads the requests (one query) and scans them."""
+        requests = list(
+            PurchaseRequest.objects.filter(id__in=request_ids)
+            .only('id', 'amount', 'created_by', 'created_at', 'ai_metadata')
+        )
+        return DuplicateDetector.scan(requests)
+
+    @staticmethod
+    def detect(fingerprints):
+        """Unsaved flags of indexed `fingerprints` against every earlier fingerprint."""
+        if not fingerprints:
+            return []
+        window = timedelta(days=settings.DUPLICATE_WINDOW_DAYS)
+
+        # 1. Candidates sharing a key with any fingerprint of the batch, in one query
+        vendors = {fp.vendor for fp in fingerprints if fp.vendor}
+        buckets = {bucket for fp in fingerprints for bucket in (fp.bucket - 1, fp.bucket, fp.bucket + 1)}
+        candidates = {}
+        if vendors:
+            invoices = {fp.invoice_number for fp in fingerprints if fp.invoice_number}
+            candidates.update((fp.request_id, fp) for fp in RequestFingerprint.objects.filter(
+                Q(vendor__in=vendors, invoice_number__in=invoices)
+                | Q(vendor__in=vendors, amount__in={fp.amount for fp in fingerprints}, bucket__in=buckets)
+                | Q(vendor__in=vendors, created_by__in={fp.created_by_id for fp in fingerprints}, bucket__in=buckets)
+            ))
+
+        # 2. Candidates sharing an LSH band: one query for the keys, one for new fingerprints
+        by_band = defaultdict(set)
+        keys = {key for fp in fingerprints for key in band_keys(fp.minhash)}
+        for key, request_id in LineItemBand.objects.filter(key__in=keys).values_list('key', 'fingerprint_id'):
+            by_band[key].add(request_id)
+        missing = {request_id for ids in by_band.values() for request_id in ids} - candidates.keys()
+        candidates.update((fp.request_id, fp) for fp in RequestFingerprint.objects.filter(request__in=missing))
+
+        # 3. Group the candidates by key
+        by_invoice, by_amount, by_owner = defaultdict(list), defaultdict(list), defaultdict(list)
+        for fp in candidates.values():
+            if not fp.vendor:
+                continue
+            if fp.invoice_number:
+                by_invoice[fp.vendor, fp.invoice_number].append(fp)
+            by_amount[fp.vendor, fp.amount].append(fp)
+            by_owner[fp.created_by_id, fp.vendor].append(fp)
+
+        thresholds = sorted(
+            (min_amount for _, min_amount in ApprovalPolicy.current().chain if min_amount > 0), reverse=True
+        )
+        flags = []
+
+        def earlier(fp, others, within_window=True):
+            """Candidates created before `fp` (and within the window)."""
+            return [
+                other for other in others
+                if (other.created_at, other.request_id) < (fp.created_at, fp.request_id)
+                and (not within_window or fp.created_at - other.created_at <= window)
+            ]
+
+        def flag(fp, other, kind, detail, score=1.0):
+            flags.append(RequestFlag(
+                request_id=fp.request_id, related_id=other.request_id, kind=kind, score=score, detail=detail
+            ))
+
+        for fp in fingerprints:
+            # 4. The same invoice, or the same amount from the vendor
+            if fp.vendor and fp.invoice_number:
+                for other in earlier(fp, by_invoice[fp.vendor, fp.invoice_number], within_window=False):
+                    flag(fp, other, RequestFlag.Kind.DUPLICATE_INVOICE, f"Invoice {fp.invoice_number} from {fp.vendor}")
+            if fp.vendor:
+                for other in earlier(fp, by_amount[fp.vendor, fp.amount]):
+                    # Same invoice number: already flagged as a duplicate invoice
+                    if not fp.invoice_number or other.invoice_number != fp.invoice_number:
+                        flag(fp, other, RequestFlag.Kind.SAME_AMOUNT, f"{fp.amount} from {fp.vendor}")
+
+            # 5. Similar line items, confirmed on the full signature
+            similar = {request_id for key in band_keys(fp.minhash) for request_id in by_band[key]}
+            for other in earlier(fp, (candidates[request_id] for request_id in similar)):
+                score = similarity(fp.minhash, other.minhash)
+                if score >= settings.DUPLICATE_ITEMS_SIMILARITY:
+                    flag(fp, other, RequestFlag.Kind.SIMILAR_ITEMS, f"{score:.0%} of line items alike", score)
+
+            # 6. Purchases that only stay under a threshold because they were split
+            if fp.vendor:
+                group = earlier(fp, by_owner[fp.created_by_id, fp.vendor])
+                for threshold in thresholds:
+                    below = [other for other in group if other.amount < threshold]
+                    total = fp.amount + sum(other.amount for other in below)
+                    if fp.amount < threshold and below and total >= threshold:
+                        for other in below:
+                            flag(
+                                fp, other, RequestFlag.Kind.SPLIT_PURCHASE,
+                                f"{len(below) + 1} requests total {total}, over the {threshold} approval threshold",
+                                float(total / threshold)
+                            )
+                        break
+        return flags
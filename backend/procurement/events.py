@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .models import ApprovalStep, EventTicket
+from .query_planner import RequestQueryPlanner
+
+logger = logging.getLogger(__name__)
+
+# Sent to a client that fell behind: its backlog was dropped, so it should refetch the list
+RESYNC = {"type": "resync"}
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+class Subscription:
+    """
+    One connected client. Events are fed from any thread into a bounded
+    asyncio queue on the client's event loop; only events about requests
+    the user could see in their list are delivered.
+    """
+
+    def __init__(self, user, loop):
+        self.user = user
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def deliver(self, event):
+        if not RequestQueryPlanner.visible(
+            self.user, event['created_by_id'], event['current_level'], event['status'], event['levels']
+        ):
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The client's loop is closed; it is unsubscribing
+            pass
+
+    def _put(self, event):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = RESYNC
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    """Fans events out to the subscriptions of this process."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, user, loop):
+        get_backend().start()
+        subscription = Subscription(user, loop)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, events):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                subscription.deliver(event)
+
+
+hub = EventHub()
+
+
+class LocalEventBackend:
+    """
+    In-process fan-out: events reach the clients of this process once the
+    publishing transaction commits. Only suitable when the web server and
+    the job worker share a process (development, tests).
+    """
+
+    def publish(self, events):
+        transaction.on_commit(lambda: hub.dispatch(events))
+
+    def start(self):
+        pass
+
+
+class PostgresEventBackend:
+    """
+    Fan-out across processes with LISTEN/NOTIFY. NOTIFY is transactional,
+    so PostgreSQL delivers events only when the publishing transaction
+    commits. Each web process runs one listener thread, started with its
+    first subscriber, that hands notifications to the local EventHub.
+    """
+
+    def __init__(self):
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, events):
+        # 1. Pack events into as few NOTIFY payloads as fit the size limit
+        payloads, batch = [], []
+        for event in events:
+            candidate = json.dumps(batch + [event], separators=(',', ':'))
+            if batch and len(candidate.encode()) > MAX_NOTIFY_PAYLOAD:
+                payloads.append(json.dumps(batch, separators=(',', ':')))
+                batch = []
+            batch.append(event)
+        if batch:
+            payloads.append(json.dumps(batch, separators=(',', ':')))
+
+        with connection.cursor() as cursor:
+            for payload in payloads:
+                cursor.execute("SELECT pg_notify(%s, %s)", [settings.EVENTS_CHANNEL, payload])
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='request-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            db = connections.create_connection('default')
+            try:
+                db.ensure_connection()
+                raw = db.connection
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f"LISTEN {db.ops.quote_name(settings.EVENTS_CHANNEL)}")
+                while True:
+                    if select.select([raw], [], [], 5) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        hub.dispatch(json.loads(raw.notifies.pop(0).payload))
+            except Exception:
+                logger.exception("Request event listener failed; reconnecting")
+                time.sleep(1)
+            finally:
+                db.close()
+
+
+BACKENDS = {
+    'local': LocalEventBackend,
+    'postgres': PostgresEventBackend,
+}
+
+_backends = {}
+
+
+def get_backend():
+    name = settings.EVENTS_BACKEND
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+class RequestEvents:
+    """
+    Compact change events for the approval inboxes, published by
+    WorkflowEngine and streamed to clients by the /api/events/ endpoint.
+    Each event carries the request fields role filtering needs.
+    """
+
+    CREATED = 'request.created'
+    APPROVED = 'step.approved'
+    REJECTED = 'step.rejected'
+    PO_READY = 'po.ready'
+    COMPLETED = 'request.completed'
+
+    @staticmethod
+    def event(kind, request_id, created_by_id, status, current_level, levels, **extra):
+        """`levels` is the request's approval chain, which decides who sees the event."""
+        return {
+            "type": kind,
+            "request_id": request_id,
+            "created_by_id": created_by_id,
+            "status": status,
+            "current_level": current_level,
+            "levels": levels,
+            **extra,
+            "at": timezone.now().isoformat(),
+        }
+
+    @staticmethod
+    def of(kind, request, levels, **extra):
+        """Event about an in-memory request, in its current state."""
+        return RequestEvents.event(
+            kind, request.id, request.created_by_id, request.status, request.current_level, levels, **extra
+        )
+
+    @staticmethod
+    def chains(request_ids):
+        """{request_id: [levels of its approval chain]} in one query."""
+        chains = {request_id: [] for request_id in request_ids}
+        steps = ApprovalStep.objects.filter(request_id__in=chains).order_by('level')
+        for request_id, level in steps.values_list('request_id', 'level'):
+            chains[request_id].append(level)
+        return chains
+
+    @staticmethod
+    def publish(events):
+        if events:
+            get_backend().publish(events)
+
+
+class StreamTickets:
+    """
+    Tickets for opening the events stream from a browser. EventSource
+    cannot send an Authorization header, and a bearer token in the query
+    string would end up in access logs and browser history, so clients
+    POST (authenticated) for a ticket and open /api/events/?ticket=...
+    within EVENTS_TICKET_TTL seconds. A ticket opens one stream; a
+    reconnect needs a new one.
+    """
+
+    @staticmethod
+    def _hash(ticket):
+        return hashlib.sha256(ticket.encode()).hexdigest()
+
+    @staticmethod
+    def issue(user, stream_until):
+        """A new ticket for `user`, whose stream ends at `stream_until`."""
+        now = timezone.now()
+        EventTicket.objects.filter(expires_at__lte=now).delete()
+        ticket = secrets.token_urlsafe(32)
+        EventTicket.objects.create(
+            key=StreamTickets._hash(ticket), user=user,
+            expires_at=now + timedelta(seconds=settings.EVENTS_TICKET_TTL), stream_until=stream_until
+        )
+        return ticket
+
+    @staticmethod
+    def redeem(ticket):
+        """(user, stream_until) of an unexpired ticket, which is used up; None otherwise."""
+        key = StreamTickets._hash(ticket)
+        found = EventTicket.objects.select_related('user').filter(key=key, expires_at__gt=timezone.now()).first()
+        # Deleting is what claims the ticket, so concurrent redemptions cannot both succeed
+        if found is None or not EventTicket.objects.filter(key=key).delete()[0] or not found.user.is_active:
+            return None
+        return found.user, found.stream_until
@@ -0,0 +1,21 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Uploaded file is too large."
+    default_code = 'upload_too_large'
+
+
+class UnsupportedDocumentType(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = "Unsupported document type."
+    default_code = 'unsupported_document_type'
+
+
+class TransitionConflict(APIException):
+    """A workflow transition lost a race or no longer applies to the current state."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "This request was changed by someone else. Reload it and try again."
+    default_code = 'transition_conflict'
@@ -0,0 +1,147 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import PurchaseRequest, ApprovalStep
+from .policies import ApprovalPolicy
+from core.models import User
+
+VENDORS = [
+    "Tech Corp Solutions", "Office Depot", "Global Supplies Ltd", "Acme Hardware",
+    "Kigali Print House", "CloudNet Services", "Prime Furniture", "DataCenter Pro",
+]
+
+ITEMS = [
+    "Server Rack", "Cables", "Laptop", "Monitor", "Office Chair", "Printer Toner",
+    "Network Switch", "Desk", "Software License", "Projector",
+]
+
+# (request status, weight). Pending and rejected requests stop at a random
+# level of the chain the approval policy routes their amount through.
+WORKFLOW_MIX = [
+    (PurchaseRequest.Status.PENDING, 60),
+    (PurchaseRequest.Status.APPROVED, 25),
+    (PurchaseRequest.Status.REJECTED, 15),
+]
+
+DEFAULT_ROLE_MIX = {
+    User.Role.STAFF: 50,
+    User.Role.APPROVER_L1: 5,
+    User.Role.APPROVER_L2: 3,
+    User.Role.FINANCE: 2,
+}
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """Lets bulk_create keep the given created_at/updated_at values."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, (auto_now, auto_now_add) in zip(fields, saved):
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def seed_users(prefix='seed', role_mix=None):
+    """Creates (or reuses) users for each role. Returns {role: [users]}."""
+    role_mix = role_mix or DEFAULT_ROLE_MIX
+    wanted = [
+        User(username=f"{prefix}_{role.lower()}_{i}", role=role, password='!')
+        for role, count in role_mix.items()
+        for i in range(count)
+    ]
+    User.objects.bulk_create(wanted, ignore_conflicts=True)
+
+    users = {role: [] for role in role_mix}
+    for user in User.objects.filter(username__in=[u.username for u in wanted]):
+        users[user.role].append(user)
+    return users
+
+
+def _workflow_state(rng, status, levels):
+    """(status, current_level, [step status per level]) of a seeded request routed through `levels`."""
+    if not levels:
+        # No level applies: approved on submission
+        return PurchaseRequest.Status.APPROVED, 0, []
+    if status == PurchaseRequest.Status.APPROVED:
+        return status, levels[-1], ['APPROVED'] * len(levels)
+    reached = rng.randrange(len(levels))
+    current = 'PENDING' if status == PurchaseRequest.Status.PENDING else 'REJECTED'
+    steps = ['APPROVED'] * reached + [current] + ['PENDING'] * (len(levels) - reached - 1)
+    return status, levels[reached], steps
+
+
+def seed_purchase_requests(count, users, batch_size=5000, days=365, seed=0):
+    """
+    Bulk-inserts `count` requests with the approval steps the current
+    ApprovalPolicy routes their amount through, spread over the last `days`
+    days with a realistic status mix. Returns the number created.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    staff = users[User.Role.STAFF]
+    policy = ApprovalPolicy.current()
+    approvers = {level: users.get(role) or [None] for role, level in policy.roles.items()}
+    statuses = [status for status, _ in WORKFLOW_MIX]
+    weights = [weight for _, weight in WORKFLOW_MIX]
+
+    created = 0
+    with explicit_timestamps(PurchaseRequest, 'created_at', 'updated_at'):
+        while created < count:
+            size = min(batch_size, count - created)
+
+            requests, chains = [], []
+            for i in range(size):
+                created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+                item = rng.choice(ITEMS)
+                quantity = rng.randint(1, 20)
+                price = Decimal(rng.randint(500, 500000)) / 100
+                amount = (price * quantity).quantize(Decimal('0.01'))
+                levels = policy.levels_for(amount)
+                status, level, step_statuses = _workflow_state(
+                    rng, rng.choices(statuses, weights=weights)[0], levels
+                )
+                chains.append(zip(levels, step_statuses))
+                requests.append(PurchaseRequest(
+                    title=f"{item} x{quantity}",
+                    description=f"Seeded request {created + i} for {item.lower()}",
+                    amount=amount,
+                    status=status,
+                    current_level=level,
+                    created_by=rng.choice(staff),
+                    proforma_file='proformas/seed.pdf',
+                    extraction_status=PurchaseRequest.ExtractionStatus.COMPLETED,
+                    ai_metadata={
+                        "vendor_name": rng.choice(VENDORS),
+                        "invoice_number": f"INV-{rng.randint(1000, 999999)}",
+                        "items": [{"description": item, "quantity": quantity, "price": float(price)}],
+                        "extracted_total": float(amount),
+                        "confidence_score": round(rng.uniform(0.7, 1.0), 2),
+                    },
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            PurchaseRequest.objects.bulk_create(requests)
+
+            steps = []
+            for req, chain in zip(requests, chains):
+                for position, (level, step_status) in enumerate(chain, start=1):
+                    reviewed = step_status != 'PENDING'
+                    steps.append(ApprovalStep(
+                        request=req,
+                        level=level,
+                        status=step_status,
+                        approver=rng.choice(approvers[level]) if reviewed else None,
+                        reviewed_at=req.created_at + timedelta(hours=rng.randint(1, 72) * position) if reviewed else None,
+                    ))
+            ApprovalStep.objects.bulk_create(steps)
+            created += size
+
+    return created
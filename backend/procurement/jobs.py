@@ -0,0 +1,310 @@
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .utils.timeouts import call_with_time_limit
+
+logger = logging.getLogger(__name__)
+
+# Maps Job.Kind -> callable(job). Populated by procurement.tasks.
+HANDLERS = {}
+
+# Maps Job.Kind -> callable(job, exc), called once a job has exhausted its retries.
+FAILURE_HANDLERS = {}
+
+
+class StaleJob(Exception):
+    """A RUNNING job whose worker stopped sending heartbeats (crashed or was killed)."""
+
+
+# Process pool for CPU-bound work (set by Worker.run). None means run inline.
+_process_pool = None
+
+
+def register(kind, on_failure=None):
+    """Decorator registering the function that executes jobs of `kind`."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        if on_failure is not None:
+            FAILURE_HANDLERS[kind] = on_failure
+        return func
+    return decorator
+
+
+def offload(func, *args, timeout=None):
+    """
+    Runs a CPU-bound, picklable `func` in the worker's process pool so it does
+    not hold the GIL of the job threads. Falls back to running inline.
+    """
+    if _process_pool is None:
+        return func(*args)
+    return _process_pool.submit(func, *args).result(timeout=timeout)
+
+
+def offload_map(func, iterable, timeout=None):
+    """Like `offload`, but fans `func` out over every item of `iterable`."""
+    if _process_pool is None:
+        return [func(item) for item in iterable]
+    return list(_process_pool.map(func, iterable, timeout=timeout))
+
+
+def offload_each(func, iterable, timeout=None, default=None):
+    """
+    Like `offload_map`, but each call may run for `timeout` seconds from
+    when it starts (items beyond the pool size wait in the queue without
+    their clock running), and one that raises or runs out of time yields
+    `default` instead of failing the rest. The limit is enforced inside
+    the pool process, which is then free for the next item.
+    """
+    call = partial(call_with_time_limit, func, timeout)
+    if _process_pool is None:
+        futures = [_completed(call, item) for item in iterable]
+    else:
+        futures = [_process_pool.submit(call, item) for item in iterable]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception:
+            logger.warning("Offloaded %s failed or timed out", func, exc_info=True)
+            results.append(default)
+    return results
+
+
+def _completed(func, item):
+    """A future holding the result (or error) of running func(item) inline."""
+    future = Future()
+    try:
+        future.set_result(func(item))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+class JobQueue:
+    """
+    Database-backed job queue.
+    Jobs are enqueued inside the caller's transaction, so they only become
+    visible to workers once the surrounding business data is committed.
+    """
+
+    @staticmethod
+    def enqueue(kind, request=None, payload=None, max_attempts=None):
+        return Job.objects.create(
+            kind=kind,
+            request=request,
+            payload=payload or {},
+            max_attempts=max_attempts or settings.JOB_QUEUE_MAX_ATTEMPTS,
+        )
+
+    @staticmethod
+    def claim(limit, kinds=None):
+        """
+        Atomically moves up to `limit` due jobs from QUEUED to RUNNING.
+        Uses SKIP LOCKED where supported so concurrent workers never claim the same job.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            qs = Job.objects.select_for_update(skip_locked=True).filter(
+                status=Job.Status.QUEUED,
+                run_after__lte=now
+            )
+            if kinds:
+                qs = qs.filter(kind__in=kinds)
+            jobs = list(qs.order_by('run_after', 'id')[:limit])
+            if not jobs:
+                return []
+
+            for job in jobs:
+                job.status = Job.Status.RUNNING
+                job.attempts += 1
+                job.started_at = now
+                job.updated_at = now
+            Job.objects.bulk_update(jobs, ['status', 'attempts', 'started_at', 'updated_at'])
+            return jobs
+
+    @staticmethod
+    def complete(job):
+        job.status = Job.Status.SUCCEEDED
+        job.finished_at = timezone.now()
+        job.last_error = ''
+        job.save(update_fields=['status', 'finished_at', 'last_error', 'updated_at'])
+
+    @staticmethod
+    def fail(job, exc):
+        """Schedules a retry with exponential backoff, or marks the job FAILED."""
+        job.last_error = ''.join(traceback.format_exception(exc))[-4000:]
+
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_QUEUE_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+            job.status = Job.Status.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+            job.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+            return
+
+        job.status = Job.Status.FAILED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'last_error', 'updated_at'])
+
+        on_failure = FAILURE_HANDLERS.get(job.kind)
+        if on_failure:
+            on_failure(job, exc)
+
+    @staticmethod
+    def run(job):
+        """Executes a claimed job and records the outcome."""
+        handler = HANDLERS.get(job.kind)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job.kind}")
+            handler(job)
+        except Exception as exc:
+            logger.exception("Job %s failed (attempt %s/%s)", job.pk, job.attempts, job.max_attempts)
+            JobQueue.fail(job, exc)
+        else:
+            JobQueue.complete(job)
+        return job
+
+    @staticmethod
+    def run_pending(limit=None, kinds=None):
+        """
+        Synchronously drains due jobs in the current thread.
+        Returns the number of jobs executed.
+        """
+        executed = 0
+        while limit is None or executed < limit:
+            jobs = JobQueue.claim(1, kinds=kinds)
+            if not jobs:
+                break
+            JobQueue.run(jobs[0])
+            executed += 1
+        return executed
+
+    @staticmethod
+    def heartbeat(job_ids):
+        """Marks RUNNING jobs as still alive, so requeue_stale leaves them alone."""
+        if not job_ids:
+            return 0
+        return Job.objects.filter(pk__in=job_ids, status=Job.Status.RUNNING).update(updated_at=timezone.now())
+
+    @staticmethod
+    def requeue_stale(older_than):
+        """
+        Returns RUNNING jobs abandoned by a crashed worker (no heartbeat for
+        `older_than` seconds) to the queue. Jobs that have used all their
+        attempts are marked FAILED instead, so a job that keeps killing its
+        worker is not retried forever.
+        """
+        now = timezone.now()
+        stale = Job.objects.filter(status=Job.Status.RUNNING, updated_at__lt=now - timedelta(seconds=older_than))
+
+        # 1. Retry the ones with attempts left
+        requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+            status=Job.Status.QUEUED, run_after=now, updated_at=now
+        )
+
+        # 2. Fail the rest, running their failure handlers
+        with transaction.atomic():
+            exhausted = list(stale.filter(attempts__gte=F('max_attempts')).select_for_update(skip_locked=True))
+            for job in exhausted:
+                logger.error("Job %s abandoned on its last attempt (%s/%s)", job.pk, job.attempts, job.max_attempts)
+                JobQueue.fail(job, StaleJob(f"No heartbeat from the worker running this job for {older_than}s"))
+        return requeued + len(exhausted)
+
+
+class Worker:
+    """
+    Polls the job table and executes jobs in a thread pool.
+    Each pool thread owns its own database connection; CPU-bound steps
+    are handed to a process pool through `offload`.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None, kinds=None, processes=None):
+        self.concurrency = concurrency or settings.JOB_QUEUE_CONCURRENCY
+        self.poll_interval = poll_interval or settings.JOB_QUEUE_POLL_INTERVAL
+        self.processes = processes if processes is not None else settings.JOB_QUEUE_PROCESSES
+        self.kinds = kinds
+        self._stop = threading.Event()
+
+    def stop(self, *args):
+        logger.info("Worker shutting down after in-flight jobs complete.")
+        self._stop.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    @staticmethod
+    def _execute(job):
+        close_old_connections()
+        try:
+            return JobQueue.run(job)
+        finally:
+            close_old_connections()
+
+    def run(self):
+        global _process_pool
+        if self.processes:
+            # spawn: forked children would inherit open DB connections and lock state
+            _process_pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        try:
+            self._poll()
+        finally:
+            if _process_pool is not None:
+                _process_pool.shutdown()
+                _process_pool = None
+
+    def _poll(self):
+        in_flight = {}  # future -> job id
+        last_reap = 0.0
+        last_beat = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job') as pool:
+            while not self._stop.is_set():
+                if time.monotonic() - last_reap > settings.JOB_QUEUE_STALE_AFTER:
+                    JobQueue.requeue_stale(settings.JOB_QUEUE_STALE_AFTER)
+                    last_reap = time.monotonic()
+
+                free_slots = self.concurrency - len(in_flight)
+                jobs = JobQueue.claim(free_slots, kinds=self.kinds) if free_slots else []
+                for job in jobs:
+                    in_flight[pool.submit(self._execute, job)] = job.pk
+
+                if in_flight:
+                    in_flight = self._wait(in_flight, FIRST_COMPLETED)
+                elif not jobs:
+                    self._stop.wait(self.poll_interval)
+                last_beat = self._heartbeat(in_flight, last_beat)
+
+            # Keep beating while in-flight jobs finish, or another worker would reclaim them
+            while in_flight:
+                in_flight = self._wait(in_flight)
+                last_beat = self._heartbeat(in_flight, last_beat)
+
+    def _wait(self, in_flight, return_when=ALL_COMPLETED):
+        """Waits up to one poll interval; returns the futures still running."""
+        _, pending = wait(in_flight, timeout=self.poll_interval, return_when=return_when)
+        return {future: in_flight[future] for future in pending}
+
+    @staticmethod
+    def _heartbeat(in_flight, last_beat):
+        """Refreshes updated_at of the running jobs every JOB_QUEUE_HEARTBEAT seconds."""
+        if not in_flight or time.monotonic() - last_beat < settings.JOB_QUEUE_HEARTBEAT:
+            return last_beat
+        JobQueue.heartbeat(list(in_flight.values()))
+        return time.monotonic()
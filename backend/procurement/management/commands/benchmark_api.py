@@ -0,0 +1,127 @@
+import json
+import logging
+import platform
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from procurement.benchmark import BenchmarkRunner, Workload, DEFAULT_MIX, compare, parse_mix
+from procurement.factories import seed_users, seed_purchase_requests
+from procurement.models import PurchaseRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a disposable database and replays a mixed API workload (list, create, review, "
+        "submit-receipt), reporting latency percentiles, queries per request and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000,
+                            help="Requests to seed (with the approval steps the policy routes them through).")
+        parser.add_argument('--iterations', type=int, default=1000, help="Measured API calls per scenario.")
+        parser.add_argument('--warmup', type=int, default=50, help="Unmeasured API calls before each scenario.")
+        parser.add_argument('--threads', default='1,8',
+                            help="Comma-separated thread counts; one scenario per count.")
+        parser.add_argument('--mix', default=','.join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                            help="Operation weights, e.g. list=70,create=10,review=15,submit_receipt=5.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the JSON report.")
+        parser.add_argument('--baseline', help="Previous JSON report to check for regressions.")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed fractional p95 increase over the baseline.")
+        parser.add_argument('--keepdb', action='store_true',
+                            help="Keep the benchmark database (and its seed data) for the next run.")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+            thread_counts = [int(t) for t in options['threads'].split(',')]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as fh:
+                baseline = json.load(fh)
+
+        # 1. Never touch the real database: run against a throwaway test database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            # Failed calls are counted in the report; keep their tracebacks out of the output
+            request_logger = logging.getLogger('django.request')
+            request_logger.disabled = True
+            # Uploads and extraction results go to throwaway directories too, so
+            # the real extraction cache neither fills up nor makes runs measure hits
+            alias = settings.EXTRACTION_CACHE_ALIAS
+            with tempfile.TemporaryDirectory() as media_root, tempfile.TemporaryDirectory() as cache_dir, \
+                    override_settings(MEDIA_ROOT=media_root, CACHES={
+                        **settings.CACHES, alias: {**settings.CACHES[alias], 'LOCATION': cache_dir}
+                    }):
+                report = self.run(options, mix, thread_counts)
+        finally:
+            request_logger.disabled = False
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        with open(options['output'], 'w') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+        # 2. Fail on regressions so CI can gate on the baseline
+        if baseline is not None:
+            regressions = compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressions:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def run(self, options, mix, thread_counts):
+        users = seed_users(prefix='bench')
+        missing = options['requests'] - PurchaseRequest.objects.count()
+        if missing > 0:
+            self.stdout.write(f"Seeding {missing} requests...")
+            seed_purchase_requests(missing, users, seed=options['seed'])
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "seeded_requests": PurchaseRequest.objects.count(),
+                "iterations": options['iterations'],
+                "mix": mix,
+            },
+            "scenarios": {},
+        }
+
+        for threads in thread_counts:
+            if threads > 1 and connection.vendor == 'sqlite':
+                self.stdout.write(self.style.WARNING(
+                    "SQLite serialises writes; expect lock errors with concurrent threads."
+                ))
+            workload = Workload(users, mix, limit=options['iterations'] + options['warmup'])
+            runner = BenchmarkRunner(workload, options['iterations'], options['warmup'], options['seed'])
+            scenario = runner.run(threads)
+            report['scenarios'][f"threads={threads}"] = scenario
+            self.print_scenario(scenario)
+
+        return report
+
+    def print_scenario(self, scenario):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n== {scenario['threads']} thread(s): {scenario['throughput_rps']} req/s "
+            f"over {scenario['wall_seconds']}s"
+        ))
+        self.stdout.write(f"{'operation':<16}{'count':>7}{'errors':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>9}")
+        for name, m in scenario['operations'].items():
+            self.stdout.write(
+                f"{name:<16}{m['count']:>7}{m['errors']:>8}{m['p50_ms']:>10}"
+                f"{m['p95_ms']:>10}{m['p99_ms']:>10}{m['queries_max'] if m['queries_max'] is not None else '-':>9}"
+            )
@@ -0,0 +1,62 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from procurement.factories import VENDORS, ITEMS
+from procurement.utils.ai_processor import render_purchase_order_pdf, render_purchase_orders_pdf
+
+
+class Command(BaseCommand):
+    help = "Compares PO rendering throughput: one PDF per document vs. one batched PDF sharing the letterhead."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help="Purchase orders rendered per path.")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per path; the best run is reported.")
+        parser.add_argument('--output', help="Optional JSON file for the results.")
+
+    def handle(self, *args, **options):
+        payloads = [
+            {
+                "id": i + 1,
+                "title": f"{ITEMS[i % len(ITEMS)]} x{i % 20 + 1}",
+                "amount": f"{(i * 37) % 100000 / 100:.2f}",
+                "vendor_name": VENDORS[i % len(VENDORS)],
+                "date": "2024-01-31",
+            }
+            for i in range(options['count'])
+        ]
+
+        def per_document():
+            return sum(len(render_purchase_order_pdf(po)) for po in payloads)
+
+        def batched():
+            buffer = io.BytesIO()
+            render_purchase_orders_pdf(payloads, buffer)
+            return len(buffer.getvalue())
+
+        results = {}
+        for name, render in (('per_document', per_document), ('batched', batched)):
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                size = render()
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            results[name] = {
+                "documents": options['count'],
+                "seconds": round(best, 4),
+                "documents_per_second": round(options['count'] / best, 1),
+                "bytes": size,
+            }
+            self.stdout.write(
+                f"{name:<14}{results[name]['documents_per_second']:>10} docs/s"
+                f"{results[name]['seconds']:>10}s{size:>12} bytes"
+            )
+
+        speedup = results['per_document']['seconds'] / results['batched']['seconds']
+        self.stdout.write(self.style.SUCCESS(f"Batched rendering is {speedup:.1f}x the per-document throughput."))
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
@@ -0,0 +1,35 @@
+from collections import Counter
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from procurement.detection import DuplicateDetector
+from procurement.models import PurchaseRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Indexes every extracted purchase request for duplicate and split-purchase detection, "
+        "oldest first, and flags requests that resemble an earlier one. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help="Requests indexed and checked per batch.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size'] or settings.DUPLICATE_SCAN_CHUNK_SIZE
+        # Oldest first, so every request is checked against the ones indexed before it
+        requests = (
+            PurchaseRequest.objects.filter(extraction_status=PurchaseRequest.ExtractionStatus.COMPLETED)
+            .only('id', 'amount', 'created_by', 'created_at', 'ai_metadata')
+            .order_by('created_at', 'id').iterator(chunk_size=chunk_size)
+        )
+        scanned, kinds = 0, Counter()
+        while chunk := list(islice(requests, chunk_size)):
+            kinds.update(flag.kind for flag in DuplicateDetector.scan(chunk))
+            scanned += len(chunk)
+
+        for kind, count in sorted(kinds.items()):
+            self.stdout.write(f"  {kind}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} requests and found {sum(kinds.values())} flags."))
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from procurement.factories import seed_users, seed_purchase_requests
+from procurement.models import PurchaseRequest
+from procurement.policies import ApprovalPolicy
+from procurement.query_planner import RequestQueryPlanner
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = "Prints the query plan of each role's request list (and admin search) against a seeded dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Number of synthetic requests to insert first.")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded rows (rolled back by default).")
+        parser.add_argument('--analyze', action='store_true', help="Run EXPLAIN ANALYZE (PostgreSQL only).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                users = seed_users(prefix='explain')
+                created = seed_purchase_requests(options['seed'], users)
+                self.stdout.write(f"Seeded {created} requests.")
+                # Refresh planner statistics so plans reflect the new volume
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE procurement_purchaserequest')
+                    cursor.execute('ANALYZE procurement_approvalstep')
+
+            for label, queryset in self.role_queries():
+                self.explain(label, queryset, options['analyze'])
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def role_queries(self):
+        page = settings.REQUESTS_PAGE_SIZE
+        ordering = ('-created_at', '-id')
+
+        for role in User.Role:
+            user = User.objects.filter(role=role).order_by('id').first()
+            if user is None:
+                self.stdout.write(self.style.WARNING(f"No {role.label} user; skipping."))
+                continue
+            queryset = RequestQueryPlanner.build(user, 'list').order_by(*ordering)
+            yield f"{role.label} list", queryset[:page]
+            if ApprovalPolicy.current().level_of(role) is not None:
+                pending = queryset.filter(status=PurchaseRequest.Status.PENDING)
+                yield f"{role.label} pending inbox", pending[:page]
+
+        yield "Admin search", PurchaseRequest.objects.filter(title__icontains='rack').order_by(*ordering)[:100]
+
+    def explain(self, label, queryset, analyze):
+        options = {'analyze': True, 'buffers': True} if analyze and connection.vendor == 'postgresql' else {}
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {label}"))
+        self.stdout.write(str(queryset.query))
+        self.stdout.write(queryset.explain(**options))
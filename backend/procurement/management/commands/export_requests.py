@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from procurement.models import PurchaseRequest
+from procurement.utils.audit_export import FORMATS, AuditExport
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the audit export of every purchase request (one flattened row per "
+        "request, with its approval steps and extracted proforma fields) to a file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file.")
+        parser.add_argument('--format', choices=FORMATS, help="Output format (default: from the file extension).")
+        parser.add_argument('--status', choices=PurchaseRequest.Status.values, help="Only requests in this status.")
+        parser.add_argument('--since', help="Only requests created on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Only requests created on or before this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        output = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if output not in FORMATS:
+            raise CommandError(f"Cannot tell the format of '{options['path']}'; pass --format.")
+        if not AuditExport.available(output):
+            raise CommandError(f"The {output} export needs the '{FORMATS[output][1]}' package.")
+        try:
+            queryset = AuditExport.filter(
+                PurchaseRequest.objects.all(), options['status'], options['since'], options['until']
+            )
+        except ValueError:
+            raise CommandError("Invalid date. Use YYYY-MM-DD.")
+
+        with open(options['path'], 'wb') as out:
+            for block in AuditExport.stream(queryset, output):
+                out.write(block)
+        self.stdout.write(self.style.SUCCESS(f"Exported requests to {options['path']}."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from procurement.utils.extraction_cache import ExtractionCache
+
+
+class Command(BaseCommand):
+    help = "Shows hit/miss counters of the document extraction cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        stats = ExtractionCache.stats()
+        self.stdout.write(
+            f"Hits: {stats['hits']}  Misses: {stats['misses']}  Hit ratio: {stats['hit_ratio']:.1%}"
+        )
+        if options['reset']:
+            ExtractionCache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
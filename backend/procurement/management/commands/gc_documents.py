@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from procurement.models import PurchaseRequest
+
+
+def walk(storage, directory):
+    """Yields the name of every file below `directory` in `storage`."""
+    try:
+        subdirectories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f"{directory}/{name}"
+    for subdirectory in subdirectories:
+        yield from walk(storage, f"{directory}/{subdirectory}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes documents under the upload directories of PurchaseRequest "
+        "(proformas, POs, receipts) that no request points at any more."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=settings.DOCUMENT_GC_MIN_AGE,
+                            help="Only delete files older than this many seconds.")
+        parser.add_argument('--dry-run', action='store_true', help="List orphaned files without deleting them.")
+
+    def handle(self, *args, **options):
+        file_fields = [f for f in PurchaseRequest._meta.get_fields() if isinstance(f, models.FileField)]
+
+        # 1. Every file name a request points at, streamed column by column
+        referenced = set()
+        for field in file_fields:
+            referenced.update(
+                PurchaseRequest.objects.exclude(**{field.name: ''}).exclude(**{f"{field.name}__isnull": True})
+                .values_list(field.name, flat=True).iterator(chunk_size=5000)
+            )
+
+        # 2. Files in the upload directories that are not referenced and old enough
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        orphans, freed = 0, 0
+        seen = set()
+        for field in file_fields:
+            directory = str(field.upload_to).strip('/')
+            if (field.storage, directory) in seen:
+                continue
+            seen.add((field.storage, directory))
+
+            for name in walk(field.storage, directory):
+                if name in referenced or field.storage.get_modified_time(name) > cutoff:
+                    continue
+                orphans += 1
+                freed += field.storage.size(name)
+                if options['dry_run']:
+                    self.stdout.write(f"  {name}")
+                else:
+                    field.storage.delete(name)
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {orphans} orphaned documents ({freed / 1024 / 1024:.1f} MiB).")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was deleted."))
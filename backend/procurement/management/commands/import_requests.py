@@ -0,0 +1,46 @@
+import zipfile
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+from procurement.utils.request_import import FORMATS, RequestImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports purchase requests from a CSV or JSONL file (columns: title, description, "
+        "amount, proforma, optional created_by) with their proformas from a ZIP archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file.")
+        parser.add_argument('--proformas', help="ZIP archive holding the files named in the `proforma` column.")
+        parser.add_argument('--format', choices=FORMATS, help="Input format (default: from the file extension).")
+        parser.add_argument('--owner', help="Username of the creator for rows without `created_by`.")
+        parser.add_argument('--chunk-size', type=int, help="Rows validated and inserted per transaction.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in FORMATS:
+            raise CommandError(f"Cannot tell the format of '{options['path']}'; pass --format.")
+
+        owner = None
+        if options['owner']:
+            owner = User.objects.filter(username=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Unknown user '{options['owner']}'.")
+
+        with ExitStack() as stack:
+            archive = None
+            if options['proformas']:
+                archive = stack.enter_context(zipfile.ZipFile(options['proformas']))
+            stream = stack.enter_context(open(options['path'], 'rb'))
+            importer = RequestImport(owner, archive, owner_column=True, chunk_size=options['chunk_size'])
+            summary = importer.run(stream, fmt)
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f"  line {error['line']}: {error['detail']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['created']} requests; {summary['failed']} rows failed."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from procurement.search import RequestSearch
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the full-text search index of purchase requests. Run once after upgrading, "
+        "and after bulk loads or raw SQL edits that bypass the workflow."
+    )
+
+    def handle(self, *args, **options):
+        indexed = RequestSearch.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} purchase requests."))
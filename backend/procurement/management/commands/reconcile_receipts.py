@@ -0,0 +1,57 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from procurement.models import PurchaseRequest
+from procurement.services import WorkflowEngine
+from procurement.utils.reconciliation import RECONCILIATION_VERSION
+
+
+class Command(BaseCommand):
+    help = "Reconciles uploaded receipts against their purchase orders and stores the discrepancies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.RECONCILIATION_BATCH_SIZE,
+                            help="Receipts reconciled per vectorized pass.")
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute every receipt, not only those never reconciled by this engine version.")
+        parser.add_argument('--dry-run', action='store_true', help="Report results without saving them.")
+
+    def handle(self, *args, **options):
+        queryset = PurchaseRequest.objects.exclude(receipt_file='').exclude(receipt_file__isnull=True)
+        if not options['all']:
+            # A missing key compares as NULL, so it has to be matched explicitly
+            queryset = queryset.filter(
+                Q(receipt_validation_data__engine_version__isnull=True)
+                | ~Q(receipt_validation_data__engine_version=RECONCILIATION_VERSION)
+            )
+        queryset = queryset.only('id', 'amount', 'ai_metadata', 'receipt_file', 'receipt_validation_data', 'updated_at')
+
+        statuses, codes = Counter(), Counter()
+        last_id = 0
+        while True:
+            # Keyset pagination keeps every batch an index range scan on the pk
+            batch = list(queryset.filter(pk__gt=last_id).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+
+            if options['dry_run']:
+                WorkflowEngine.match_receipts(batch)
+            else:
+                WorkflowEngine.reconcile_receipts(batch)
+
+            for req in batch:
+                statuses[req.receipt_validation_data['status']] += 1
+                codes.update(d['code'] for d in req.receipt_validation_data['discrepancies'])
+
+        total = sum(statuses.values())
+        self.stdout.write(f"Reconciled {total} receipts: " + ", ".join(
+            f"{status} {count}" for status, count in sorted(statuses.items())
+        ) if total else "No receipts to reconcile.")
+        for code, count in codes.most_common():
+            self.stdout.write(f"  {code}: {count}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was saved."))
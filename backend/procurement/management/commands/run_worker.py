@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from procurement.jobs import JobQueue, Worker
+from procurement.models import Job
+
+
+class Command(BaseCommand):
+    help = "Runs the background job worker (AI extraction, PO rendering)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help="Number of worker threads.")
+        parser.add_argument('--processes', type=int, help="Size of the process pool for CPU-bound jobs (0 runs them inline).")
+        parser.add_argument('--poll-interval', type=float, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument(
+            '--kind', action='append', dest='kinds', choices=Job.Kind.values,
+            help="Only process jobs of this kind (repeatable)."
+        )
+        parser.add_argument('--once', action='store_true', help="Drain due jobs and exit.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            executed = JobQueue.run_pending(kinds=options['kinds'])
+            self.stdout.write(self.style.SUCCESS(f"Executed {executed} job(s)."))
+            return
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            processes=options['processes'],
+            kinds=options['kinds'],
+        )
+        worker.install_signal_handlers()
+        self.stdout.write(
+            f"Worker started with {worker.concurrency} thread(s) and {worker.processes} process(es)."
+        )
+        worker.run()
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_extracted(apps, schema_editor):
+    # Rows created before the job queue were extracted synchronously.
+    PurchaseRequest = apps.get_model('procurement', 'PurchaseRequest')
+    PurchaseRequest.objects.update(extraction_status='COMPLETED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='extraction_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_extracted, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('EXTRACT_PROFORMA', 'Extract Proforma Data')], max_length=30)),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed')], default='QUEUED', max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='procurement.purchaserequest')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+def mark_existing_pos_ready(apps, schema_editor):
+    # POs rendered synchronously before the job queue are already attached.
+    PurchaseRequest = apps.get_model('procurement', 'PurchaseRequest')
+    PurchaseRequest.objects.exclude(purchase_order_doc='').exclude(
+        purchase_order_doc__isnull=True
+    ).update(po_status='READY')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0002_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='po_status',
+            field=models.CharField(choices=[('NOT_REQUESTED', 'Not Requested'), ('QUEUED', 'Queued'), ('RENDERING', 'Rendering'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='NOT_REQUESTED', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_pos_ready, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('EXTRACT_PROFORMA', 'Extract Proforma Data'), ('RENDER_PO', 'Render Purchase Order')], max_length=30),
+        ),
+    ]
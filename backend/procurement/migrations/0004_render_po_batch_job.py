@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0003_po_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('EXTRACT_PROFORMA', 'Extract Proforma Data'), ('RENDER_PO', 'Render Purchase Order'), ('RENDER_PO_BATCH', 'Render Purchase Order Batch')], max_length=30),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def backfill_current_level(apps, schema_editor):
+    PurchaseRequest = apps.get_model('procurement', 'PurchaseRequest')
+    ApprovalStep = apps.get_model('procurement', 'ApprovalStep')
+
+    def step(**filters):
+        return Exists(ApprovalStep.objects.filter(request=OuterRef('pk'), **filters))
+
+    # Requests without a level 1 step were never visible to approvers
+    PurchaseRequest.objects.filter(~step(level=1)).update(current_level=0)
+
+    # L1 approved and an L2 step exists -> level 2 inbox
+    PurchaseRequest.objects.filter(
+        step(level=1, status='APPROVED'), step(level=2)
+    ).update(current_level=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0004_render_po_batch_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='current_level',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(backfill_current_level, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['status', 'current_level', 'created_at'], name='request_status_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['current_level', 'created_at'], name='request_level_created_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0005_current_level'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approvalstep',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['level'], name='step_pending_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'QUEUED')), fields=['run_after', 'id'], name='job_queued_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['-created_at', '-id'], name='request_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='request_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['current_level', '-created_at', '-id'], name='request_pending_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Admin search runs `UPPER(col::text) LIKE UPPER('%term%')` on PostgreSQL.
+# GIN trigram indexes on that exact expression let it use an index scan
+# instead of a sequential scan. Other databases are skipped.
+TRIGRAM_INDEXES = [
+    ('request_title_trgm_idx', 'procurement_purchaserequest', 'title'),
+    ('request_description_trgm_idx', 'procurement_purchaserequest', 'description'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0006_role_access_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0007_admin_search_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='proforma_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
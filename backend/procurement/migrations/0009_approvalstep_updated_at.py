@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0008_proforma_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='approvalstep',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
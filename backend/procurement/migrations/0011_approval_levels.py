@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:17
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def seed_levels(apps, schema_editor):
+    ApprovalLevel = apps.get_model('procurement', 'ApprovalLevel')
+    # The chain every request went through before policies were configurable
+    ApprovalLevel.objects.bulk_create([
+        ApprovalLevel(level=1, name='Level 1', approver_role='L1', min_amount=0),
+        ApprovalLevel(level=2, name='Level 2', approver_role='L2', min_amount=0),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0010_request_version_completed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApprovalLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField(unique=True, validators=[django.core.validators.MinValueValidator(1)])),
+                ('name', models.CharField(max_length=100)),
+                ('approver_role', models.CharField(choices=[('STAFF', 'Staff Member'), ('L1', 'Approver Level 1'), ('L2', 'Approver Level 2'), ('FINANCE', 'Finance Team')], help_text='Users with this role review the steps of this level.', max_length=10, unique=True)),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, help_text='Requests below this amount skip the level.', max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['level'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='approvalstep',
+            name='level',
+            field=models.IntegerField(help_text='The ApprovalLevel this step belongs to'),
+        ),
+        migrations.RunPython(seed_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0011_approval_levels'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='kind',
+            field=models.CharField(choices=[('EXTRACT_PROFORMA', 'Extract Proforma Data'), ('EXTRACT_PROFORMA_BATCH', 'Extract Proforma Data Batch'), ('RENDER_PO', 'Render Purchase Order'), ('RENDER_PO_BATCH', 'Render Purchase Order Batch')], max_length=30),
+        ),
+    ]
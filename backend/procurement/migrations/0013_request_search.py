@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Full-text index of procurement.search.RequestSearch. PostgreSQL: a
+# tsvector column with a GIN index on the requests table. SQLite: an FTS5
+# table keyed (rowid) by request id. Other databases are skipped. Existing
+# requests are indexed by `manage.py rebuild_search_index`.
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE "procurement_purchaserequest" ADD COLUMN IF NOT EXISTS "search_vector" tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS "request_search_idx" '
+            'ON "procurement_purchaserequest" USING gin ("search_vector")'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS "procurement_request_search" '
+            "USING fts5(headline, items, body, tokenize='porter unicode61')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS "request_search_idx"')
+        schema_editor.execute('ALTER TABLE "procurement_purchaserequest" DROP COLUMN IF EXISTS "search_vector"')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS "procurement_request_search"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0012_extract_proforma_batch_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('procurement', '0013_request_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestFingerprint',
+            fields=[
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='procurement.purchaserequest')),
+                ('created_at', models.DateTimeField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('vendor', models.CharField(blank=True, max_length=255)),
+                ('invoice_number', models.CharField(blank=True, max_length=100)),
+                ('bucket', models.IntegerField()),
+                ('minhash', models.JSONField(blank=True, default=list)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LineItemBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='procurement.requestfingerprint')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RequestFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('DUPLICATE_INVOICE', 'Duplicate Invoice'), ('SAME_AMOUNT', 'Same Vendor and Amount'), ('SIMILAR_ITEMS', 'Similar Line Items'), ('SPLIT_PURCHASE', 'Split Purchase')], max_length=20)),
+                ('score', models.FloatField(default=1.0)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='procurement.purchaserequest')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='procurement.purchaserequest')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='requestfingerprint',
+            index=models.Index(fields=['vendor', 'invoice_number'], name='fingerprint_invoice_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestfingerprint',
+            index=models.Index(fields=['vendor', 'amount', 'bucket'], name='fingerprint_amount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestfingerprint',
+            index=models.Index(fields=['created_by', 'vendor', 'bucket'], name='fingerprint_owner_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='requestflag',
+            unique_together={('request', 'related', 'kind')},
+        ),
+    ]
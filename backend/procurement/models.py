@@ -1,7 +1,12 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from core.models import User
+
 class PurchaseRequest(models.Model):
     """
     Represents a procurement request initiated by a staff member.
@@ -10,6 +15,31 @@ class PurchaseRequest(models.Model):
         PENDING = 'PENDING', _('Pending Approval')
         APPROVED = 'APPROVED', _('Approved')
         REJECTED = 'REJECTED', _('Rejected')
+        COMPLETED = 'COMPLETED', _('Completed')
+
+    # Status changes WorkflowEngine may make (see procurement.transitions).
+    # Approving a non-final level keeps the request PENDING and moves
+    # current_level instead. Only the admin reset leaves this table.
+    TRANSITIONS = {
+        Status.PENDING: (Status.APPROVED, Status.REJECTED),
+        Status.APPROVED: (Status.COMPLETED,),
+    }
+
+    # Requests with a purchase order: approved, and possibly received since
+    PURCHASED_STATUSES = (Status.APPROVED, Status.COMPLETED)
+
+    class ExtractionStatus(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        PROCESSING = 'PROCESSING', _('Processing')
+        COMPLETED = 'COMPLETED', _('Completed')
+        FAILED = 'FAILED', _('Failed')
+
+    class POStatus(models.TextChoices):
+        NOT_REQUESTED = 'NOT_REQUESTED', _('Not Requested')
+        QUEUED = 'QUEUED', _('Queued')
+        RENDERING = 'RENDERING', _('Rendering')
+        READY = 'READY', _('Ready')
+        FAILED = 'FAILED', _('Failed')
 
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -30,20 +60,104 @@ class PurchaseRequest(models.Model):
     
     # Documents
     proforma_file = models.FileField(upload_to='proformas/')
+    proforma_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
     purchase_order_doc = models.FileField(upload_to='pos/', null=True, blank=True)
     receipt_file = models.FileField(upload_to='receipts/', null=True, blank=True)
     
     # AI Data Storage
     ai_metadata = models.JSONField(default=dict, blank=True)
     receipt_validation_data = models.JSONField(default=dict, blank=True)
+    extraction_status = models.CharField(
+        max_length=20,
+        choices=ExtractionStatus.choices,
+        default=ExtractionStatus.PENDING
+    )
+    po_status = models.CharField(
+        max_length=20,
+        choices=POStatus.choices,
+        default=POStatus.NOT_REQUESTED
+    )
+
+    # Denormalized workflow stage: the highest approval level this request
+    # has reached (kept in sync by WorkflowEngine). Approver inboxes filter
+    # on it instead of joining approval_steps. 0 when the approval policy
+    # required no level and the request was approved on submission.
+    current_level = models.PositiveSmallIntegerField(default=1)
+
+    # Bumped by every workflow transition. Transitions are conditional
+    # UPDATEs on (status, current_level[, version]) rather than
+    # read-modify-write; reviewers may send the version they saw.
+    version = models.PositiveIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # One index per role access path, all ending in the pagination keys
+        # (created_at, id) so a page is a bounded index range scan.
+        # Trigram indexes for admin search are created in migration 0007 (PostgreSQL only).
+        indexes = [
+            models.Index(fields=['status', 'current_level', 'created_at'], name='request_status_level_idx'),
+            models.Index(fields=['current_level', 'created_at'], name='request_level_created_idx'),
+            # Approvers: current_level >= N matches most rows, so walk the
+            # pagination order and filter instead of sorting a level range
+            models.Index(fields=['-created_at', '-id'], name='request_created_idx'),
+            # Staff: created_by = me
+            models.Index(fields=['created_by', '-created_at', '-id'], name='request_owner_created_idx'),
+            # Finance: status = APPROVED
+            models.Index(fields=['status', '-created_at', '-id'], name='request_status_created_idx'),
+            # Approvers' pending inbox (?status=PENDING); small because most requests are closed
+            models.Index(
+                fields=['current_level', '-created_at', '-id'],
+                condition=models.Q(status='PENDING'),
+                name='request_pending_inbox_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.status})"
 
 
+class ApprovalLevel(models.Model):
+    """
+    One level of the approval policy (see procurement.policies). A new
+    request needs a step at every active level whose `min_amount` its
+    amount reaches, reviewed in level order; a request that reaches no
+    level is approved on submission.
+
+    Steps are created when a request is submitted, so policy changes only
+    affect new requests. Deactivate a level rather than deleting it while
+    requests are still waiting on it: `approver_role` keeps deciding who
+    reviews those steps.
+    """
+    level = models.PositiveSmallIntegerField(unique=True, validators=[MinValueValidator(1)])
+    name = models.CharField(max_length=100)
+    approver_role = models.CharField(
+        max_length=10,
+        choices=User.Role.choices,
+        unique=True,
+        help_text=_("Users with this role review the steps of this level.")
+    )
+    min_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)],
+        help_text=_("Requests below this amount skip the level.")
+    )
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['level']
+
+    def clean(self):
+        if self.approver_role == User.Role.STAFF:
+            raise ValidationError({'approver_role': _("Staff members cannot approve requests.")})
+
+    def __str__(self):
+        return f"L{self.level} {self.name} (from {self.min_amount})"
+
+
 class ApprovalStep(models.Model):
     """
     Represents a specific step in the approval chain (e.g., Level 1 vs Level 2).
@@ -53,12 +167,17 @@ class ApprovalStep(models.Model):
         APPROVED = 'APPROVED', _('Approved')
         REJECTED = 'REJECTED', _('Rejected')
 
+    # A step is reviewed once
+    TRANSITIONS = {
+        Status.PENDING: (Status.APPROVED, Status.REJECTED),
+    }
+
     request = models.ForeignKey(
         PurchaseRequest, 
         on_delete=models.CASCADE, 
         related_name='approval_steps'
     )
-    level = models.IntegerField(help_text="1 for Level 1, 2 for Level 2")
+    level = models.IntegerField(help_text="The ApprovalLevel this step belongs to")
     status = models.CharField(
         max_length=20, 
         choices=Status.choices, 
@@ -72,7 +191,154 @@ class ApprovalStep(models.Model):
     )
     comments = models.TextField(blank=True)
     reviewed_at = models.DateTimeField(null=True, blank=True)
+    # Part of the parent request's detail ETag; every writer also bumps
+    # the request's updated_at so list validators see step changes
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['level']
-        unique_together = ['request', 'level']
\ No newline at end of file
+        unique_together = ['request', 'level']
+        indexes = [
+            # Open steps per level (approval queue depth, analytics)
+            models.Index(
+                fields=['level'],
+                condition=models.Q(status='PENDING'),
+                name='step_pending_level_idx'
+            ),
+        ]
+
+
+class Job(models.Model):
+    """
+    A unit of background work stored in the database.
+    Jobs are claimed and executed by the `run_worker` management command.
+    """
+    class Kind(models.TextChoices):
+        EXTRACT_PROFORMA = 'EXTRACT_PROFORMA', _('Extract Proforma Data')
+        EXTRACT_PROFORMA_BATCH = 'EXTRACT_PROFORMA_BATCH', _('Extract Proforma Data Batch')
+        RENDER_PO = 'RENDER_PO', _('Render Purchase Order')
+        RENDER_PO_BATCH = 'RENDER_PO_BATCH', _('Render Purchase Order Batch')
+
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', _('Queued')
+        RUNNING = 'RUNNING', _('Running')
+        SUCCEEDED = 'SUCCEEDED', _('Succeeded')
+        FAILED = 'FAILED', _('Failed')
+
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.QUEUED
+    )
+    request = models.ForeignKey(
+        PurchaseRequest,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        null=True,
+        blank=True
+    )
+    payload = models.JSONField(default=dict, blank=True)
+
+    # Retry bookkeeping
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            # Worker claim query: only QUEUED rows, ordered by due time
+            models.Index(
+                fields=['run_after', 'id'],
+                condition=models.Q(status='QUEUED'),
+                name='job_queued_due_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+class RequestFingerprint(models.Model):
+    """
+    Detection keys of a request's extracted invoice (see
+    procurement.detection): normalized vendor and invoice number, amount
+    and time bucket, and a MinHash signature of its line items. Rebuilt
+    whenever extraction completes.
+    """
+    request = models.OneToOneField(
+        PurchaseRequest,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint'
+    )
+    # Copied from the request so every lookup is a single-table index scan
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    vendor = models.CharField(max_length=255, blank=True)
+    invoice_number = models.CharField(max_length=100, blank=True)
+    # Days since 0001-01-01 divided by DUPLICATE_WINDOW_DAYS
+    bucket = models.IntegerField()
+    minhash = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vendor', 'invoice_number'], name='fingerprint_invoice_idx'),
+            models.Index(fields=['vendor', 'amount', 'bucket'], name='fingerprint_amount_idx'),
+            models.Index(fields=['created_by', 'vendor', 'bucket'], name='fingerprint_owner_idx'),
+        ]
+
+
+class LineItemBand(models.Model):
+    """One LSH band of a fingerprint's MinHash: requests sharing a key have similar line items."""
+    fingerprint = models.ForeignKey(RequestFingerprint, on_delete=models.CASCADE, related_name='bands')
+    key = models.BigIntegerField(db_index=True)
+
+
+class RequestFlag(models.Model):
+    """
+    A possible duplicate or split purchase: `request` resembles the
+    earlier `related` request. Flags inform reviewers and block nothing.
+    """
+    class Kind(models.TextChoices):
+        DUPLICATE_INVOICE = 'DUPLICATE_INVOICE', _('Duplicate Invoice')
+        SAME_AMOUNT = 'SAME_AMOUNT', _('Same Vendor and Amount')
+        SIMILAR_ITEMS = 'SIMILAR_ITEMS', _('Similar Line Items')
+        SPLIT_PURCHASE = 'SPLIT_PURCHASE', _('Split Purchase')
+
+    request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name='flags')
+    related = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    # 1.0 for exact matches; estimated item similarity; combined amount / threshold for splits
+    score = models.FloatField(default=1.0)
+    detail = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['request', 'related', 'kind']
+
+    def __str__(self):
+        return f"{self.kind}: #{self.request_id} ~ #{self.related_id}"
+
+
+class EventTicket(models.Model):
+    """
+    Single-use, short-lived credential for opening the events stream, so
+    the bearer token never travels in a URL (EventSource cannot send
+    headers). Only a hash of the ticket is stored. See StreamTickets.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    expires_at = models.DateTimeField(db_index=True)
+    # Expiry of the access token the ticket was issued for; the stream ends then
+    stream_until = models.DateTimeField()
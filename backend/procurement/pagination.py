@@ -0,0 +1,28 @@
+from django.conf import settings
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+
+from .search import RequestSearch
+
+
+class PurchaseRequestCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+    Each page is an indexed range scan, so latency does not grow with the
+    size of the table the way OFFSET pagination does. Search results are
+    ordered by relevance instead, unless ?ordering= is given.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.REQUESTS_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        if RequestSearch.RANK in queryset.query.annotations and OrderingFilter.ordering_param not in request.query_params:
+            ordering = ('-' + RequestSearch.RANK, '-created_at')
+        else:
+            ordering = tuple(super().get_ordering(request, queryset, view))
+        # Always break created_at ties on the primary key so the order is total
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from core.models import User
+from .policies import ApprovalPolicy
 
 class IsStaffOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -9,10 +10,10 @@ class IsStaffOrReadOnly(permissions.BasePermission):
 
 class IsApprover(permissions.BasePermission):
     """
-    Allows access only to Level 1 or Level 2 approvers.
+    Allows access only to roles that review an approval level.
     """
     def has_object_permission(self, request, view, obj):
-        return request.user.role in [User.Role.APPROVER_L1, User.Role.APPROVER_L2]
+        return ApprovalPolicy.current().level_of(request.user.role) is not None
 
 class IsFinance(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from django.conf import settings
+
+from .models import ApprovalLevel
+
+
+class ApprovalPolicy:
+    """
+    The ApprovalLevel rows compiled into the two lookups the workflow needs:
+    the chain of levels a new request must pass for its amount, and the
+    level each approver role reviews.
+
+    `current()` keeps the compiled policy in memory. Saves and deletes of
+    an ApprovalLevel invalidate it in this process (procurement.receivers);
+    other processes reload it within APPROVAL_POLICY_CACHE_TIMEOUT seconds.
+    """
+
+    _cached = None
+    _loaded_at = 0.0
+    _lock = threading.Lock()
+
+    def __init__(self, levels):
+        levels = sorted(levels, key=lambda level: level.level)
+        # (level, min_amount) of the levels new requests are routed through
+        self.chain = tuple((level.level, level.min_amount) for level in levels if level.is_active)
+        # Inactive levels keep their reviewers for steps created before
+        self.roles = {level.approver_role: level.level for level in levels}
+        # Every level requests may have a step at
+        self.levels = tuple(level.level for level in levels)
+
+    def levels_for(self, amount):
+        """Levels a request of `amount` needs, in review order. Empty means auto-approve."""
+        return [level for level, min_amount in self.chain if amount >= min_amount]
+
+    def level_of(self, role):
+        """Level reviewed by `role`, or None for roles that do not approve."""
+        return self.roles.get(role)
+
+    @classmethod
+    def current(cls):
+        with cls._lock:
+            expired = time.monotonic() - cls._loaded_at > settings.APPROVAL_POLICY_CACHE_TIMEOUT
+            if cls._cached is None or expired:
+                cls._cached = cls(ApprovalLevel.objects.all())
+                cls._loaded_at = time.monotonic()
+            return cls._cached
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._cached = None
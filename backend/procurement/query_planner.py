@@ -0,0 +1,125 @@
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import PurchaseRequest, ApprovalStep
+from .policies import ApprovalPolicy
+from core.models import User
+
+
+class RequestQueryPlanner:
+    """
+    Builds the PurchaseRequest queryset for a user and a viewset action.
+
+    Role filtering decides *which* rows are visible; the action decides
+    *what* gets loaded with them, so each endpoint issues a fixed number of
+    queries no matter how many requests it returns.
+    """
+
+    # Approval steps with their approver in a single extra query
+    STEPS_WITH_APPROVER = Prefetch(
+        'approval_steps',
+        queryset=ApprovalStep.objects.select_related('approver')
+    )
+
+    # Columns the slim list serializer never reads
+    HEAVY_FIELDS = ('description', 'ai_metadata', 'receipt_validation_data')
+
+    # action -> (select_related, prefetch_related, deferred fields)
+    PLANS = {
+        # Slim list serializer: created_by only, heavy JSON stays in the database
+        'list': (('created_by',), (), HEAVY_FIELDS),
+        # Full serializer: created_by and nested approval_steps/approver
+        'retrieve': (('created_by',), (STEPS_WITH_APPROVER,), ()),
+        'update': (('created_by',), (STEPS_WITH_APPROVER,), ()),
+        'partial_update': (('created_by',), (STEPS_WITH_APPROVER,), ()),
+        'submit_receipt': (('created_by',), (STEPS_WITH_APPROVER,), ()),
+    }
+
+    # Actions that only touch the request row itself (review, jobs, bulk-review, destroy)
+    DEFAULT_PLAN = ((), (), ())
+
+    @staticmethod
+    def for_role(user):
+        """
+        Role-Based Data Filtering:
+        - Staff: See only their own requests.
+        - Approvers: See ALL requests relevant to their level (Pending OR History),
+          i.e. whose chain has a step at the level their role reviews (see
+          ApprovalPolicy) and that have reached it.
+        - Finance: See all APPROVED requests (and COMPLETED ones, received since).
+        """
+        if user.role == User.Role.STAFF:
+            return PurchaseRequest.objects.filter(created_by=user)
+
+        level = ApprovalPolicy.current().level_of(user.role)
+        if user.role == User.Role.FINANCE:
+            # Finance sees everything that has been fully approved (plus its inbox if it reviews a level)
+            purchased = Q(status__in=PurchaseRequest.PURCHASED_STATUSES)
+            if level is not None:
+                purchased |= RequestQueryPlanner.reviewed_at(level)
+            return PurchaseRequest.objects.filter(purchased)
+
+        elif level is not None:
+            # e.g. L2 sees requests where L1 is already Approved (stage moved to level 2)
+            return PurchaseRequest.objects.filter(RequestQueryPlanner.reviewed_at(level))
+
+        # Default: See nothing
+        return PurchaseRequest.objects.none()
+
+    @staticmethod
+    def reviewed_at(level):
+        """
+        Requests that `level` reviews: their chain has a step at `level`
+        (chains may skip levels) and they have reached it.
+        """
+        step = ApprovalStep.objects.filter(request=OuterRef('pk'), level=level)
+        return Q(Exists(step), current_level__gte=level)
+
+    @staticmethod
+    def visible(user, created_by_id, current_level, status, levels):
+        """
+        In-memory twin of `for_role`: would `user` see a request in this
+        state, routed through the approval `levels`?
+        """
+        if user.role == User.Role.STAFF:
+            return created_by_id == user.id
+        level = ApprovalPolicy.current().level_of(user.role)
+        if user.role == User.Role.FINANCE and status in PurchaseRequest.PURCHASED_STATUSES:
+            return True
+        return level is not None and level in levels and current_level >= level
+
+    @classmethod
+    def plan(cls, queryset, action):
+        """Applies the eager-loading strategy for `action` to `queryset`."""
+        select, prefetch, deferred = cls.PLANS.get(action, cls.DEFAULT_PLAN)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if deferred:
+            queryset = queryset.defer(*deferred)
+        return queryset
+
+    @classmethod
+    def build(cls, user, action):
+        return cls.plan(cls.for_role(user), action)
+
+    @staticmethod
+    def with_approved_at(queryset):
+        """
+        Annotates `approved_at` on approved requests: when the last level
+        of their chain approved them, or when they were submitted if the
+        policy approved them on submission.
+        """
+        final_review = ApprovalStep.objects.filter(
+            request=OuterRef('pk'), status=ApprovalStep.Status.APPROVED
+        ).order_by('-level').values('reviewed_at')[:1]
+        return queryset.annotate(approved_at=Coalesce(Subquery(final_review), 'created_at'))
+
+    @staticmethod
+    def with_next_level(steps):
+        """Annotates approval steps with `next_level`: the following level of their request, None for the last."""
+        later = ApprovalStep.objects.filter(
+            request=OuterRef('request'), level__gt=OuterRef('level')
+        ).order_by('level').values('level')[:1]
+        return steps.annotate(next_level=Subquery(later))
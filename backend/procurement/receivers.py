@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .detection import DuplicateDetector
+from .models import ApprovalLevel, PurchaseRequest
+from .policies import ApprovalPolicy
+from .search import RequestSearch
+from .signals import request_created, request_extracted
+
+
+@receiver(post_save, sender=ApprovalLevel)
+@receiver(post_delete, sender=ApprovalLevel)
+def reload_approval_policy(sender, **kwargs):
+    # Again on commit, in case another thread reloaded the old rows meanwhile
+    ApprovalPolicy.invalidate()
+    transaction.on_commit(ApprovalPolicy.invalidate)
+
+
+@receiver(post_save, sender=PurchaseRequest)
+def index_saved_request(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # New requests are indexed on request_created (sent for bulk inserts too)
+    if created or raw or (update_fields is not None and RequestSearch.FIELDS.isdisjoint(update_fields)):
+        return
+    RequestSearch.index([instance])
+
+
+@receiver(request_created)
+def index_created_requests(sender, requests, **kwargs):
+    RequestSearch.index(requests)
+
+
+@receiver(request_extracted)
+def index_extracted_requests(sender, request_ids, **kwargs):
+    RequestSearch.reindex(request_ids)
+
+
+@receiver(request_extracted)
+def flag_duplicate_requests(sender, request_ids, **kwargs):
+    DuplicateDetector.check(request_ids)
+
+
+@receiver(post_delete, sender=PurchaseRequest)
+def unindex_deleted_request(sender, instance, **kwargs):
+    RequestSearch.remove([instance.id])
@@ -0,0 +1,181 @@
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import PurchaseRequest
+
+# Requests indexed per statement
+INDEX_BATCH_SIZE = 500
+
+# Ranks are scaled to integers so cursor pagination compares them exactly
+RANK_SCALE = 1000000
+
+
+class RequestSearch:
+    """
+    Full-text index over purchase requests and their extracted proforma
+    data. Each request is indexed as three weighted parts:
+
+    - headline: title, vendor name and invoice number (highest weight)
+    - items: line item descriptions
+    - body: description and the creator's username
+
+    PostgreSQL keeps a `search_vector` tsvector column with a GIN index on
+    the requests table and ranks with ts_rank; queries use websearch syntax
+    ("quoted phrases", or, -exclusions). SQLite (local development and
+    tests) keeps an FTS5 table keyed by request id and ranks with bm25;
+    queries match every word. Both are created by migration 0013. Other
+    databases fall back to unranked substring matching of title and
+    description.
+
+    The index is updated in the transaction that changes a request (see
+    procurement.receivers): when WorkflowEngine creates it, when it is
+    saved and when its extraction completes. `manage.py
+    rebuild_search_index` indexes requests inserted by other means (seed
+    data, raw SQL).
+    """
+
+    # Annotation ranking search results, higher is more relevant
+    RANK = 'search_rank'
+
+    # Request fields the indexed document is built from
+    FIELDS = frozenset({'title', 'description', 'ai_metadata', 'created_by'})
+
+    # SQLite FTS5 table; PostgreSQL column
+    FTS_TABLE = 'procurement_request_search'
+    VECTOR_COLUMN = 'search_vector'
+
+    # bm25 weights of the headline, items and body FTS5 columns
+    FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+    @staticmethod
+    def document(req):
+        """(headline, items, body) texts of a request; created_by must be loaded."""
+        metadata = req.ai_metadata or {}
+        headline = [req.title, metadata.get('vendor_name'), metadata.get('invoice_number')]
+        items = [item.get('description') for item in metadata.get('items') or [] if isinstance(item, dict)]
+        body = [req.description, req.created_by.username]
+        return tuple(' '.join(str(part) for part in parts if part) for parts in (headline, items, body))
+
+    @staticmethod
+    def index(requests):
+        """(Re)indexes `requests`, with their creator loaded."""
+        for start in range(0, len(requests), INDEX_BATCH_SIZE):
+            batch = requests[start:start + INDEX_BATCH_SIZE]
+            rows = [(req.id, *RequestSearch.document(req)) for req in batch]
+            if connection.vendor == 'postgresql':
+                RequestSearch._update_vectors(rows)
+            elif connection.vendor == 'sqlite':
+                RequestSearch.remove([req.id for req in batch])
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f'INSERT INTO {RequestSearch.FTS_TABLE} (rowid, headline, items, body) VALUES (%s, %s, %s, %s)',
+                        rows
+                    )
+
+    @staticmethod
+    def _update_vectors(rows):
+        """One UPDATE ... FROM (VALUES ...) writing the weighted tsvector of every row."""
+        values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+        vector = " || ".join(
+            f"setweight(to_tsvector(%s::regconfig, v.{part}), '{weight}')"
+            for part, weight in (('headline', 'A'), ('items', 'B'), ('body', 'C'))
+        )
+        config = settings.REQUEST_SEARCH_CONFIG
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {PurchaseRequest._meta.db_table} AS r SET {RequestSearch.VECTOR_COLUMN} = {vector} '
+                f'FROM (VALUES {values}) AS v(id, headline, items, body) WHERE r.id = v.id',
+                [config] * 3 + [value for row in rows for value in row]
+            )
+
+    @staticmethod
+    def reindex(request_ids):
+        """Loads the requests (one query) and indexes them."""
+        requests = list(
+            PurchaseRequest.objects.filter(id__in=request_ids).select_related('created_by')
+            .only('id', 'title', 'description', 'ai_metadata', 'created_by__username')
+        )
+        RequestSearch.index(requests)
+
+    @staticmethod
+    def remove(request_ids):
+        # The PostgreSQL vector is deleted with its row
+        if connection.vendor != 'sqlite' or not request_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {RequestSearch.FTS_TABLE} WHERE rowid IN ({", ".join(["%s"] * len(request_ids))})',
+                list(request_ids)
+            )
+
+    @staticmethod
+    def rebuild():
+        """Indexes every request from scratch. Returns the number indexed."""
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {RequestSearch.FTS_TABLE}')
+        requests = (
+            PurchaseRequest.objects.select_related('created_by')
+            .only('id', 'title', 'description', 'ai_metadata', 'created_by__username')
+            .order_by('id').iterator(chunk_size=INDEX_BATCH_SIZE)
+        )
+        indexed = 0
+        while batch := list(islice(requests, INDEX_BATCH_SIZE)):
+            RequestSearch.index(batch)
+            indexed += len(batch)
+        return indexed
+
+    @staticmethod
+    def _match(q):
+        """(boolean SQL matching `q` against the index, rank SQL, params of each), or None."""
+        table = connection.ops.quote_name(PurchaseRequest._meta.db_table)
+        if connection.vendor == 'postgresql':
+            vector = f'{table}.{RequestSearch.VECTOR_COLUMN}'
+            query = 'websearch_to_tsquery(%s::regconfig, %s)'
+            params = [settings.REQUEST_SEARCH_CONFIG, q]
+            return (
+                f'{vector} @@ {query}', params,
+                f'CAST(ts_rank({vector}, {query}) * {RANK_SCALE} AS integer)', params,
+            )
+
+        # FTS5 query syntax is not safe to pass through: match each word as a quoted string
+        words = re.findall(r'\w+', q)
+        if not words:
+            return None
+        match = ' '.join(f'"{word}"' for word in words)
+        fts = RequestSearch.FTS_TABLE
+        weights = ', '.join(str(weight) for weight in RequestSearch.FTS_WEIGHTS)
+        return (
+            f'{table}.id IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)', [match],
+            f'(SELECT CAST(-bm25({fts}, {weights}) * {RANK_SCALE} AS integer) FROM {fts} '
+            f'WHERE {fts} MATCH %s AND rowid = {table}.id)', [match],
+        )
+
+    @staticmethod
+    def matching(queryset, q):
+        """Requests of `queryset` matching the search `q`."""
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return queryset.filter(Q(title__icontains=q) | Q(description__icontains=q))
+        match = RequestSearch._match(q)
+        if match is None:
+            return queryset.none()
+        condition, params = match[:2]
+        return queryset.filter(RawSQL(condition, params, output_field=BooleanField()))
+
+    @staticmethod
+    def ranked(queryset, q):
+        """`matching`, annotated with RANK for ordering by relevance."""
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return RequestSearch.matching(queryset, q).annotate(**{RequestSearch.RANK: Value(0)})
+        match = RequestSearch._match(q)
+        if match is None:
+            return queryset.none().annotate(**{RequestSearch.RANK: Value(0)})
+        condition, condition_params, rank, rank_params = match
+        return queryset.filter(RawSQL(condition, condition_params, output_field=BooleanField())).annotate(
+            **{RequestSearch.RANK: RawSQL(rank, rank_params, output_field=IntegerField())}
+        )
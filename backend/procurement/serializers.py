@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import PurchaseRequest, ApprovalStep
+from .models import PurchaseRequest, ApprovalStep, Job, RequestFlag
+from core.instrumentation import TimedSerializerMixin
 from core.models import User
 
 class SimpleUserSerializer(serializers.ModelSerializer):
@@ -19,10 +21,12 @@ class ApprovalStepSerializer(serializers.ModelSerializer):
             return obj.approver.username
         return None
 
-class PurchaseRequestSerializer(serializers.ModelSerializer):
+class PurchaseRequestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     created_by = SimpleUserSerializer(read_only=True)
     approval_steps = ApprovalStepSerializer(many=True, read_only=True)
     status = serializers.CharField(read_only=True)
+    extraction_status = serializers.CharField(read_only=True)
+    po_status = serializers.CharField(read_only=True)
     
     class Meta:
         model = PurchaseRequest
@@ -30,8 +34,53 @@ class PurchaseRequestSerializer(serializers.ModelSerializer):
             'id', 'title', 'amount', 'description', 
             'proforma_file', 'purchase_order_doc', 
             'status', 'created_at', 'created_by', 
-            'approval_steps', 'ai_metadata'
+            'approval_steps', 'ai_metadata', 'extraction_status', 'po_status',
+            'receipt_file', 'receipt_validation_data', 'version'
         ]
+        read_only_fields = ['receipt_file', 'receipt_validation_data', 'version']
 
     def create(self, validated_data):
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class PurchaseRequestListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Slim representation for list pages. Leaves out the description, the
+    ai_metadata JSON and the nested approval steps; the detail view
+    still returns the full PurchaseRequestSerializer payload.
+    """
+    created_by = SimpleUserSerializer(read_only=True)
+
+    class Meta:
+        model = PurchaseRequest
+        fields = [
+            'id', 'title', 'amount', 'status', 'created_at', 'created_by',
+            'extraction_status', 'po_status', 'version'
+        ]
+        read_only_fields = fields
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'status', 'attempts', 'max_attempts',
+            'last_error', 'run_after', 'started_at', 'finished_at', 'created_at'
+        ]
+
+
+class RequestFlagSerializer(serializers.ModelSerializer):
+    related_title = serializers.CharField(source='related.title', read_only=True)
+
+    class Meta:
+        model = RequestFlag
+        fields = ['id', 'kind', 'related', 'related_title', 'score', 'detail', 'created_at']
+
+
+class BulkReviewSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_REVIEW_MAX_ITEMS
+    )
+    action = serializers.ChoiceField(choices=['approve', 'reject'])
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
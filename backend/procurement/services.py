@@ -1,76 +1,581 @@
+from django.conf import settings
+from django.core.files.base import ContentFile
 from django.db import transaction
-from .models import PurchaseRequest, ApprovalStep
+from django.db.models import F
+from django.utils import timezone
+from .models import PurchaseRequest, ApprovalStep, Job
 from core.models import User
-from .utils.ai_processor import DocumentProcessor 
+from .events import RequestEvents
+from .exceptions import TransitionConflict
+from .jobs import JobQueue, offload_each, offload_map
+from .policies import ApprovalPolicy
+from .query_planner import RequestQueryPlanner
+from .transitions import Transitions
+from .signals import (
+    request_created, request_status_changed, request_vendor_changed, request_extracted, approval_steps_reviewed
+)
+from .utils.ai_processor import (
+    EXTRACTOR_VERSION, DocumentProcessor, extract_proforma_document, extraction_cacheable,
+    render_purchase_order_pdf
+)
+from .utils.documents import local_path
+from .utils.extraction_cache import ExtractionCache, sha256_file
+from .utils.reconciliation import ReconciliationEngine
 
 class WorkflowEngine:
+    @staticmethod
+    def initial_state(levels):
+        """(status, po_status, current_level) of a new request routed through `levels`."""
+        if levels:
+            return PurchaseRequest.Status.PENDING, PurchaseRequest.POStatus.NOT_REQUESTED, levels[0]
+        # No level applies: approved on submission, PO queued behind extraction
+        return PurchaseRequest.Status.APPROVED, PurchaseRequest.POStatus.QUEUED, 0
+
     @staticmethod
     def create_request(validated_data, user, proforma_file):
         with transaction.atomic():
-            # 1. Run AI Extraction
-            ai_data = DocumentProcessor.extract_proforma_data(proforma_file)
             validated_data.pop('proforma_file', None) 
 
-            # 2. Create the Request with AI data
+            # 1. Route the request through the policy's levels for its amount
+            levels = ApprovalPolicy.current().levels_for(validated_data['amount'])
+            status, po_status, current_level = WorkflowEngine.initial_state(levels)
+
+            # 2. Create the Request; AI data is filled in by the worker
             req = PurchaseRequest.objects.create(
                 **validated_data,
                 proforma_file=proforma_file,
+                proforma_sha256=sha256_file(proforma_file),
                 created_by=user,
-                status=PurchaseRequest.Status.PENDING,
-                ai_metadata=ai_data
+                status=status,
+                po_status=po_status,
+                current_level=current_level,
+                extraction_status=PurchaseRequest.ExtractionStatus.PENDING
             )
 
             # 3. Create Approval Steps
-            ApprovalStep.objects.create(request=req, level=1, status=ApprovalStep.Status.PENDING)
-            ApprovalStep.objects.create(request=req, level=2, status=ApprovalStep.Status.PENDING)
+            ApprovalStep.objects.bulk_create([
+                ApprovalStep(request=req, level=level, status=ApprovalStep.Status.PENDING) for level in levels
+            ])
 
+            # 4. Queue AI Extraction (visible to workers once committed)
+            JobQueue.enqueue(Job.Kind.EXTRACT_PROFORMA, request=req)
+
+            request_created.send(sender=WorkflowEngine, requests=[req])
+            RequestEvents.publish([RequestEvents.of(RequestEvents.CREATED, req, levels)])
             return req
 
     @staticmethod
-    def process_approval(step, user, action, comment):
+    def create_requests(requests):
+        """
+        Bulk twin of create_request, used by imports. `requests` are unsaved
+        PurchaseRequests with their fields, creator and stored proforma set.
+        Requests and approval steps are written with one bulk_create each,
+        and one batch job extracts every proforma. Returns the requests.
+        """
+        policy = ApprovalPolicy.current()
         with transaction.atomic():
+            # 1. Route every request through the policy's levels for its amount
+            chains = []
+            for req in requests:
+                levels = policy.levels_for(req.amount)
+                req.status, req.po_status, req.current_level = WorkflowEngine.initial_state(levels)
+                req.extraction_status = PurchaseRequest.ExtractionStatus.PENDING
+                chains.append(levels)
+
+            # 2. Insert the requests, then their steps
+            PurchaseRequest.objects.bulk_create(requests)
+            ApprovalStep.objects.bulk_create([
+                ApprovalStep(request=req, level=level, status=ApprovalStep.Status.PENDING)
+                for req, levels in zip(requests, chains) for level in levels
+            ])
+
+            # 3. Queue one extraction job for the whole batch
+            JobQueue.enqueue(Job.Kind.EXTRACT_PROFORMA_BATCH, payload={'request_ids': [req.id for req in requests]})
+
+            request_created.send(sender=WorkflowEngine, requests=requests)
+            RequestEvents.publish([
+                RequestEvents.of(RequestEvents.CREATED, req, levels) for req, levels in zip(requests, chains)
+            ])
+            return requests
+
+    @staticmethod
+    def complete_extraction(request_id):
+        """
+        Runs AI extraction for a request outside of the HTTP cycle.
+        The slow extraction happens without holding a transaction open.
+        """
+        req = PurchaseRequest.objects.get(pk=request_id)
+        PurchaseRequest.objects.filter(pk=request_id).update(
+            extraction_status=PurchaseRequest.ExtractionStatus.PROCESSING,
+            updated_at=timezone.now()
+        )
+
+        with req.proforma_file.open('rb') as proforma_file:
+            # Pages are read side by side in the worker's process pool
+            ai_data = DocumentProcessor.extract_proforma_data(
+                proforma_file, digest=req.proforma_sha256 or None, map_pages=offload_each
+            )
+
+        old_vendor = (req.ai_metadata or {}).get('vendor_name')
+        new_vendor = ai_data.get('vendor_name')
+        with transaction.atomic():
+            PurchaseRequest.objects.filter(pk=request_id).update(
+                ai_metadata=ai_data,
+                extraction_status=PurchaseRequest.ExtractionStatus.COMPLETED,
+                updated_at=timezone.now()
+            )
+            if new_vendor != old_vendor:
+                request_vendor_changed.send(sender=WorkflowEngine, changes=[(request_id, old_vendor, new_vendor)])
+            request_extracted.send(sender=WorkflowEngine, request_ids=[request_id])
+            WorkflowEngine.queue_auto_approved_pos([req])
+        return ai_data
+
+    @staticmethod
+    def complete_extractions(request_ids):
+        """
+        Batch twin of complete_extraction. Each distinct proforma is looked
+        up in the extraction cache; the rest are extracted in the worker's
+        process pool, outside any transaction, and all results are stored
+        with one bulk_update. Requests already extracted are skipped.
+        """
+        requests = list(
+            PurchaseRequest.objects.filter(id__in=request_ids)
+            .exclude(extraction_status=PurchaseRequest.ExtractionStatus.COMPLETED)
+            .only('id', 'status', 'current_level', 'proforma_file', 'proforma_sha256', 'ai_metadata')
+            .order_by('id')
+        )
+        if not requests:
+            return []
+        PurchaseRequest.objects.filter(id__in=[req.id for req in requests]).update(
+            extraction_status=PurchaseRequest.ExtractionStatus.PROCESSING,
+            updated_at=timezone.now()
+        )
+
+        # 1. Identical proformas are extracted once, cached ones not at all
+        documents, results = {}, {}
+        for req in requests:
+            if not req.proforma_sha256:
+                with req.proforma_file.open('rb') as proforma_file:
+                    req.proforma_sha256 = sha256_file(proforma_file)
+            if req.proforma_sha256 not in documents:
+                documents[req.proforma_sha256] = req.proforma_file
+                cached = ExtractionCache.lookup(
+                    'proforma', req.proforma_sha256, EXTRACTOR_VERSION, settings.PROFORMA_EXTRACTOR
+                )
+                if cached is not None:
+                    results[req.proforma_sha256] = cached
+
+        # 2. Fan the misses out over the process pool (files in remote storage are extracted here)
+        missing = [digest for digest in documents if digest not in results]
+        local = [digest for digest in missing if local_path(documents[digest])]
+        for digest, ai_data in zip(local, offload_map(
+            extract_proforma_document, [local_path(documents[digest]) for digest in local]
+        )):
+            results[digest] = ai_data
+        for digest in missing:
+            if digest not in results:
+                with documents[digest].open('rb') as proforma_file:
+                    results[digest] = DocumentProcessor.extract_proforma_data(
+                        proforma_file, digest=digest, map_pages=offload_each
+                    )
+            if extraction_cacheable(results[digest]):
+                ExtractionCache.store(
+                    'proforma', digest, EXTRACTOR_VERSION, results[digest], settings.PROFORMA_EXTRACTOR
+                )
+
+        # 3. Store every result at once
+        now = timezone.now()
+        changes = []
+        for req in requests:
+            old_vendor = (req.ai_metadata or {}).get('vendor_name')
+            req.ai_metadata = results[req.proforma_sha256]
+            req.extraction_status = PurchaseRequest.ExtractionStatus.COMPLETED
+            req.updated_at = now
+            if req.ai_metadata.get('vendor_name') != old_vendor:
+                changes.append((req.id, old_vendor, req.ai_metadata.get('vendor_name')))
+        with transaction.atomic():
+            PurchaseRequest.objects.bulk_update(
+                requests, ['ai_metadata', 'proforma_sha256', 'extraction_status', 'updated_at']
+            )
+            if changes:
+                request_vendor_changed.send(sender=WorkflowEngine, changes=changes)
+            request_extracted.send(sender=WorkflowEngine, request_ids=[req.id for req in requests])
+            WorkflowEngine.queue_auto_approved_pos(requests)
+        return requests
+
+    @staticmethod
+    def queue_auto_approved_pos(requests):
+        """
+        Requests approved on submission (current_level 0) are approved
+        before their proforma is extracted. Their POs are queued once
+        extraction finished (or gave up), so they carry the vendor and items.
+        """
+        approved = [
+            req for req in requests
+            if req.current_level == 0 and req.status in PurchaseRequest.PURCHASED_STATUSES
+        ]
+        if len(approved) == 1:
+            JobQueue.enqueue(Job.Kind.RENDER_PO, request=approved[0])
+        elif approved:
+            JobQueue.enqueue(Job.Kind.RENDER_PO_BATCH, payload={'request_ids': [req.id for req in approved]})
+
+    @staticmethod
+    def review_conflict(step, level):
+        """Why `step` cannot be reviewed at `level` right now, or None."""
+        if step.status != ApprovalStep.Status.PENDING:
+            return "This step has already been reviewed."
+        if step.request.status != PurchaseRequest.Status.PENDING:
+            return "This request is no longer pending."
+        if step.request.current_level != level:
+            return "The previous approval level has not approved this request."
+        return None
+
+    @staticmethod
+    def next_level(step):
+        """
+        The level after `step` in its request's chain, or None when `step`
+        is the last. Uses the `next_level` annotation when the step was
+        loaded through RequestQueryPlanner.with_next_level.
+        """
+        if hasattr(step, 'next_level'):
+            return step.next_level
+        return (
+            ApprovalStep.objects.filter(request_id=step.request_id, level__gt=step.level)
+            .order_by('level').values_list('level', flat=True).first()
+        )
+
+    @staticmethod
+    def process_approval(step, user, action, comment, version=None):
+        """
+        Approves or rejects one step. Both the step and its request move
+        with conditional UPDATEs (see Transitions), step first like bulk
+        reviews, so of two reviewers acting at once exactly one succeeds
+        and the other gets TransitionConflict (409). `version`, if given,
+        is the request version the reviewer saw.
+        """
+        conflict = WorkflowEngine.review_conflict(step, step.level)
+        if conflict:
+            raise TransitionConflict(conflict)
+
+        request = step.request
+        next_level = WorkflowEngine.next_level(step)
+        now = timezone.now()
+        new_step_status = ApprovalStep.Status.APPROVED if action == 'approve' else ApprovalStep.Status.REJECTED
+
+        with transaction.atomic():
+            # 1. PENDING -> APPROVED/REJECTED, only while the request waits on this level
+            Transitions.apply(
+                ApprovalStep.objects.filter(
+                    pk=step.pk, request__status=PurchaseRequest.Status.PENDING, request__current_level=step.level
+                ),
+                ApprovalStep.Status.PENDING, new_step_status,
+                approver=user, comments=comment, reviewed_at=now, updated_at=now
+            )
             step.approver = user
             step.comments = comment
-            step.status = ApprovalStep.Status.APPROVED if action == 'approve' else ApprovalStep.Status.REJECTED
-            step.save()
+            step.reviewed_at = now
+            step.status = new_step_status
+            step.updated_at = now
 
-            request = step.request
+            final = action == 'reject' or next_level is None
+            approval_steps_reviewed.send(sender=WorkflowEngine, steps=[step], final=final)
+
+            # 2. Move the request on from exactly the state the step was reviewed in
+            guard = PurchaseRequest.objects.filter(pk=request.pk, current_level=step.level)
+            if version is not None:
+                guard = guard.filter(version=version)
+            changes = {'version': F('version') + 1, 'updated_at': now}
+            old_status = request.status
 
             if action == 'reject':
+                Transitions.apply(guard, old_status, PurchaseRequest.Status.REJECTED, **changes)
                 request.status = PurchaseRequest.Status.REJECTED
-                request.save()
-                return request
-
-            if action == 'approve':
-                if step.level == 1:
-                    # Logic for moving to level 2 (handled by UI usually showing pending L2)
-                    pass 
-                elif step.level == 2:
-                    # Final Approval - GENERATE PO
-                    request.status = PurchaseRequest.Status.APPROVED
-                    
-                    # Generate PDF
-                    pdf_name, pdf_file = DocumentProcessor.generate_purchase_order_doc(request)
-                    request.purchase_order_doc.save(pdf_name, pdf_file)
-                    
-                    request.save()
-                    
+            elif next_level is not None:
+                # Move the request into the next level's inbox
+                Transitions.guarded_update(guard.filter(status=old_status), current_level=next_level, **changes)
+                request.current_level = next_level
+            else:
+                # Final Approval - queue PO generation for the worker
+                Transitions.apply(
+                    guard, old_status, PurchaseRequest.Status.APPROVED,
+                    po_status=PurchaseRequest.POStatus.QUEUED, **changes
+                )
+                request.status = PurchaseRequest.Status.APPROVED
+                request.po_status = PurchaseRequest.POStatus.QUEUED
+                JobQueue.enqueue(Job.Kind.RENDER_PO, request=request)
+
+            request.version += 1
+            request.updated_at = now
+            if request.status != old_status:
+                request_status_changed.send(
+                    sender=WorkflowEngine, request_ids=[request.id],
+                    old_status=old_status, new_status=request.status
+                )
+            kind = RequestEvents.APPROVED if action == 'approve' else RequestEvents.REJECTED
+            levels = RequestEvents.chains([request.id])[request.id]
+            RequestEvents.publish([RequestEvents.of(kind, request, levels, level=step.level)])
             return request
 
+    @staticmethod
+    def process_bulk_approval(request_ids, user, level, action, comment):
+        """
+        Approves or rejects the `level` step of many requests at once.
+        Steps are locked with one SELECT ... FOR UPDATE SKIP LOCKED, so a
+        batch never waits on (or deadlocks with) another reviewer: steps
+        someone else is reviewing are reported instead. Steps are written
+        with one bulk_update and requests with one conditional UPDATE per
+        outcome (rejected, approved, or moved on to a given next level).
+        Returns {request_id: (ok, detail)}.
+        """
+        now = timezone.now()
+        results = {}
+
+        with transaction.atomic():
+            steps = list(
+                RequestQueryPlanner.with_next_level(
+                    ApprovalStep.objects.select_for_update(of=('self',), skip_locked=True)
+                    .select_related('request')
+                    .filter(request_id__in=request_ids, level=level)
+                )
+            )
+
+            to_update = []
+            for step in steps:
+                conflict = WorkflowEngine.review_conflict(step, level)
+                if conflict:
+                    results[step.request_id] = (False, conflict)
+                else:
+                    step.approver = user
+                    step.comments = comment
+                    step.reviewed_at = now
+                    step.updated_at = now
+                    step.status = ApprovalStep.Status.APPROVED if action == 'approve' else ApprovalStep.Status.REJECTED
+                    to_update.append(step)
+                    results[step.request_id] = (True, f"Request {action}ed successfully.")
+
+            for request_id in request_ids:
+                results.setdefault(
+                    request_id, (False, "This request is not at your approval level or is being reviewed by someone else.")
+                )
+
+            if not to_update:
+                return results
+
+            ApprovalStep.objects.bulk_update(to_update, ['approver', 'comments', 'reviewed_at', 'status', 'updated_at'])
+
+            # Requests decided by this review, and the others by the level they move on to
+            decided, moving = [], {}
+            for step in to_update:
+                if action == 'reject' or step.next_level is None:
+                    decided.append(step)
+                else:
+                    moving.setdefault(step.next_level, []).append(step)
+            moved = [step for group in moving.values() for step in group]
+            if decided:
+                approval_steps_reviewed.send(sender=WorkflowEngine, steps=decided, final=True)
+            if moved:
+                approval_steps_reviewed.send(sender=WorkflowEngine, steps=moved, final=False)
+
+            # The locked steps pin their requests' state, so every request must still match
+            changes = {'version': F('version') + 1, 'updated_at': now}
+            decided_ids = [step.request_id for step in decided]
+            guard = PurchaseRequest.objects.filter(current_level=level)
+            if action == 'reject':
+                new_status = PurchaseRequest.Status.REJECTED
+                Transitions.apply(
+                    guard.filter(id__in=decided_ids), PurchaseRequest.Status.PENDING, new_status,
+                    expected=len(decided_ids), **changes
+                )
+            elif decided_ids:
+                # Final Approval - one batch job renders every PO
+                new_status = PurchaseRequest.Status.APPROVED
+                Transitions.apply(
+                    guard.filter(id__in=decided_ids), PurchaseRequest.Status.PENDING, new_status,
+                    expected=len(decided_ids), po_status=PurchaseRequest.POStatus.QUEUED, **changes
+                )
+                JobQueue.enqueue(Job.Kind.RENDER_PO_BATCH, payload={'request_ids': decided_ids})
+            if decided_ids:
+                request_status_changed.send(
+                    sender=WorkflowEngine, request_ids=decided_ids,
+                    old_status=PurchaseRequest.Status.PENDING, new_status=new_status
+                )
+
+            for next_level, group in moving.items():
+                # Move the requests into the next level's inbox
+                Transitions.guarded_update(
+                    guard.filter(id__in=[step.request_id for step in group], status=PurchaseRequest.Status.PENDING),
+                    expected=len(group),
+                    current_level=next_level, **changes
+                )
+
+            # The rows were updated in bulk, so the events carry the new state explicitly
+            kind = RequestEvents.APPROVED if action == 'approve' else RequestEvents.REJECTED
+            chains = RequestEvents.chains([step.request_id for step in to_update])
+            events = [
+                RequestEvents.event(
+                    kind, step.request_id, step.request.created_by_id, new_status, level,
+                    chains[step.request_id], level=level
+                )
+                for step in decided
+            ]
+            events += [
+                RequestEvents.event(
+                    kind, step.request_id, step.request.created_by_id, PurchaseRequest.Status.PENDING,
+                    next_level, chains[step.request_id], level=level
+                )
+                for next_level, group in moving.items() for step in group
+            ]
+            RequestEvents.publish(events)
+
+        return results
+
+    @staticmethod
+    def generate_purchase_order(request_id):
+        """
+        Renders the PO PDF for an approved request and attaches it.
+        Idempotent: a request whose PO is already READY is left untouched.
+        """
+        WorkflowEngine.generate_purchase_orders([request_id])
+
+    @staticmethod
+    def purchase_order_payload(request):
+        """
+        PO payload dated with the day of the final approval rather than
+        today, so re-rendering the same approval always yields the same PO.
+        `request` must carry the `approved_at` annotation.
+        """
+        approved_on = timezone.localdate(request.approved_at) if request.approved_at else None
+        return DocumentProcessor.purchase_order_payload(request, po_date=approved_on)
+
+    @staticmethod
+    def generate_purchase_orders(request_ids):
+        """
+        Renders and attaches PO PDFs for many approved requests.
+
+        PO files are content-addressed (see `purchase_order_filename`):
+        requests already pointing at their current PO are skipped, a PO that
+        already exists in storage is reused, and only the rest is rendered,
+        fanned out over the worker's process pool.
+        """
+        storage = PurchaseRequest._meta.get_field('purchase_order_doc').storage
+        requests, payloads, names = [], [], []
+        queryset = RequestQueryPlanner.with_approved_at(PurchaseRequest.objects.filter(id__in=request_ids))
+        for req in queryset.order_by('id'):
+            payload = WorkflowEngine.purchase_order_payload(req)
+            name = req.purchase_order_doc.field.generate_filename(
+                req, DocumentProcessor.purchase_order_filename(payload)
+            )
+            if req.po_status == PurchaseRequest.POStatus.READY and req.purchase_order_doc.name == name:
+                continue
+            requests.append(req)
+            payloads.append(payload)
+            names.append(name)
+        if not requests:
+            return []
+
+        PurchaseRequest.objects.filter(id__in=[req.id for req in requests]).update(
+            po_status=PurchaseRequest.POStatus.RENDERING,
+            updated_at=timezone.now()
+        )
+
+        # 1. Render only the POs that are not in storage yet (ReportLab is CPU-bound)
+        missing = [i for i, name in enumerate(names) if not storage.exists(name)]
+        documents = offload_map(
+            render_purchase_order_pdf, [payloads[i] for i in missing], timeout=settings.PO_RENDER_TIMEOUT
+        )
+
+        # 2. Store the new files under their fixed names, then publish them on the rows
+        for i, pdf_bytes in zip(missing, documents):
+            stored = storage.save(names[i], ContentFile(pdf_bytes))
+            if stored != names[i]:
+                # A concurrent render stored the identical file first
+                storage.delete(stored)
+
+        now = timezone.now()
+        for req, name in zip(requests, names):
+            req.purchase_order_doc.name = name
+            req.po_status = PurchaseRequest.POStatus.READY
+            req.updated_at = now
+        PurchaseRequest.objects.bulk_update(requests, ['purchase_order_doc', 'po_status', 'updated_at'])
+        chains = RequestEvents.chains([req.id for req in requests])
+        RequestEvents.publish([RequestEvents.of(RequestEvents.PO_READY, req, chains[req.id]) for req in requests])
+        return requests
+
     @staticmethod
     def submit_receipt(request, receipt_file):
-        # 1. Save Receipt
-        request.receipt_file = receipt_file
-        
-        # 2. Run Validation Logic
-        validation_result = DocumentProcessor.validate_receipt(receipt_file, request.amount)
-        
-        # Store result in metadata
-        if request.ai_metadata:
-            request.ai_metadata['receipt_validation'] = validation_result
-        else:
-            request.ai_metadata = {'receipt_validation': validation_result}
-
-        request.status = PurchaseRequest.Status.COMPLETED
-        request.save()
-        return request
\ No newline at end of file
+        """
+        Stores the receipt, reconciles it against the PO and moves the
+        request APPROVED -> COMPLETED. A second submission racing this one
+        gets TransitionConflict; its stored file is left for gc_documents.
+        """
+        # 1. Reconcile against the PO total and the extracted proforma items
+        validation = DocumentProcessor.validate_receipt(
+            receipt_file, request.amount, (request.ai_metadata or {}).get('items', [])
+        )
+
+        # 2. Save the receipt, then move the request if it is still APPROVED
+        request.receipt_file.save(receipt_file.name, receipt_file, save=False)
+        now = timezone.now()
+        with transaction.atomic():
+            Transitions.apply(
+                PurchaseRequest.objects.filter(pk=request.pk),
+                PurchaseRequest.Status.APPROVED, PurchaseRequest.Status.COMPLETED,
+                receipt_file=request.receipt_file.name, receipt_validation_data=validation,
+                version=F('version') + 1, updated_at=now
+            )
+            old_status = request.status
+            request.status = PurchaseRequest.Status.COMPLETED
+            request.receipt_validation_data = validation
+            request.version += 1
+            request.updated_at = now
+            request_status_changed.send(
+                sender=WorkflowEngine, request_ids=[request.id],
+                old_status=old_status, new_status=request.status
+            )
+            levels = RequestEvents.chains([request.id])[request.id]
+            RequestEvents.publish([RequestEvents.of(RequestEvents.COMPLETED, request, levels)])
+        return request
+
+    @staticmethod
+    def reconcile_receipts(requests):
+        """
+        Re-runs receipt reconciliation for a batch of requests that have a
+        receipt (see match_receipts) and stores the results in
+        receipt_validation_data. Only the write runs in a transaction, not
+        the slow receipt extraction. Returns the updated requests.
+        """
+        WorkflowEngine.match_receipts(requests)
+        with transaction.atomic():
+            PurchaseRequest.objects.bulk_update(requests, ['receipt_validation_data', 'updated_at'])
+        return requests
+
+    @staticmethod
+    def match_receipts(requests):
+        """
+        Extracts each request's receipt and reconciles the batch in one
+        vectorized pass, setting receipt_validation_data on the instances
+        without saving them. Returns the requests.
+        """
+        cases = []
+        for req in requests:
+            try:
+                with req.receipt_file.open('rb') as receipt_file:
+                    receipt_data = DocumentProcessor.extract_receipt_data(receipt_file)
+            except FileNotFoundError:
+                receipt_data = None
+            cases.append((req.amount, (req.ai_metadata or {}).get('items', []), receipt_data))
+
+        results = ReconciliationEngine.reconcile_batch(cases)
+
+        now = timezone.now()
+        for req, (_, _, receipt_data), result in zip(requests, cases, results):
+            if receipt_data is None:
+                result = {
+                    "status": "ERROR",
+                    "message": "Receipt file is missing from storage.",
+                    "engine_version": result["engine_version"],
+                    "discrepancies": [],
+                }
+            req.receipt_validation_data = result
+            req.updated_at = now
+        return requests
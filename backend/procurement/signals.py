@@ -0,0 +1,23 @@
+from django.dispatch import Signal
+
+# Sent by WorkflowEngine inside the transaction that makes the change, so
+# receivers (e.g. analytics rollups) commit or roll back together with it.
+# Bulk operations send one signal per batch, never one per row.
+
+# requests: the new PurchaseRequests (created_by loaded); one for a
+# submission, a whole chunk for an import
+request_created = Signal()
+
+# request_ids: requests that moved from old_status to new_status
+request_status_changed = Signal()
+
+# changes: (request_id, old_vendor, new_vendor) tuples for requests whose
+# AI extraction found a (different) vendor
+request_vendor_changed = Signal()
+
+# request_ids: requests whose AI extraction completed (ai_metadata replaced)
+request_extracted = Signal()
+
+# steps: reviewed ApprovalSteps (request loaded); final: True when this
+# review decided the requests (a rejection or the last approval level)
+approval_steps_reviewed = Signal()
@@ -0,0 +1,63 @@
+from django.utils import timezone
+
+from .jobs import register
+from .models import Job, PurchaseRequest
+from .services import WorkflowEngine
+
+
+def _mark_extraction_failed(job, exc):
+    PurchaseRequest.objects.filter(pk=job.request_id).update(
+        extraction_status=PurchaseRequest.ExtractionStatus.FAILED,
+        updated_at=timezone.now()
+    )
+    # An auto-approved request still needs its PO, without extracted data
+    WorkflowEngine.queue_auto_approved_pos(PurchaseRequest.objects.filter(pk=job.request_id))
+
+
+@register(Job.Kind.EXTRACT_PROFORMA, on_failure=_mark_extraction_failed)
+def extract_proforma(job):
+    """Runs AI extraction for the job's request and stores the result."""
+    WorkflowEngine.complete_extraction(job.request_id)
+
+
+def _mark_extraction_batch_failed(job, exc):
+    failed = PurchaseRequest.objects.filter(
+        pk__in=job.payload.get('request_ids', [])
+    ).exclude(
+        extraction_status=PurchaseRequest.ExtractionStatus.COMPLETED
+    )
+    WorkflowEngine.queue_auto_approved_pos(list(failed))
+    failed.update(extraction_status=PurchaseRequest.ExtractionStatus.FAILED, updated_at=timezone.now())
+
+
+@register(Job.Kind.EXTRACT_PROFORMA_BATCH, on_failure=_mark_extraction_batch_failed)
+def extract_proforma_batch(job):
+    """Extracts the proformas of an import batch. Already extracted requests are skipped on retry."""
+    WorkflowEngine.complete_extractions(job.payload.get('request_ids', []))
+
+
+def _mark_po_failed(job, exc):
+    PurchaseRequest.objects.filter(pk=job.request_id).update(
+        po_status=PurchaseRequest.POStatus.FAILED,
+        updated_at=timezone.now()
+    )
+
+
+@register(Job.Kind.RENDER_PO, on_failure=_mark_po_failed)
+def render_purchase_order(job):
+    """Renders and stores the PO PDF. Safe to retry."""
+    WorkflowEngine.generate_purchase_order(job.request_id)
+
+
+def _mark_po_batch_failed(job, exc):
+    PurchaseRequest.objects.filter(
+        pk__in=job.payload.get('request_ids', [])
+    ).exclude(
+        po_status=PurchaseRequest.POStatus.READY
+    ).update(po_status=PurchaseRequest.POStatus.FAILED, updated_at=timezone.now())
+
+
+@register(Job.Kind.RENDER_PO_BATCH, on_failure=_mark_po_batch_failed)
+def render_purchase_order_batch(job):
+    """Renders the POs of a bulk final approval. Already rendered POs are skipped on retry."""
+    WorkflowEngine.generate_purchase_orders(job.payload.get('request_ids', []))
@@ -1,9 +1,49 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+import re
+import zipfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import tempfile
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connection
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.core.files.uploadedfile import SimpleUploadedFile
+from core.instrumentation import HISTOGRAMS
 from core.models import User
-from .models import PurchaseRequest, ApprovalStep
+from core.serializers import CustomTokenObtainPairSerializer
+from .events import RequestEvents, StreamTickets, hub
+from .exceptions import TransitionConflict
+from .models import PurchaseRequest, ApprovalLevel, ApprovalStep, Job, RequestFlag
+from .policies import ApprovalPolicy
+from .query_planner import RequestQueryPlanner
+from .detection import DuplicateDetector
+from .transitions import Transitions
+from .services import WorkflowEngine
+from .benchmark import BenchmarkRunner, Workload, compare
+from .factories import seed_users, seed_purchase_requests
+from .jobs import JobQueue
+from .utils.ai_processor import EXTRACTOR_VERSION, DocumentProcessor, render_purchase_order_pdf
+from .utils.extraction_cache import ExtractionCache
+from .utils.reconciliation import ReconciliationEngine, RECONCILIATION_VERSION
+from .utils.audit_export import AuditExport, spreadsheet_safe
+from .utils.streaming import streaming_response
+from .utils import po_export
 
 class ProcurementWorkflowTests(TestCase):
     def setUp(self):
@@ -27,7 +67,7 @@ class ProcurementWorkflowTests(TestCase):
         
         # 2. Create a Mock PDF File
         self.proforma = SimpleUploadedFile(
-            "quote.pdf", b"dummy_content", content_type="application/pdf"
+            "quote.pdf", b"%PDF-1.4 dummy_content", content_type="application/pdf"
         )
 
     def test_1_create_request_with_ai(self):
@@ -52,11 +92,20 @@ class ProcurementWorkflowTests(TestCase):
         # 2. Check Database
         req = PurchaseRequest.objects.get(title="MacBook Pro")
         self.assertEqual(req.status, 'PENDING')
+        self.assertEqual(req.extraction_status, 'PENDING')
         
-        # 3. Verify AI Extraction (Mock AI should have run)
+        # 3. Run the background worker
+        self.assertEqual(JobQueue.run_pending(), 1)
+        req.refresh_from_db()
+
+        # 4. Verify AI Extraction (Mock AI should have run)
+        self.assertEqual(req.extraction_status, 'COMPLETED')
         self.assertIsNotNone(req.ai_metadata)
         self.assertIn('vendor_name', req.ai_metadata) # Check if AI found a vendor
 
+        # 5. The upload was hashed while it streamed to disk
+        self.assertEqual(req.proforma_sha256, hashlib.sha256(b"%PDF-1.4 dummy_content").hexdigest())
+
     def test_2_staff_visibility_permission(self):
         """
         Test that Staff can ONLY see their own requests.
@@ -78,8 +127,8 @@ class ProcurementWorkflowTests(TestCase):
 
         # Alice should see 1 request, not 2
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], "Alice's Request")
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], "Alice's Request")
 
     def test_3_full_approval_workflow(self):
         """
@@ -121,8 +170,17 @@ class ProcurementWorkflowTests(TestCase):
         
         # CHECK: Is Status APPROVED?
         self.assertEqual(req.status, 'APPROVED')
+
+        # CHECK: PO rendering is queued rather than done in the request
+        self.assertEqual(req.po_status, 'QUEUED')
+        self.assertFalse(bool(req.purchase_order_doc))
+
+        # --- STEP 4: Worker renders the PO ---
+        JobQueue.run_pending()
+        req.refresh_from_db()
         
         # CHECK: Was PDF Generated?
+        self.assertEqual(req.po_status, 'READY')
         self.assertTrue(bool(req.purchase_order_doc), "PDF should be generated after L2 approval")
 
     def test_4_rejection_stops_workflow(self):
@@ -145,4 +203,1626 @@ class ProcurementWorkflowTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         req.refresh_from_db()
-        self.assertEqual(req.status, 'REJECTED')
\ No newline at end of file
+        self.assertEqual(req.status, 'REJECTED')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='alice', password='password', role=User.Role.STAFF
+        )
+        self.req = PurchaseRequest.objects.create(
+            title="Queued", amount=100, created_by=self.staff, status="PENDING",
+            proforma_file=SimpleUploadedFile("quote.pdf", b"dummy_content")
+        )
+
+    def test_job_state_is_exposed(self):
+        """
+        The jobs endpoint reports queued extraction work for a request.
+        """
+        JobQueue.enqueue(Job.Kind.EXTRACT_PROFORMA, request=self.req)
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(f'/api/requests/{self.req.id}/jobs/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['kind'], 'EXTRACT_PROFORMA')
+        self.assertEqual(response.data[0]['status'], 'QUEUED')
+
+    def test_failed_job_retries_then_marks_extraction_failed(self):
+        """
+        A failing job is retried with backoff and finally marks the request FAILED.
+        """
+        self.req.proforma_file.delete(save=True)
+        job = JobQueue.enqueue(Job.Kind.EXTRACT_PROFORMA, request=self.req, max_attempts=2)
+
+        with self.assertLogs('procurement.jobs', level='ERROR'):
+            JobQueue.run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'QUEUED')
+        self.assertEqual(job.attempts, 1)
+
+        # Make the retry due immediately
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        with self.assertLogs('procurement.jobs', level='ERROR'):
+            JobQueue.run_pending()
+        job.refresh_from_db()
+        self.req.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(self.req.extraction_status, 'FAILED')
+
+    def test_abandoned_job_is_requeued_until_its_attempts_run_out(self):
+        """
+        A job whose worker died goes back to the queue, and is marked FAILED
+        (running its failure handler) once it was abandoned on its last attempt.
+        """
+        job = JobQueue.enqueue(Job.Kind.EXTRACT_PROFORMA, request=self.req, max_attempts=2)
+        long_ago = timezone.now() - timedelta(hours=1)
+
+        JobQueue.claim(1)
+        Job.objects.filter(pk=job.pk).update(updated_at=long_ago)
+        self.assertEqual(JobQueue.requeue_stale(600), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'QUEUED')
+
+        JobQueue.claim(1)
+        Job.objects.filter(pk=job.pk).update(updated_at=long_ago)
+        with self.assertLogs('procurement.jobs', level='ERROR'):
+            self.assertEqual(JobQueue.requeue_stale(600), 1)
+        job.refresh_from_db()
+        self.req.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.attempts, 2)
+        self.assertIn('No heartbeat', job.last_error)
+        self.assertEqual(self.req.extraction_status, 'FAILED')
+
+    def test_heartbeat_keeps_a_long_job_running(self):
+        """
+        Staleness is measured from the last heartbeat, not from when the job started.
+        """
+        job = JobQueue.enqueue(Job.Kind.EXTRACT_PROFORMA, request=self.req)
+        JobQueue.claim(1)
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.filter(pk=job.pk).update(started_at=long_ago, updated_at=long_ago)
+
+        self.assertEqual(JobQueue.heartbeat([job.pk]), 1)
+        self.assertEqual(JobQueue.requeue_stale(600), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'RUNNING')
+
+    def test_po_render_job_is_idempotent(self):
+        """
+        Re-running a render job for a READY request does not write a new PDF.
+        """
+        self.req.status = PurchaseRequest.Status.APPROVED
+        self.req.save()
+        JobQueue.enqueue(Job.Kind.RENDER_PO, request=self.req)
+        JobQueue.run_pending()
+        self.req.refresh_from_db()
+        first_doc = self.req.purchase_order_doc.name
+
+        JobQueue.enqueue(Job.Kind.RENDER_PO, request=self.req)
+        JobQueue.run_pending()
+        self.req.refresh_from_db()
+
+        self.assertEqual(self.req.po_status, 'READY')
+        self.assertEqual(self.req.purchase_order_doc.name, first_doc)
+        self.assertEqual(self.req.jobs.filter(status='SUCCEEDED').count(), 2)
+
+
+class BulkReviewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='alice', password='password', role=User.Role.STAFF
+        )
+        self.approver_l1 = User.objects.create_user(
+            username='bob', password='password', role=User.Role.APPROVER_L1
+        )
+        self.approver_l2 = User.objects.create_user(
+            username='charlie', password='password', role=User.Role.APPROVER_L2
+        )
+        self.requests = []
+        for i in range(3):
+            req = PurchaseRequest.objects.create(
+                title=f"Bulk {i}", amount=100 + i, created_by=self.staff, status="PENDING",
+                proforma_file=SimpleUploadedFile("quote.pdf", b"dummy_content")
+            )
+            ApprovalStep.objects.create(request=req, level=1, status="PENDING")
+            ApprovalStep.objects.create(request=req, level=2, status="PENDING")
+            self.requests.append(req)
+
+    def bulk_review(self, user, ids, action):
+        self.client.force_authenticate(user=user)
+        return self.client.post(
+            '/api/requests/bulk-review/',
+            {'ids': ids, 'action': action, 'comment': 'Month end'},
+            format='json'
+        )
+
+    def test_bulk_approval_through_both_levels(self):
+        """
+        L1 and L2 clear several requests at once; L2 queues a single PO batch job.
+        """
+        ids = [req.id for req in self.requests]
+
+        response = self.bulk_review(self.approver_l1, ids, 'approve')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['processed'], 3)
+        self.assertEqual(
+            ApprovalStep.objects.filter(level=1, status='APPROVED', approver=self.approver_l1).count(), 3
+        )
+
+        response = self.bulk_review(self.approver_l2, ids, 'approve')
+        self.assertEqual(response.data['processed'], 3)
+        self.assertEqual(Job.objects.filter(kind=Job.Kind.RENDER_PO_BATCH).count(), 1)
+
+        JobQueue.run_pending()
+        for req in self.requests:
+            req.refresh_from_db()
+            self.assertEqual(req.status, 'APPROVED')
+            self.assertEqual(req.po_status, 'READY')
+            self.assertTrue(bool(req.purchase_order_doc))
+
+    def test_bulk_review_reports_per_item_results(self):
+        """
+        Already reviewed and unknown ids are reported individually without
+        blocking the rest of the batch.
+        """
+        reviewed, pending, _ = self.requests
+        ApprovalStep.objects.filter(request=reviewed, level=1).update(status='REJECTED')
+
+        response = self.bulk_review(self.approver_l1, [reviewed.id, pending.id, 999999], 'reject')
+        results = {r['id']: r for r in response.data['results']}
+
+        self.assertTrue(results[pending.id]['success'])
+        self.assertFalse(results[reviewed.id]['success'])
+        self.assertEqual(results[999999]['detail'], "Not found.")
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'REJECTED')
+
+    def test_l2_inbox_follows_current_level(self):
+        """
+        L2 only sees a request once L1 approved it, and sees it exactly once.
+        """
+        first, second, _ = self.requests
+        self.client.force_authenticate(user=self.approver_l2)
+        self.assertEqual(self.client.get('/api/requests/').data['results'], [])
+
+        self.bulk_review(self.approver_l1, [first.id, second.id], 'approve')
+        first.refresh_from_db()
+        self.assertEqual(first.current_level, 2)
+
+        self.client.force_authenticate(user=self.approver_l2)
+        listed = [r['id'] for r in self.client.get('/api/requests/').data['results']]
+        self.assertEqual(sorted(listed), sorted([first.id, second.id]))
+
+    def test_inbox_skips_levels_missing_from_the_chain(self):
+        """
+        A request routed straight to L2 is in L2's inbox but never in L1's,
+        even though its current level is past level 1.
+        """
+        skipping = PurchaseRequest.objects.create(
+            title="Straight to L2", amount=100, created_by=self.staff, status="PENDING", current_level=2,
+            proforma_file=SimpleUploadedFile("quote.pdf", b"dummy_content")
+        )
+        ApprovalStep.objects.create(request=skipping, level=2, status="PENDING")
+
+        self.client.force_authenticate(user=self.approver_l1)
+        listed = [r['id'] for r in self.client.get('/api/requests/').data['results']]
+        self.assertNotIn(skipping.id, listed)
+        self.assertEqual(self.client.get(f'/api/requests/{skipping.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.approver_l2)
+        listed = [r['id'] for r in self.client.get('/api/requests/').data['results']]
+        self.assertEqual(listed, [skipping.id])
+
+    def test_staff_cannot_bulk_review(self):
+        response = self.bulk_review(self.staff, [self.requests[0].id], 'approve')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query-count budgets per endpoint. Budgets must hold regardless of how
+    many requests exist, so an N+1 regression fails here.
+    """
+    QUERY_BUDGETS = {
+        'list': 2,         # ETag aggregate, one page of requests JOIN created_by
+        'retrieve': 2,
+        'review': 8,       # request, step, SAVEPOINT, UPDATE step, cycle-time upsert, UPDATE stage, event chain, RELEASE
+        'bulk_review': 8,  # visible ids, SAVEPOINT, locked steps, bulk UPDATE, cycle-time upsert, UPDATE stage, event chains, RELEASE
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='alice', password='password', role=User.Role.STAFF
+        )
+        self.approver_l1 = User.objects.create_user(
+            username='bob', password='password', role=User.Role.APPROVER_L1
+        )
+        self.approver_l2 = User.objects.create_user(
+            username='charlie', password='password', role=User.Role.APPROVER_L2
+        )
+        self.finance = User.objects.create_user(
+            username='dana', password='password', role=User.Role.FINANCE
+        )
+
+    def seed(self, count, l1_status='APPROVED', status='PENDING'):
+        created = []
+        for i in range(count):
+            req = PurchaseRequest.objects.create(
+                title=f"Item {i}", amount=10, created_by=self.staff, status=status,
+                current_level=2 if l1_status == 'APPROVED' else 1,
+                proforma_file=SimpleUploadedFile("quote.pdf", b"dummy_content")
+            )
+            ApprovalStep.objects.create(
+                request=req, level=1, status=l1_status, approver=self.approver_l1
+            )
+            ApprovalStep.objects.create(request=req, level=2, status='PENDING')
+            created.append(req)
+        return created
+
+    def assertWithinBudget(self, endpoint, func):
+        with CaptureQueriesContext(connection) as ctx:
+            response = func()
+        self.assertLess(response.status_code, 400, response.data)
+        self.assertLessEqual(
+            len(ctx.captured_queries), self.QUERY_BUDGETS[endpoint],
+            f"{endpoint} exceeded its query budget:\n" +
+            "\n".join(q['sql'] for q in ctx.captured_queries)
+        )
+        return response
+
+    def test_list_budget_is_constant_for_every_role(self):
+        for batch in (2, 10):
+            self.seed(batch)
+            for user in (self.staff, self.approver_l1, self.approver_l2):
+                self.client.force_authenticate(user=user)
+                self.assertWithinBudget('list', lambda: self.client.get('/api/requests/'))
+
+        self.seed(5, status='APPROVED')
+        self.client.force_authenticate(user=self.finance)
+        self.assertWithinBudget('list', lambda: self.client.get('/api/requests/'))
+
+    def test_list_is_cursor_paginated_and_slim(self):
+        """
+        Pages follow each other by cursor without gaps or repeats, list items
+        leave out heavy fields, and the detail view keeps the full payload.
+        """
+        ids = {req.id for req in self.seed(5)}
+        self.client.force_authenticate(user=self.staff)
+
+        seen = []
+        url = '/api/requests/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('ai_metadata', response.data['results'][0])
+            self.assertNotIn('approval_steps', response.data['results'][0])
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, sorted(ids, reverse=True))
+
+        detail = self.client.get(f'/api/requests/{seen[0]}/')
+        self.assertIn('ai_metadata', detail.data)
+        self.assertEqual(len(detail.data['approval_steps']), 2)
+
+    def test_retrieve_budget(self):
+        req = self.seed(1)[0]
+        self.client.force_authenticate(user=self.staff)
+        self.assertWithinBudget('retrieve', lambda: self.client.get(f'/api/requests/{req.id}/'))
+
+    def test_review_budget(self):
+        req = self.seed(1, l1_status='PENDING')[0]
+        self.client.force_authenticate(user=self.approver_l1)
+        self.assertWithinBudget('review', lambda: self.client.patch(
+            f'/api/requests/{req.id}/review/', {'action': 'approve'}, format='json'
+        ))
+
+    def test_bulk_review_budget_is_constant(self):
+        for batch in (2, 10):
+            ids = [req.id for req in self.seed(batch, l1_status='PENDING')]
+            self.client.force_authenticate(user=self.approver_l1)
+            self.assertWithinBudget('bulk_review', lambda: self.client.post(
+                '/api/requests/bulk-review/', {'ids': ids, 'action': 'approve'}, format='json'
+            ))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'extraction': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'extraction-tests'},
+})
+class ExtractionCacheTests(TestCase):
+    def setUp(self):
+        ExtractionCache.backend().clear()
+
+    def test_identical_uploads_are_extracted_once(self):
+        """
+        Re-uploading the same bytes is served from the cache and counted as a hit.
+        """
+        result = {"vendor_name": "Cached Vendor"}
+        with mock.patch.object(DocumentProcessor, '_extract_proforma', return_value=result) as extract:
+            first = DocumentProcessor.extract_proforma_data(SimpleUploadedFile("a.pdf", b"same quote"))
+            second = DocumentProcessor.extract_proforma_data(SimpleUploadedFile("b.pdf", b"same quote"))
+            DocumentProcessor.extract_proforma_data(SimpleUploadedFile("c.pdf", b"other quote"))
+
+        self.assertEqual(first, second)
+        self.assertEqual(extract.call_count, 2)
+        self.assertEqual(ExtractionCache.stats(), {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333})
+
+    def test_new_extractor_version_invalidates_entries(self):
+        with mock.patch.object(DocumentProcessor, '_extract_proforma', return_value={}) as extract:
+            DocumentProcessor.extract_proforma_data(SimpleUploadedFile("a.pdf", b"quote"))
+            with mock.patch('procurement.utils.ai_processor.EXTRACTOR_VERSION', '999'):
+                DocumentProcessor.extract_proforma_data(SimpleUploadedFile("a.pdf", b"quote"))
+
+        self.assertEqual(extract.call_count, 2)
+
+
+class UploadHandlingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(
+            username='alice', password='password', role=User.Role.STAFF
+        )
+        self.client.force_authenticate(user=self.staff)
+
+    def post_request(self, content, name="quote.pdf"):
+        data = {
+            "title": "Monitor",
+            "amount": 300.00,
+            "proforma_file": SimpleUploadedFile(name, content, content_type="application/pdf")
+        }
+        return self.client.post('/api/requests/', data, format='multipart')
+
+    @override_settings(PROCUREMENT_MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        response = self.post_request(b"%PDF-1.4 " + b"x" * 4096)
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(PurchaseRequest.objects.exists())
+
+    def test_non_document_upload_is_rejected(self):
+        """
+        The declared content type is ignored; the leading bytes decide.
+        """
+        response = self.post_request(b"MZ\x90\x00 not a pdf", name="quote.pdf")
+
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertFalse(PurchaseRequest.objects.exists())
+
+
+class ReconciliationTests(TestCase):
+    PO_ITEMS = [
+        {"description": "Server Rack", "quantity": 1, "price": 1200.00},
+        {"description": "Cables", "quantity": 50, "price": 10.00},
+    ]
+
+    def receipt(self, items, total=None):
+        return {"items": items, "total": total}
+
+    def codes(self, result):
+        return sorted(d['code'] for d in result['discrepancies'])
+
+    def test_matching_receipt(self):
+        """
+        Descriptions are matched fuzzily and amounts within tolerance pass.
+        """
+        result = ReconciliationEngine.reconcile(1700, self.PO_ITEMS, self.receipt([
+            {"description": "server rack 42U", "quantity": 1, "price": 1200.30},
+            {"description": "CABLES", "quantity": 50, "price": 10.00},
+        ]))
+
+        self.assertEqual(result['status'], 'MATCH')
+        self.assertEqual(result['receipt_total'], 1700.30)
+        self.assertEqual(len(result['matched_items']), 2)
+
+    def test_discrepancies_are_structured(self):
+        result = ReconciliationEngine.reconcile(1700, self.PO_ITEMS, self.receipt([
+            {"description": "Server Rack", "quantity": 2, "price": 1500.00},
+            {"description": "Extended Warranty", "quantity": 1, "price": 99.00},
+        ]))
+
+        self.assertEqual(result['status'], 'MISMATCH')
+        self.assertEqual(self.codes(result), [
+            'MISSING_ITEM', 'PRICE_MISMATCH', 'QUANTITY_MISMATCH', 'TOTAL_MISMATCH', 'UNEXPECTED_ITEM'
+        ])
+        price = next(d for d in result['discrepancies'] if d['code'] == 'PRICE_MISMATCH')
+        self.assertEqual((price['item'], price['expected'], price['actual']), ('Server Rack', 1200.00, 1500.00))
+
+    def test_batch_cases_do_not_match_each_other(self):
+        """
+        A receipt line can only match PO lines of its own request.
+        """
+        results = ReconciliationEngine.reconcile_batch([
+            (1200, self.PO_ITEMS[:1], self.receipt([{"description": "Cables", "quantity": 50, "price": 10.00}], 500)),
+            (500, self.PO_ITEMS[1:], self.receipt([{"description": "Cables", "quantity": 50, "price": 10.00}], 500)),
+            (300, [], self.receipt([], 300)),
+        ])
+
+        self.assertEqual(self.codes(results[0]), ['MISSING_ITEM', 'TOTAL_MISMATCH', 'UNEXPECTED_ITEM'])
+        self.assertEqual(results[1]['status'], 'MATCH')
+        # Without extracted PO items only the total is checked
+        self.assertEqual(results[2]['status'], 'MATCH')
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'extraction': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reconcile-tests'},
+    })
+    def test_command_stores_results(self):
+        staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        req = PurchaseRequest.objects.create(
+            title="Rack", amount=1700, created_by=staff, status="APPROVED",
+            ai_metadata={"items": self.PO_ITEMS},
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote"),
+            receipt_file=SimpleUploadedFile("receipt.pdf", b"%PDF-1.4 receipt"),
+        )
+        receipt = self.receipt([{"description": "Server Rack", "quantity": 1, "price": 1200.00}], 1200)
+        test_depth, extraction_depths = len(connection.atomic_blocks), []
+
+        def extract(*args):
+            extraction_depths.append(len(connection.atomic_blocks))
+            return receipt
+
+        with mock.patch.object(DocumentProcessor, '_extract_receipt', side_effect=extract):
+            call_command('reconcile_receipts', '--dry-run', stdout=io.StringIO())
+            req.refresh_from_db()
+            self.assertEqual(req.receipt_validation_data, {})
+
+            call_command('reconcile_receipts', stdout=io.StringIO())
+        req.refresh_from_db()
+
+        self.assertEqual(req.receipt_validation_data['engine_version'], RECONCILIATION_VERSION)
+        self.assertEqual(self.codes(req.receipt_validation_data), ['MISSING_ITEM', 'TOTAL_MISMATCH'])
+        # Read once (the real run hits the extraction cache), outside any transaction
+        self.assertEqual(extraction_depths, [test_depth])
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'extraction': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reconcile-tests'},
+    })
+    def test_unreadable_receipt_is_not_reconciled(self):
+        staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        req = PurchaseRequest.objects.create(
+            title="Rack", amount=1700, created_by=staff, status="APPROVED",
+            ai_metadata={"items": self.PO_ITEMS},
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote"),
+            receipt_file=SimpleUploadedFile("receipt.pdf", b"%PDF-1.4 not really a receipt"),
+        )
+
+        call_command('reconcile_receipts', stdout=io.StringIO())
+        req.refresh_from_db()
+
+        self.assertEqual(req.receipt_validation_data['status'], 'UNVERIFIED')
+        self.assertEqual(req.receipt_validation_data['discrepancies'], [])
+        self.assertIsNone(req.receipt_validation_data['receipt_total'])
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'extraction': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-tests'},
+})
+class BenchmarkTests(TestCase):
+    def test_mixed_workload_report(self):
+        """
+        A small replay reports percentiles and query counts per operation.
+        """
+        users = seed_users(prefix='bench')
+        seed_purchase_requests(60, users)
+        workload = Workload(users, mix={'list': 3, 'create': 1, 'review': 1})
+
+        scenario = BenchmarkRunner(workload, iterations=30, warmup=2).run(threads=1)
+
+        self.assertEqual(scenario['requests'], 30)
+        self.assertEqual(set(scenario['operations']), {'list', 'create', 'review'})
+        listing = scenario['operations']['list']
+        self.assertEqual(listing['errors'], 0)
+        self.assertEqual(listing['queries_max'], 2)
+        self.assertLessEqual(listing['p50_ms'], listing['p99_ms'])
+
+    def test_seed_and_workload_follow_the_approval_policy(self):
+        ApprovalLevel.objects.filter(level=2).update(min_amount=1000)
+        ApprovalLevel.objects.create(level=3, name='Finance', approver_role=User.Role.FINANCE, min_amount=20000)
+        users = seed_users(prefix='bench')
+        seed_purchase_requests(80, users, seed=1)
+
+        policy = ApprovalPolicy.current()
+        for req in PurchaseRequest.objects.prefetch_related('approval_steps'):
+            levels = [step.level for step in req.approval_steps.all()]
+            self.assertEqual(levels, policy.levels_for(req.amount))
+            self.assertIn(req.current_level, levels or [0])
+        self.assertTrue(ApprovalStep.objects.filter(level=3).exists())
+
+        workload = Workload(users, mix={'review': 1})
+        self.assertEqual(set(workload.pending), {1, 2, 3})
+        scenario = BenchmarkRunner(workload, iterations=40, warmup=0).run(threads=1)
+        self.assertEqual(scenario['operations']['review']['errors'], 0)
+
+    def test_baseline_comparison(self):
+        def report(p95, queries):
+            return {"scenarios": {"threads=1": {"operations": {
+                "list": {"p95_ms": p95, "queries_max": queries}
+            }}}}
+
+        self.assertEqual(compare(report(11.0, 1), report(10.0, 1), tolerance=0.25), [])
+        self.assertEqual(len(compare(report(20.0, 2), report(10.0, 1), tolerance=0.25)), 2)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        for histogram in HISTOGRAMS:
+            histogram.reset()
+        self.staff = User.objects.create_user(
+            username='alice', password='password', role=User.Role.STAFF
+        )
+
+    def test_metrics_disabled_by_default(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_METRICS_TOKEN='')
+    def test_metrics_without_token_are_staff_only(self):
+        client = APIClient()
+        self.assertEqual(client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        client.force_login(self.staff)
+        self.assertEqual(client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        client.force_login(User.objects.create_user(username='admin', password='password', is_staff=True))
+        self.assertEqual(client.get('/metrics').status_code, status.HTTP_200_OK)
+
+    def test_request_metrics_per_view_and_action(self):
+        """
+        Each request is recorded under its view name and DRF action, and a
+        profiled request leaves a cProfile dump behind.
+        """
+        with tempfile.TemporaryDirectory() as profile_dir, override_settings(
+            INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_PROFILE_RATE=1.0, INSTRUMENTATION_PROFILE_DIR=profile_dir,
+            INSTRUMENTATION_METRICS_TOKEN='scrape-token'
+        ):
+            client = APIClient()
+            client.force_authenticate(user=self.staff)
+            self.assertEqual(client.get('/api/requests/').status_code, status.HTTP_200_OK)
+            self.assertEqual(client.get('/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+            metrics = client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token').content.decode()
+            profiles = os.listdir(profile_dir)
+
+        labels = 'view="requests-list",action="list",method="GET"'
+        self.assertIn(f'p2p_request_duration_seconds_count{{{labels}}} 1', metrics)
+        # ETag aggregate + page query
+        self.assertIn(f'p2p_request_sql_queries_bucket{{{labels},le="1.0"}} 0', metrics)
+        self.assertIn(f'p2p_request_sql_queries_bucket{{{labels},le="2.0"}} 1', metrics)
+        self.assertIn(f'p2p_request_serializer_duration_seconds_count{{{labels}}} 1', metrics)
+        self.assertTrue(any(name.startswith('requests-list.list.') for name in profiles))
+
+
+class PurchaseOrderExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.finance = User.objects.create_user(username='dave', password='password', role=User.Role.FINANCE)
+        approved_at = timezone.make_aware(datetime(2024, 5, 14, 10, 0))
+
+        self.requests = []
+        for title in ("Server Rack", "Cables", "Too Late"):
+            req = PurchaseRequest.objects.create(
+                title=title, amount=100, created_by=self.staff, status="APPROVED", current_level=2,
+                ai_metadata={"vendor_name": "Acme Hardware"},
+                proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+            )
+            ApprovalStep.objects.create(request=req, level=1, status='APPROVED', reviewed_at=approved_at)
+            ApprovalStep.objects.create(
+                request=req, level=2, status='APPROVED',
+                reviewed_at=approved_at if title != "Too Late" else approved_at.replace(month=6)
+            )
+            self.requests.append(req)
+
+        # Only the first PO has been rendered and stored so far
+        WorkflowEngine.generate_purchase_orders([self.requests[0].id])
+        self.client.force_authenticate(user=self.finance)
+
+    def download(self, **params):
+        response = self.client.get('/api/requests/purchase-orders/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content)
+
+    def test_zip_streams_one_entry_per_po(self):
+        archive = zipfile.ZipFile(io.BytesIO(self.download(month='2024-05')))
+
+        self.assertEqual(archive.namelist(), [f"PO-{req.id:05d}.pdf" for req in self.requests[:2]])
+        stored = self.requests[0]
+        stored.refresh_from_db()
+        with stored.purchase_order_doc.open('rb') as fh:
+            self.assertEqual(archive.read(f"PO-{stored.id:05d}.pdf"), fh.read())
+        # The missing PO was rendered on the fly
+        self.assertTrue(archive.read(f"PO-{self.requests[1].id:05d}.pdf").startswith(b'%PDF'))
+
+    def test_combined_pdf_has_a_page_per_po(self):
+        document = self.download(month='2024-05', bundle='pdf')
+
+        self.assertTrue(document.startswith(b'%PDF'))
+        self.assertEqual(len(re.findall(rb'/Type /Page\b(?!s)', document)), 2)
+
+    async def test_asgi_zip_streams_before_rendering_every_po(self):
+        rendered, original = [], po_export.render_purchase_order_pdf
+
+        def render(payload):
+            rendered.append(payload)
+            return original(payload)
+
+        token = CustomTokenObtainPairSerializer.get_token(self.finance).access_token
+        with mock.patch.object(po_export, 'render_purchase_order_pdf', render):
+            response = await self.async_client.get(
+                '/api/requests/purchase-orders/export/', {'month': '2024-05'},
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            stream = aiter(response.streaming_content)
+            self.assertTrue((await anext(stream)).startswith(b'PK'))
+            # The stored PO went out before the missing one was rendered
+            self.assertEqual(rendered, [])
+            remaining = [chunk async for chunk in stream]
+        self.assertEqual(len(rendered), 1)
+        self.assertTrue(remaining)
+
+    def test_export_is_finance_only_and_validated(self):
+        url = '/api/requests/purchase-orders/export/'
+        self.assertEqual(self.client.get(url, {'month': 'May'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'month': '2023-01'}).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get(url, {'month': '2024-05'}).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ContentAddressedPurchaseOrderTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=self.media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.request = PurchaseRequest.objects.create(
+            title="Server Rack", amount=100, created_by=staff, status="APPROVED", current_level=2,
+            ai_metadata={"vendor_name": "Acme Hardware"},
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+        )
+        ApprovalStep.objects.create(
+            request=self.request, level=2, status='APPROVED',
+            reviewed_at=timezone.make_aware(datetime(2024, 5, 14, 10, 0))
+        )
+
+    def render(self):
+        with mock.patch('procurement.services.render_purchase_order_pdf',
+                        wraps=render_purchase_order_pdf) as render:
+            WorkflowEngine.generate_purchase_orders([self.request.id])
+        self.request.refresh_from_db()
+        return render.call_count
+
+    def test_rendering_is_deterministic(self):
+        payload = DocumentProcessor.purchase_order_payload(self.request)
+        self.assertEqual(render_purchase_order_pdf(payload), render_purchase_order_pdf(payload))
+
+    def test_identical_po_is_not_rendered_again(self):
+        self.assertEqual(self.render(), 1)
+        name = self.request.purchase_order_doc.name
+        self.assertRegex(name, rf"^pos/PO-{self.request.id:05d}-[0-9a-f]{{16}}\.pdf$")
+        # Dated with the approval day, not the day it was rendered
+        payload = DocumentProcessor.purchase_order_payload(self.request, po_date=datetime(2024, 5, 14).date())
+        self.assertEqual(name, f"pos/{DocumentProcessor.purchase_order_filename(payload)}")
+
+        # A retry of a finished PO does nothing
+        self.assertEqual(self.render(), 0)
+
+        # After a reset the stored file is reused instead of rendered again
+        PurchaseRequest.objects.filter(pk=self.request.pk).update(purchase_order_doc='', po_status='PENDING')
+        self.assertEqual(self.render(), 0)
+        self.assertEqual(self.request.purchase_order_doc.name, name)
+        self.assertEqual(os.listdir(os.path.join(self.media.name, 'pos')), [os.path.basename(name)])
+
+        # Changed inputs make a new PO
+        PurchaseRequest.objects.filter(pk=self.request.pk).update(title="Two Server Racks")
+        self.assertEqual(self.render(), 1)
+        self.assertNotEqual(self.request.purchase_order_doc.name, name)
+
+    def test_gc_removes_only_orphaned_documents(self):
+        self.render()
+        orphan = os.path.join(self.media.name, 'pos', 'PO_1_1700000000.pdf')
+        with open(orphan, 'wb') as fh:
+            fh.write(b"%PDF-1.4 stale")
+
+        call_command('gc_documents', min_age=0, dry_run=True, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(orphan))
+
+        # Recent files are left alone so in-flight uploads survive
+        call_command('gc_documents', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(orphan))
+
+        out = io.StringIO()
+        call_command('gc_documents', min_age=0, stdout=out)
+        self.assertFalse(os.path.exists(orphan))
+        self.assertIn("Deleted 1 orphaned documents", out.getvalue())
+        self.assertTrue(self.request.purchase_order_doc.storage.exists(self.request.purchase_order_doc.name))
+        self.assertTrue(self.request.proforma_file.storage.exists(self.request.proforma_file.name))
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        response = self.client.post('/api/auth/token/', {'username': 'alice', 'password': 'password'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def user_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        # Joins through created_by are fine; lookups of the user row are not
+        table = connection.ops.quote_name(User._meta.db_table)
+        return response, [q['sql'] for q in queries if f"FROM {table}" in q['sql']]
+
+    @override_settings(AUTH_USER_CACHE_TIMEOUT=0)
+    def test_claims_only_makes_no_user_query(self):
+        response, user_queries = self.user_queries('get', '/api/requests/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_queries, [])
+
+        # The claims user can own new requests
+        response, _ = self.user_queries('post', '/api/requests/', data={
+            "title": "Laptop", "description": "For the new hire", "amount": 1200,
+            "proforma_file": SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote", content_type="application/pdf"),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_by']['username'], 'alice')
+        self.assertEqual(PurchaseRequest.objects.get().created_by, self.staff)
+
+    def test_cached_state_follows_role_and_active_changes(self):
+        self.user_queries('get', '/api/requests/')
+        response, user_queries = self.user_queries('get', '/api/requests/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_queries, [])
+
+        # Promoted to Finance: the new role applies before the token expires
+        self.staff.role = User.Role.FINANCE
+        self.staff.save()
+        response, _ = self.user_queries('get', '/api/requests/purchase-orders/export/', data={'month': '2024-05'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.staff.is_active = False
+        self.staff.save()
+        response, _ = self.user_queries('get', '/api/requests/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(EVENTS_BACKEND='local', AUTH_USER_CACHE_TIMEOUT=0)
+class RequestEventTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.other = User.objects.create_user(username='erin', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.approver_l2 = User.objects.create_user(username='charlie', password='password', role=User.Role.APPROVER_L2)
+        self.finance = User.objects.create_user(username='dave', password='password', role=User.Role.FINANCE)
+
+    def test_workflow_publishes_compact_events(self):
+        with mock.patch.object(hub, 'dispatch') as dispatch, self.captureOnCommitCallbacks(execute=True):
+            self.client.force_authenticate(user=self.staff)
+            response = self.client.post('/api/requests/', {
+                "title": "Laptop", "description": "For the new hire", "amount": 1200,
+                "proforma_file": SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote", content_type="application/pdf"),
+            }, format='multipart')
+            request_id = response.data['id']
+            for approver in (self.approver_l1, self.approver_l2):
+                self.client.force_authenticate(user=approver)
+                self.client.patch(f'/api/requests/{request_id}/review/', {"action": "approve"}, format='json')
+            WorkflowEngine.generate_purchase_orders([request_id])
+
+        events = [event for call in dispatch.call_args_list for event in call.args[0]]
+        self.assertEqual(
+            [(e['type'], e['status'], e['current_level'], e.get('level')) for e in events],
+            [
+                ('request.created', 'PENDING', 1, None),
+                ('step.approved', 'PENDING', 2, 1),
+                ('step.approved', 'APPROVED', 2, 2),
+                ('po.ready', 'APPROVED', 2, None),
+            ]
+        )
+        self.assertTrue(all(e['request_id'] == request_id and e['created_by_id'] == self.staff.id for e in events))
+
+    def test_bulk_review_publishes_one_event_per_step(self):
+        requests = [
+            PurchaseRequest.objects.create(
+                title=f"Item {i}", amount=10, created_by=self.staff,
+                proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+            )
+            for i in range(3)
+        ]
+        for req in requests:
+            ApprovalStep.objects.create(request=req, level=1)
+        with mock.patch.object(hub, 'dispatch') as dispatch, self.captureOnCommitCallbacks(execute=True):
+            WorkflowEngine.process_bulk_approval([r.id for r in requests], self.approver_l1, 1, 'reject', '')
+
+        events = dispatch.call_args.args[0]
+        self.assertEqual(sorted(e['request_id'] for e in events), [r.id for r in requests])
+        self.assertTrue(all(e['type'] == 'step.rejected' and e['status'] == 'REJECTED' for e in events))
+
+    def test_events_follow_role_visibility(self):
+        pending_l1 = (self.staff.id, 1, 'PENDING', [1, 2])
+        approved = (self.staff.id, 2, 'APPROVED', [1, 2])
+        skipped_l1 = (self.staff.id, 2, 'PENDING', [2])
+        self.assertTrue(RequestQueryPlanner.visible(self.staff, *pending_l1))
+        self.assertFalse(RequestQueryPlanner.visible(self.other, *pending_l1))
+        self.assertTrue(RequestQueryPlanner.visible(self.approver_l1, *pending_l1))
+        self.assertFalse(RequestQueryPlanner.visible(self.approver_l2, *pending_l1))
+        self.assertFalse(RequestQueryPlanner.visible(self.finance, *pending_l1))
+        self.assertTrue(RequestQueryPlanner.visible(self.finance, *approved))
+        # Chains that skip a level stay out of that level's inbox
+        self.assertFalse(RequestQueryPlanner.visible(self.approver_l1, *skipped_l1))
+        self.assertTrue(RequestQueryPlanner.visible(self.approver_l2, *skipped_l1))
+
+    def test_stream_ticket_is_single_use_and_short_lived(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.staff).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        ticket = self.client.post('/api/events/ticket/').data['ticket']
+
+        self.assertEqual(StreamTickets.redeem(ticket), (self.staff, datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)))
+        self.assertIsNone(StreamTickets.redeem(ticket))
+
+        expired = self.client.post('/api/events/ticket/').data['ticket']
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(seconds=31)):
+            self.assertIsNone(StreamTickets.redeem(expired))
+
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/events/ticket/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_stream_pushes_visible_events_as_sse(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.staff).access_token
+
+        response = await self.async_client.get('/api/events/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        # Bearer tokens are not accepted in the URL
+        response = await self.async_client.get('/api/events/', {'access_token': str(token)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        ticket = await sync_to_async(StreamTickets.issue)(self.staff, timezone.now() + timedelta(minutes=5))
+        response = await self.async_client.get('/api/events/', {'ticket': ticket})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+
+        hub.dispatch([
+            RequestEvents.event(RequestEvents.CREATED, 1, self.other.id, 'PENDING', 1, [1, 2]),
+            RequestEvents.event(RequestEvents.CREATED, 2, self.staff.id, 'PENDING', 1, [1, 2]),
+        ])
+        chunk = (await anext(stream)).decode()
+        self.assertTrue(chunk.startswith("event: request.created\ndata: "))
+        self.assertEqual(json.loads(chunk.split("data: ", 1)[1])['request_id'], 2)
+        await stream.aclose()
+
+
+class StreamingResponseTests(TestCase):
+    def chunks(self, produced):
+        for i in range(3):
+            produced.append(i)
+            yield f"chunk {i}".encode()
+
+    async def test_asgi_responses_stream_chunk_by_chunk(self):
+        produced = []
+        response = streaming_response(AsyncRequestFactory().get('/'), self.chunks(produced), 'text/plain')
+        self.assertTrue(response.is_async)
+
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"chunk 0")
+        # Nothing is read ahead of what was sent
+        self.assertEqual(produced, [0])
+        self.assertEqual([chunk async for chunk in stream], [b"chunk 1", b"chunk 2"])
+
+    def test_wsgi_responses_keep_the_sync_iterator(self):
+        response = streaming_response(RequestFactory().get('/'), self.chunks([]), 'text/plain')
+        self.assertFalse(response.is_async)
+        self.assertEqual(b''.join(response.streaming_content), b"chunk 0chunk 1chunk 2")
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.request = PurchaseRequest.objects.create(
+            title="Laptop", description="For the new hire", amount=1200, created_by=self.staff,
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+        )
+        self.step = ApprovalStep.objects.create(request=self.request, level=1)
+        self.client.force_authenticate(user=self.staff)
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, len(queries)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/requests/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('private', response['Cache-Control'])
+
+        response, queries = self.revalidate('/api/requests/', response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(queries, 1)  # only the aggregate validator
+        self.assertEqual(response.content, b'')
+
+        # A different filter, a new request or an update changes the ETag
+        etag = response['ETag']
+        self.assertNotEqual(self.client.get('/api/requests/', {'status': 'PENDING'})['ETag'], etag)
+        PurchaseRequest.objects.filter(pk=self.request.pk).update(title="Laptop Pro", updated_at=timezone.now())
+        self.assertEqual(self.revalidate('/api/requests/', etag)[0].status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_follows_approval_steps(self):
+        url = f'/api/requests/{self.request.id}/'
+        etag = self.client.get(url)['ETag']
+        response, _ = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # Reviewing the step bumps both the step and its request
+        list_etag = self.client.get('/api/requests/')['ETag']
+        WorkflowEngine.process_approval(self.step, self.approver_l1, 'approve', '')
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(self.revalidate('/api/requests/', list_etag)[0].status_code, status.HTTP_200_OK)
+
+        # Even a step edited on its own invalidates the detail
+        etag = self.client.get(url)['ETag']
+        self.step.comments = "Checked with IT"
+        self.step.save()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, status.HTTP_200_OK)
+
+
+class WorkflowTransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.other_l1 = User.objects.create_user(username='bea', password='password', role=User.Role.APPROVER_L1)
+        self.approver_l2 = User.objects.create_user(username='charlie', password='password', role=User.Role.APPROVER_L2)
+        self.finance = User.objects.create_user(username='dave', password='password', role=User.Role.FINANCE)
+        self.request = PurchaseRequest.objects.create(
+            title="Laptop", description="For the new hire", amount=1200, created_by=self.staff,
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+        )
+        ApprovalStep.objects.create(request=self.request, level=1)
+        ApprovalStep.objects.create(request=self.request, level=2)
+
+    def review(self, user, action='approve', **extra):
+        self.client.force_authenticate(user=user)
+        return self.client.patch(
+            f'/api/requests/{self.request.id}/review/', {"action": action, **extra}, format='json'
+        )
+
+    def test_concurrent_reviewers_cannot_both_win(self):
+        # Both approvers loaded the same pending step before either acted
+        first = ApprovalStep.objects.select_related('request').get(request=self.request, level=1)
+        second = ApprovalStep.objects.select_related('request').get(request=self.request, level=1)
+
+        WorkflowEngine.process_approval(first, self.approver_l1, 'approve', '')
+        with self.assertRaises(TransitionConflict):
+            WorkflowEngine.process_approval(second, self.other_l1, 'reject', '')
+
+        self.request.refresh_from_db()
+        self.assertEqual((self.request.status, self.request.current_level, self.request.version), ('PENDING', 2, 1))
+        step = ApprovalStep.objects.get(request=self.request, level=1)
+        self.assertEqual((step.status, step.approver), ('APPROVED', self.approver_l1))
+
+    def test_conflicts_return_409(self):
+        # Level 2 cannot act before level 1
+        step = ApprovalStep.objects.select_related('request').get(request=self.request, level=2)
+        with self.assertRaisesMessage(TransitionConflict, "The previous approval level has not approved this request."):
+            WorkflowEngine.process_approval(step, self.approver_l2, 'approve', '')
+
+        # Booleans and negatives are not versions
+        for invalid in (True, False, -1, "1.5"):
+            self.assertEqual(self.review(self.approver_l1, version=invalid).status_code, status.HTTP_400_BAD_REQUEST)
+
+        # A stale version is refused, the current one accepted
+        self.assertEqual(self.review(self.approver_l1, version=5).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.review(self.approver_l1, version=0).status_code, status.HTTP_200_OK)
+
+        # The same step cannot be reviewed twice
+        response = self.review(self.other_l1, action='reject')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['detail'], "This step has already been reviewed.")
+
+    def test_receipt_completes_an_approved_request_once(self):
+        self.review(self.approver_l1)
+        self.review(self.approver_l2)
+        stale = PurchaseRequest.objects.get(pk=self.request.pk)
+
+        self.client.force_authenticate(user=self.staff)
+        with mock.patch.object(DocumentProcessor, '_extract_receipt', return_value={"items": [], "total": 1200}):
+            response = self.client.post(f'/api/requests/{self.request.id}/submit-receipt/', {
+                "receipt_file": SimpleUploadedFile("receipt.pdf", b"%PDF-1.4 receipt", content_type="application/pdf")
+            }, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['status'], 'COMPLETED')
+
+            with self.assertRaises(TransitionConflict):
+                WorkflowEngine.submit_receipt(stale, SimpleUploadedFile("receipt.pdf", b"%PDF-1.4 again"))
+
+        # Completed requests stay in the Finance view
+        self.client.force_authenticate(user=self.finance)
+        listed = [r['id'] for r in self.client.get('/api/requests/').data['results']]
+        self.assertEqual(listed, [self.request.id])
+
+    def test_transition_table_is_enforced(self):
+        self.assertTrue(Transitions.allowed(PurchaseRequest, 'APPROVED', 'COMPLETED'))
+        self.assertFalse(Transitions.allowed(PurchaseRequest, 'REJECTED', 'APPROVED'))
+        with self.assertRaises(ValueError):
+            Transitions.apply(PurchaseRequest.objects.all(), 'REJECTED', 'APPROVED')
+
+
+class ApprovalPolicyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.approver_l2 = User.objects.create_user(username='charlie', password='password', role=User.Role.APPROVER_L2)
+        self.finance = User.objects.create_user(username='dave', password='password', role=User.Role.FINANCE)
+
+        # Below 100 auto-approves, L2 from 1000, Finance signs off from 10000
+        self.addCleanup(ApprovalPolicy.invalidate)
+        ApprovalLevel.objects.filter(level=1).update(min_amount=100)
+        ApprovalLevel.objects.filter(level=2).update(min_amount=1000)
+        ApprovalLevel.objects.create(level=3, name='Finance', approver_role=User.Role.FINANCE, min_amount=10000)
+
+    def create(self, amount):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post('/api/requests/', {
+            "title": f"Purchase of {amount}", "description": "Supplies", "amount": amount,
+            "proforma_file": SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote", content_type="application/pdf"),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return PurchaseRequest.objects.get(pk=response.data['id'])
+
+    def review(self, user, req, action='approve'):
+        self.client.force_authenticate(user=user)
+        return self.client.patch(f'/api/requests/{req.id}/review/', {"action": action}, format='json')
+
+    def listed(self, user):
+        self.client.force_authenticate(user=user)
+        return [r['id'] for r in self.client.get('/api/requests/').data['results']]
+
+    def test_steps_follow_the_amount(self):
+        for amount, levels in ((50, []), (500, [1]), (5000, [1, 2]), (50000, [1, 2, 3])):
+            req = self.create(amount)
+            self.assertEqual(list(req.approval_steps.values_list('level', flat=True)), levels)
+            self.assertEqual(req.current_level, levels[0] if levels else 0)
+
+    def test_small_purchase_is_approved_on_submission(self):
+        req = self.create(50)
+        self.assertEqual((req.status, req.po_status), ('APPROVED', 'QUEUED'))
+        self.assertEqual(self.listed(self.approver_l1), [])
+        self.assertEqual(self.listed(self.finance), [req.id])
+
+        # The PO is queued by the extraction, so it is rendered with the vendor
+        self.assertEqual(list(req.jobs.values_list('kind', flat=True)), [Job.Kind.EXTRACT_PROFORMA])
+        self.assertEqual(JobQueue.run_pending(), 2)
+        req.refresh_from_db()
+        self.assertEqual(req.po_status, 'READY')
+        current = RequestQueryPlanner.with_approved_at(PurchaseRequest.objects.filter(pk=req.pk)).get()
+        self.assertNotEqual(current.ai_metadata, {})
+        self.assertTrue(req.purchase_order_doc.name.endswith(
+            DocumentProcessor.purchase_order_filename(WorkflowEngine.purchase_order_payload(current))
+        ))
+
+    def test_skipped_levels_and_extra_levels(self):
+        # Only level 1 applies: its approval is final
+        small = self.create(500)
+        self.assertEqual(self.review(self.approver_l1, small).status_code, status.HTTP_200_OK)
+        small.refresh_from_db()
+        self.assertEqual(small.status, 'APPROVED')
+
+        # Three levels: Finance reviews the last one from its own list
+        large = self.create(50000)
+        self.review(self.approver_l1, large)
+        self.review(self.approver_l2, large)
+        large.refresh_from_db()
+        self.assertEqual((large.status, large.current_level), ('PENDING', 3))
+        self.assertIn(large.id, self.listed(self.finance))
+        self.assertEqual(self.review(self.finance, large).status_code, status.HTTP_200_OK)
+        large.refresh_from_db()
+        self.assertEqual(large.status, 'APPROVED')
+
+    def test_bulk_review_routes_each_request(self):
+        final, onward = self.create(500), self.create(5000)
+        self.client.force_authenticate(user=self.approver_l1)
+        response = self.client.post(
+            '/api/requests/bulk-review/', {'ids': [final.id, onward.id], 'action': 'approve'}, format='json'
+        )
+        self.assertEqual(response.data['processed'], 2)
+        final.refresh_from_db()
+        onward.refresh_from_db()
+        self.assertEqual((final.status, final.current_level), ('APPROVED', 1))
+        self.assertEqual((onward.status, onward.current_level), ('PENDING', 2))
+        self.assertTrue(Job.objects.filter(kind=Job.Kind.RENDER_PO_BATCH, payload={'request_ids': [final.id]}).exists())
+
+    def test_policy_changes_reload_the_cache(self):
+        policy = ApprovalPolicy.current()
+        self.assertIs(ApprovalPolicy.current(), policy)
+        self.assertEqual(policy.levels_for(50000), [1, 2, 3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ApprovalLevel.objects.filter(level=3).get().delete()
+        self.assertEqual(ApprovalPolicy.current().levels_for(50000), [1, 2])
+        self.assertIsNone(ApprovalPolicy.current().level_of(User.Role.FINANCE))
+
+
+@override_settings(REQUEST_IMPORT_CHUNK_SIZE=2, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'extraction': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'import-tests'},
+})
+class RequestImportTests(TestCase):
+    def setUp(self):
+        ExtractionCache.backend().clear()
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.other = User.objects.create_user(username='erin', password='password', role=User.Role.STAFF)
+
+    def archive(self, **members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+        return buffer.getvalue()
+
+    def test_api_import_validates_and_inserts_in_chunks(self):
+        rows = (
+            "title,description,amount,proforma\n"
+            "Monitor,Desk setup,300,quote.pdf\n"
+            "Keyboard,Desk setup,80,quote.pdf\n"
+            "Chair,Desk setup,not-a-number,quote.pdf\n"
+            "Lamp,Desk setup,40,missing.pdf\n"
+            "Dock,Desk setup,150,script.pdf\n"
+            "Webcam,Desk setup,90,other.pdf\n"
+        )
+        proformas = self.archive(**{
+            'quote.pdf': b"%PDF-1.4 quote", 'other.pdf': b"%PDF-1.4 other", 'script.pdf': b"#!/bin/sh",
+        })
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.post('/api/requests/import/', {
+            'file': SimpleUploadedFile("requests.csv", rows.encode(), content_type='text/csv'),
+            'proformas': SimpleUploadedFile("proformas.zip", proformas, content_type='application/zip'),
+        }, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 3))
+        self.assertEqual([error['line'] for error in response.data['errors']], [4, 5, 6])
+        self.assertIn('amount', response.data['errors'][0]['detail'])
+
+        imported = PurchaseRequest.objects.filter(created_by=self.staff).order_by('id')
+        self.assertEqual([req.title for req in imported], ["Monitor", "Keyboard", "Webcam"])
+        self.assertEqual(ApprovalStep.objects.filter(request__in=imported).count(), 6)
+        self.assertEqual(imported[0].proforma_sha256, hashlib.sha256(b"%PDF-1.4 quote").hexdigest())
+
+        # One extraction job per chunk; identical proformas are extracted once
+        jobs = Job.objects.filter(kind=Job.Kind.EXTRACT_PROFORMA_BATCH).order_by('id')
+        self.assertEqual([job.payload['request_ids'] for job in jobs], [[imported[0].id, imported[1].id], [imported[2].id]])
+        with mock.patch.object(DocumentProcessor, '_extract_proforma', return_value={"vendor_name": "Acme"}) as extract:
+            self.assertEqual(JobQueue.run_pending(), 2)
+        self.assertEqual(extract.call_count, 2)
+        self.assertEqual(
+            set(imported.values_list('extraction_status', 'ai_metadata__vendor_name')), {('COMPLETED', 'Acme')}
+        )
+
+    def test_only_staff_can_import(self):
+        approver = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.client.force_authenticate(user=approver)
+        response = self.client.post('/api/requests/import/', {
+            'file': SimpleUploadedFile("requests.csv", b"title\n", content_type='text/csv'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_imports_jsonl_with_creators(self):
+        rows = [
+            {"title": "Laptop", "description": "Onboarding", "amount": "1200.00", "proforma": "a.pdf", "created_by": "erin"},
+            {"title": "Phone", "description": "Onboarding", "amount": "600.00", "proforma": "a.pdf"},
+            {"title": "Tablet", "description": "Onboarding", "amount": "400.00", "proforma": "a.pdf", "created_by": "nobody"},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'requests.jsonl')
+            with open(path, 'w') as handle:
+                handle.write('\n'.join(json.dumps(row) for row in rows) + '\n{broken\n')
+            archive = os.path.join(directory, 'proformas.zip')
+            with open(archive, 'wb') as handle:
+                handle.write(self.archive(**{'a.pdf': b"%PDF-1.4 a"}))
+
+            out = io.StringIO()
+            with CaptureQueriesContext(connection) as ctx:
+                call_command('import_requests', path, proformas=archive, owner='alice', stdout=out)
+
+        self.assertIn("Imported 2 requests; 2 rows failed.", out.getvalue())
+        self.assertIn("Unknown user 'nobody'", out.getvalue())
+        self.assertIn("line 4: Invalid JSON", out.getvalue())
+        self.assertEqual(
+            list(PurchaseRequest.objects.order_by('id').values_list('title', 'created_by__username')),
+            [("Laptop", "erin"), ("Phone", "alice")]
+        )
+        # Both valid rows share the first chunk and its single INSERT; the second chunk inserts nothing
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "procurement_purchaserequest"')]
+        self.assertEqual(len(inserts), 1)
+
+
+class AuditExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+        self.finance = User.objects.create_user(username='dave', password='password', role=User.Role.FINANCE)
+        reviewed_at = timezone.make_aware(datetime(2024, 5, 14, 10, 0))
+
+        self.approved = PurchaseRequest.objects.create(
+            title="Server Rack", description="Racks, two", amount=1200, created_by=self.staff,
+            status="APPROVED", current_level=2, proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote"),
+            ai_metadata={"vendor_name": "Acme Hardware", "items": [{"description": "Rack"}] * 2},
+        )
+        ApprovalStep.objects.create(
+            request=self.approved, level=1, status='APPROVED', approver=self.approver_l1,
+            comments="ok", reviewed_at=reviewed_at
+        )
+        # Auto-approved: no steps at all
+        self.small = PurchaseRequest.objects.create(
+            title="Cables", amount=20, created_by=self.staff, status="APPROVED", current_level=0,
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+        )
+        self.pending = PurchaseRequest.objects.create(
+            title="Chairs", amount=300, created_by=self.staff,
+            proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+        )
+        ApprovalStep.objects.create(request=self.pending, level=1)
+
+    def rows(self, content):
+        return list(csv.DictReader(io.StringIO(content.decode())))
+
+    def test_csv_has_one_flattened_row_per_visible_request(self):
+        self.client.force_authenticate(user=self.finance)
+        response = self.client.get('/api/requests/export/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        rows = self.rows(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in rows], [str(self.approved.id), str(self.small.id)])
+
+        approved, small = rows
+        self.assertEqual(
+            (approved['created_by'], approved['amount'], approved['vendor_name'], approved['line_items']),
+            ('alice', '1200.00', 'Acme Hardware', '2')
+        )
+        self.assertEqual(
+            (approved['level_1_status'], approved['level_1_approver'], approved['level_1_comments']),
+            ('APPROVED', 'bob', 'ok')
+        )
+        self.assertEqual(approved['level_1_reviewed_at'], '2024-05-14T10:00:00+00:00')
+        self.assertEqual((approved['level_2_status'], small['level_1_status'], small['vendor_name']), ('', '', ''))
+
+    def test_filters_and_validation(self):
+        self.client.force_authenticate(user=self.finance)
+        url = '/api/requests/export/'
+        today = timezone.localdate().isoformat()
+        response = self.client.get(url, {'since': today, 'until': today, 'status': 'APPROVED'})
+        self.assertEqual(len(self.rows(b''.join(response.streaming_content))), 2)
+        response = self.client.get(url, {'until': '2020-01-01'})
+        self.assertEqual(self.rows(b''.join(response.streaming_content)), [])
+
+        self.assertEqual(self.client.get(url, {'output': 'pdf'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'since': '14/05/2024'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'status': 'LOST'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.staff)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_formulas_in_text_cells_are_neutralised(self):
+        PurchaseRequest.objects.filter(pk=self.approved.pk).update(
+            title='=HYPERLINK("http://evil.example","Click")', description="@SUM(1+1)",
+            ai_metadata={"vendor_name": "+Acme", "invoice_number": "-42", "items": []}
+        )
+        self.client.force_authenticate(user=self.finance)
+        approved = self.rows(b''.join(self.client.get('/api/requests/export/').streaming_content))[0]
+
+        self.assertEqual(approved['title'], '\'=HYPERLINK("http://evil.example","Click")')
+        self.assertEqual(
+            (approved['description'], approved['vendor_name'], approved['invoice_number']),
+            ("'@SUM(1+1)", "'+Acme", "'-42")
+        )
+        # Numbers are not text: a negative amount stays a number
+        self.assertEqual(spreadsheet_safe(Decimal('-5.00')), Decimal('-5.00'))
+        self.assertEqual(approved['amount'], '1200.00')
+
+    async def test_asgi_export_streams_before_reading_every_request(self):
+        await sync_to_async(self.make_requests)(5)
+        read, original = [], AuditExport.rows
+
+        def rows(queryset, columns):
+            for row in original(queryset, columns):
+                read.append(row[0])
+                yield row
+
+        token = CustomTokenObtainPairSerializer.get_token(self.finance).access_token
+        with mock.patch.object(AuditExport, 'rows', rows), \
+                mock.patch('procurement.utils.audit_export.CHUNK_SIZE', 1):
+            response = await self.async_client.get(
+                '/api/requests/export/', headers={'Authorization': f'Bearer {token}'}
+            )
+            stream = aiter(response.streaming_content)
+            self.assertTrue((await anext(stream)).startswith(b"id,title,"))
+            self.assertTrue((await anext(stream)).startswith(str(self.approved.id).encode()))
+            # Only the first row was read to send it
+            self.assertEqual(read, [self.approved.id])
+            remaining = [chunk async for chunk in stream]
+        self.assertEqual(len(read), 7)
+        self.assertEqual(b''.join(remaining).count(b"\r\n"), 6)
+
+    def make_requests(self, count):
+        for i in range(count):
+            PurchaseRequest.objects.create(
+                title=f"Desk {i}", amount=100, created_by=self.staff, status="APPROVED", current_level=0,
+                proforma_file=SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote")
+            )
+
+    def test_command_exports_every_request(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'requests.csv')
+            call_command('export_requests', path, stdout=io.StringIO())
+            with open(path, 'rb') as fh:
+                rows = self.rows(fh.read())
+
+        self.assertEqual([row['title'] for row in rows], ["Server Rack", "Cables", "Chairs"])
+        self.assertEqual(rows[2]['level_1_status'], 'PENDING')
+
+
+class RequestSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.other = User.objects.create_user(username='erin', password='password', role=User.Role.STAFF)
+        self.client.force_authenticate(user=self.staff)
+
+        self.chairs = self.create("Office chairs", "Ergonomic seating")
+        self.server = self.create("Server upgrade", "More memory")
+        self.lamps = self.create("Desk lamps", "Same vendor as the rack rails: Acme")
+        extracted = {
+            "vendor_name": "Acme Hardware", "invoice_number": "INV-4711",
+            "items": [{"description": "Rack rails", "quantity": 2, "price": 40.0}],
+        }
+        with mock.patch('procurement.services.DocumentProcessor.extract_proforma_data', return_value=extracted):
+            WorkflowEngine.complete_extraction(self.server.id)
+
+    def create(self, title, description):
+        response = self.client.post('/api/requests/', {
+            "title": title, "description": description, "amount": 500,
+            "proforma_file": SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote", content_type="application/pdf"),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return PurchaseRequest.objects.get(pk=response.data['id'])
+
+    def search(self, q, **params):
+        response = self.client.get('/api/requests/', {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [r['id'] for r in response.data['results']]
+
+    def test_finds_requests_by_extracted_data_most_relevant_first(self):
+        self.assertEqual(self.search('chair'), [self.chairs.id])
+        self.assertEqual(self.search('INV-4711'), [self.server.id])
+        # The vendor outranks a mention in the description; newest first with ordering=
+        self.assertEqual(self.search('acme'), [self.server.id, self.lamps.id])
+        self.assertEqual(self.search('acme', ordering='-created_at'), [self.lamps.id, self.server.id])
+        self.assertEqual(self.search('rails'), [self.server.id, self.lamps.id])
+        self.assertEqual(self.search('acme chairs'), [])
+        self.assertEqual(self.search('"!'), [])
+
+        # Role filtering still applies
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.search('acme'), [])
+
+    def test_ranked_results_page_by_cursor(self):
+        pages, url = [], '/api/requests/?q=acme+rails&page_size=1'
+        while url:
+            response = self.client.get(url)
+            pages.append([r['id'] for r in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(pages, [[self.server.id], [self.lamps.id]])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.chairs.title = "Standing desks"
+        self.chairs.save()
+        self.assertEqual(self.search('chair'), [])
+        self.assertEqual(self.search('standing'), [self.chairs.id])
+
+        self.server.delete()
+        self.assertEqual(self.search('acme'), [self.lamps.id])
+
+        # Rows inserted outside the workflow are picked up by a rebuild
+        seeded = PurchaseRequest.objects.bulk_create([PurchaseRequest(
+            title="Seeded monitor", description="", amount=10, created_by=self.staff, proforma_file='proformas/seed.pdf'
+        )])[0]
+        self.assertEqual(self.search('monitor'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search('monitor'), [seeded.id])
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = User.objects.create_user(username='alice', password='password', role=User.Role.STAFF)
+        self.other = User.objects.create_user(username='erin', password='password', role=User.Role.STAFF)
+        self.approver_l1 = User.objects.create_user(username='bob', password='password', role=User.Role.APPROVER_L1)
+
+    def extracted(self, user, amount, vendor="Acme Hardware Ltd.", invoice="INV-0042", items=("Server Rack", "Cables")):
+        req = PurchaseRequest.objects.create(
+            title="Purchase", amount=amount, created_by=user, proforma_file='proformas/seed.pdf',
+            extraction_status=PurchaseRequest.ExtractionStatus.COMPLETED,
+            ai_metadata={
+                "vendor_name": vendor, "invoice_number": invoice,
+                "items": [{"description": item, "quantity": 1, "price": 1.0} for item in items],
+            },
+        )
+        ApprovalStep.objects.create(request=req, level=1)
+        return req
+
+    def flags(self, req):
+        return sorted((flag.kind, flag.related_id) for flag in RequestFlag.objects.filter(request=req))
+
+    def test_second_submission_of_an_invoice_is_flagged_on_extraction(self):
+        self.client.force_authenticate(user=self.staff)
+        ids = []
+        for user in (self.staff, self.other):
+            self.client.force_authenticate(user=user)
+            response = self.client.post('/api/requests/', {
+                "title": "Rack", "description": "Rack", "amount": 500,
+                "proforma_file": SimpleUploadedFile("quote.pdf", b"%PDF-1.4 quote", content_type="application/pdf"),
+            }, format='multipart')
+            ids.append(response.data['id'])
+        extracted = {"vendor_name": "ACME hardware", "invoice_number": "inv 0042", "items": [{"description": "Rack"}]}
+        with mock.patch('procurement.services.DocumentProcessor.extract_proforma_data', return_value=extracted):
+            for request_id in ids:
+                WorkflowEngine.complete_extraction(request_id)
+
+        first, second = ids
+        self.assertEqual(RequestFlag.objects.filter(request_id=first).count(), 0)
+        self.assertEqual(self.flags(second), [('DUPLICATE_INVOICE', first), ('SIMILAR_ITEMS', first)])
+
+        self.client.force_authenticate(user=self.approver_l1)
+        response = self.client.get(f'/api/requests/{second}/flags/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['related_title'], "Rack")
+        self.client.force_authenticate(user=self.other)
+        self.assertEqual(self.client.get(f'/api/requests/{second}/flags/').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_detects_same_amounts_similar_items_and_splits(self):
+        # L1 reviews from 1000: two requests of 600 to one vendor stay under it
+        self.addCleanup(ApprovalPolicy.invalidate)
+        ApprovalLevel.objects.filter(level=1).update(min_amount=1000)
+        ApprovalPolicy.invalidate()
+        first = self.extracted(self.staff, 600, invoice="A-1", items=("Desk", "Chair"))
+        same_amount = self.extracted(self.other, 600, invoice="A-2", items=("Monitor",))
+        split = self.extracted(self.staff, 500, invoice="A-3", items=("Desk", "Chair"))
+        unrelated = self.extracted(self.staff, 500, vendor="Globex", invoice="A-1", items=("Toner",))
+        DuplicateDetector.check([first.id, same_amount.id, split.id, unrelated.id])
+
+        self.assertEqual(self.flags(first), [])
+        self.assertEqual(self.flags(same_amount), [('SAME_AMOUNT', first.id)])
+        self.assertEqual(self.flags(split), [('SIMILAR_ITEMS', first.id), ('SPLIT_PURCHASE', first.id)])
+        self.assertEqual(self.flags(unrelated), [])
+        self.assertIn("over the 1000.00 approval threshold", RequestFlag.objects.get(kind='SPLIT_PURCHASE').detail)
+
+    def test_backlog_scan_is_batched_and_idempotent(self):
+        requests = [self.extracted(self.staff, 100 + i, invoice=f"B-{i % 3}") for i in range(6)]
+
+        DuplicateDetector.check([req.id for req in requests])
+        with CaptureQueriesContext(connection) as small:
+            DuplicateDetector.check([req.id for req in requests[:2]])
+        with CaptureQueriesContext(connection) as large:
+            DuplicateDetector.check([req.id for req in requests])
+        self.assertEqual(len(small), len(large))
+
+        RequestFlag.objects.all().delete()
+        call_command('detect_duplicates', chunk_size=4, stdout=io.StringIO())
+        call_command('detect_duplicates', stdout=io.StringIO())
+        # B-0, B-1 and B-2 each appear twice; identical items flag every later request
+        self.assertEqual(RequestFlag.objects.filter(kind='DUPLICATE_INVOICE').count(), 3)
+        self.assertEqual(RequestFlag.objects.filter(kind='SIMILAR_ITEMS').count(), 15)
+
+
+class PagedExtractor:
+    """PROFORMA_EXTRACTOR stand-in: three pages, the second unreadable."""
+
+    PAGES = [("Acme Supplies Ltd\nInvoice No: INV-2001", 0.9), None, ("Paper 10 x 5.00\nTotal: 50.00", 0.7)]
+
+    def page_count(self, path):
+        return len(self.PAGES)
+
+    def read_page(self, path, number):
+        if self.PAGES[number] is None:
+            raise ValueError("unreadable")
+        return self.PAGES[number]
+
+
+class ProformaExtractionTests(TestCase):
+    def proforma_pdf(self, pages):
+        from reportlab.pdfgen import canvas
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer)
+        for lines in pages:
+            for i, line in enumerate(lines):
+                pdf.drawString(72, 750 - 20 * i, line)
+            pdf.showPage()
+        pdf.save()
+        buffer.seek(0)
+        return buffer
+
+    def test_text_pdf_pages_are_parsed(self):
+        proforma = self.proforma_pdf([
+            ["Vendor: Northwind Traders", "Proforma Invoice", "Invoice No: PF-1042"],
+            ["Office chair 2 x 150.00 300.00", "Desk lamp 4 x 25.50 102.00", "Total: 402.00"],
+        ])
+        data = DocumentProcessor.extract_proforma_data(proforma)
+
+        self.assertEqual(data['vendor_name'], "Northwind Traders")
+        self.assertEqual(data['invoice_number'], "PF-1042")
+        self.assertEqual(data['items'], [
+            {"description": "Office chair", "quantity": 2.0, "price": 150.0},
+            {"description": "Desk lamp", "quantity": 4.0, "price": 25.5},
+        ])
+        self.assertEqual(data['extracted_total'], 402.0)
+        self.assertEqual(data['confidence_score'], 1.0)
+        self.assertEqual(data['pages'], 2)
+
+    def test_receipt_is_read_like_a_proforma(self):
+        receipt = self.proforma_pdf([[
+            "Northwind Traders", "Sales Receipt", "Receipt No: R-7781",
+            "Office chair 2 x 150.00 300.00", "Total: 300.00",
+        ]])
+        data = DocumentProcessor.extract_receipt_data(receipt)
+
+        self.assertEqual(data['vendor_name'], "Northwind Traders")
+        self.assertEqual(data['receipt_number'], "R-7781")
+        self.assertEqual(data['items'], [{"description": "Office chair", "quantity": 2.0, "price": 150.0}])
+        self.assertEqual(data['total'], 300.0)
+        self.assertEqual(data['confidence_score'], 1.0)
+
+    def test_unreadable_document_extracts_nothing(self):
+        data = DocumentProcessor.extract_proforma_data(io.BytesIO(b"%PDF-1.4 not really a pdf"))
+        self.assertEqual(data['pages'], 0)
+        self.assertIsNone(data['vendor_name'])
+        self.assertEqual(data['items'], [])
+        self.assertEqual(data['confidence_score'], 0.0)
+
+    @override_settings(PROFORMA_EXTRACTOR='procurement.tests.PagedExtractor')
+    def test_failed_page_does_not_fail_the_document(self):
+        from .jobs import offload_each
+        data = DocumentProcessor.extract_proforma_data(io.BytesIO(b"any"), map_pages=offload_each)
+
+        self.assertEqual(data['vendor_name'], "Acme Supplies Ltd")
+        self.assertEqual(data['invoice_number'], "INV-2001")
+        self.assertEqual(data['items'], [{"description": "Paper", "quantity": 10.0, "price": 5.0}])
+        self.assertEqual(data['extracted_total'], 50.0)
+        # Mean of 0.9, 0 (failed) and 0.7, all four fields found
+        self.assertEqual(data['confidence_score'], 0.53)
+        self.assertEqual(data['failed_pages'], 1)
+        # Not cached, so the next submission reads the file again
+        self.assertIsNone(ExtractionCache.lookup(
+            'proforma', hashlib.sha256(b"any").hexdigest(), EXTRACTOR_VERSION, 'procurement.tests.PagedExtractor'
+        ))
+
+    def test_offload_each_yields_default_for_failed_items(self):
+        from .jobs import offload_each
+        self.assertEqual(offload_each(lambda n: 10 // n, [5, 0, 2], timeout=5, default=-1), [2, -1, 5])
+
+    def test_queued_pages_get_their_full_time_limit(self):
+        from . import jobs
+        pool = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            with mock.patch.object(jobs, '_process_pool', pool):
+                # Six 0.5s items on two processes take 1.5s, beyond a one-second limit
+                # measured from submission; only the 3s item runs out of its own time
+                results = jobs.offload_each(time.sleep, [0.5] * 6 + [3], timeout=1, default='timed out')
+        finally:
+            pool.shutdown()
+        self.assertEqual(results, [None] * 6 + ['timed out'])
@@ -0,0 +1,34 @@
+from .exceptions import TransitionConflict
+
+
+class Transitions:
+    """
+    Enforces the status transition tables of PurchaseRequest and
+    ApprovalStep (their TRANSITIONS attribute).
+
+    Transitions are conditional UPDATEs: the WHERE clause repeats the state
+    the caller read (status, stage, version), so the database applies the
+    change only if nothing moved in between, and the row lock lasts for
+    the statement's transaction only. When fewer rows than expected match,
+    another writer got there first and TransitionConflict (409) is raised;
+    callers run inside transaction.atomic so their earlier writes roll back.
+    """
+
+    @staticmethod
+    def allowed(model, old, new):
+        return new in model.TRANSITIONS.get(old, ())
+
+    @staticmethod
+    def apply(queryset, old, new, expected=1, **changes):
+        """Moves the rows of `queryset` from status `old` to `new`."""
+        if not Transitions.allowed(queryset.model, old, new):
+            raise ValueError(f"A {queryset.model._meta.verbose_name} cannot go from {old} to {new}.")
+        return Transitions.guarded_update(queryset.filter(status=old), expected, status=new, **changes)
+
+    @staticmethod
+    def guarded_update(queryset, expected=1, **changes):
+        """UPDATE that must touch exactly `expected` rows."""
+        updated = queryset.update(**changes)
+        if updated != expected:
+            raise TransitionConflict()
+        return updated
@@ -0,0 +1,78 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from core.instrumentation import timed
+
+from .exceptions import UploadTooLarge, UnsupportedDocumentType
+
+# Leading bytes -> MIME type
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+]
+SNIFF_BYTES = max(len(signature) for signature, _ in SIGNATURES)
+
+
+def sniff_content_type(head: bytes) -> str:
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return 'application/octet-stream'
+
+
+class StreamingDocumentUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams each uploaded file chunk by chunk to a temporary file on disk,
+    hashing it and sniffing its type on the way, so peak memory per upload
+    is one chunk regardless of file size.
+
+    The resulting TemporaryUploadedFile carries `sha256` and
+    `sniffed_content_type`; FileSystemStorage then moves (not copies) it
+    into MEDIA_ROOT.
+    """
+
+    def __init__(self, request=None, max_size=None, document_fields=None):
+        super().__init__(request)
+        self.max_size = max_size or settings.PROCUREMENT_MAX_UPLOAD_SIZE
+        self.document_fields = document_fields or settings.PROCUREMENT_DOCUMENT_FIELDS
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        if content_length is not None and content_length > self.max_size:
+            raise UploadTooLarge(f"'{file_name}' exceeds the {self.max_size} byte upload limit.")
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.digest = hashlib.sha256()
+        self.received = 0
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.file.close()
+            raise UploadTooLarge(f"'{self.file_name}' exceeds the {self.max_size} byte upload limit.")
+
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+        self.digest.update(raw_data)
+        with timed('storage'):
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.digest.hexdigest()
+        uploaded.sniffed_content_type = sniff_content_type(self.head)
+
+        allowed = settings.PROCUREMENT_ALLOWED_DOCUMENT_TYPES
+        if self.field_name in self.document_fields and uploaded.sniffed_content_type not in allowed:
+            uploaded.close()
+            raise UnsupportedDocumentType(
+                f"'{self.file_name}' is not a supported document ({', '.join(allowed)})."
+            )
+        return uploaded
@@ -1,85 +1,216 @@
-import random
-import time
+import hashlib
+import json
 import io
-from typing import Dict, Any
+from functools import partial
+from typing import Dict, Any, Iterable
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
+from django.conf import settings
 from django.core.files.base import ContentFile
 from datetime import date
+from .documents import document_path
+from .extractors import parse_proforma, parse_receipt, proforma_extractor, read_inline
+from .extraction_cache import ExtractionCache, sha256_file
+from .reconciliation import ReconciliationEngine
+
+# Bump whenever extraction output changes so cached results are recomputed.
+EXTRACTOR_VERSION = '4'
+
+# Bump whenever the PO layout changes; it is part of every PO file name,
+# so changed templates render new files instead of reusing stale ones.
+PO_TEMPLATE_VERSION = '1'
 
 class DocumentProcessor:
     """
-    Service class for AI Simulation and PDF Generation.
+    Service class for document extraction and PDF Generation.
     """
 
     @staticmethod
-    def extract_proforma_data(file_obj) -> Dict[str, Any]:
-        """Simulates parsing a Proforma PDF/Image."""
-        time.sleep(1)
+    def extract_proforma_data(file_obj, digest=None, map_pages=None) -> Dict[str, Any]:
+        """
+        Extracts proforma data, reusing the cached result for identical files.
+        The extractor opens the document from disk page by page, never
+        holding the full bytes; `map_pages` is as in `_extract_proforma`.
+        Results with failed pages are not cached, so the file is read again
+        next time.
+        """
+        def extract():
+            with document_path(file_obj) as path:
+                return DocumentProcessor._extract_proforma(path, map_pages)
+
+        return ExtractionCache.get_or_compute(
+            'proforma', digest or sha256_file(file_obj), EXTRACTOR_VERSION, extract, settings.PROFORMA_EXTRACTOR,
+            cache_if=extraction_cacheable
+        )
+
+    @staticmethod
+    def _extract_proforma(path, map_pages=None) -> Dict[str, Any]:
+        """
+        Reads every page of the proforma at `path` with the configured
+        extractor, then parses the fields out of their text.
+
+        `map_pages(func, pages, timeout, default)` runs the page reads:
+        the worker passes jobs.offload_each, which reads them side by side
+        in its process pool. Default: one by one. Either way each page may
+        take EXTRACTION_PAGE_TIMEOUT seconds from when its read starts; a
+        page that fails or runs out of time is counted in `failed_pages`.
+        """
+        return parse_proforma(DocumentProcessor._read_pages(path, map_pages))
+
+    @staticmethod
+    def _read_pages(path, map_pages=None):
+        """Text and confidence of every page of the document at `path` (None for failed pages)."""
+        extractor = proforma_extractor()
+        return (map_pages or read_inline)(
+            partial(extractor.read_page, path), range(extractor.page_count(path)),
+            timeout=settings.EXTRACTION_PAGE_TIMEOUT, default=None
+        )
+
+    @staticmethod
+    def extract_receipt_data(file_obj, digest=None, map_pages=None) -> Dict[str, Any]:
+        """
+        Extracts receipt line items, reusing the cached result for identical
+        files. Receipts are read like proformas (see `_extract_proforma`).
+        """
+        def extract():
+            with document_path(file_obj) as path:
+                return DocumentProcessor._extract_receipt(path, map_pages)
+
+        return ExtractionCache.get_or_compute(
+            'receipt', digest or sha256_file(file_obj), EXTRACTOR_VERSION, extract, settings.PROFORMA_EXTRACTOR,
+            cache_if=extraction_cacheable
+        )
+
+    @staticmethod
+    def _extract_receipt(path, map_pages=None) -> Dict[str, Any]:
+        """Reads the receipt at `path` and parses its vendor, number, line items and total."""
+        return parse_receipt(DocumentProcessor._read_pages(path, map_pages))
+
+    @staticmethod
+    def validate_receipt(receipt_file, purchase_order_amount, purchase_order_items=()) -> Dict[str, Any]:
+        """Reconciles an uploaded receipt against the PO total and line items."""
+        receipt_data = DocumentProcessor.extract_receipt_data(receipt_file)
+        return ReconciliationEngine.reconcile(purchase_order_amount, purchase_order_items, receipt_data)
+
+    @staticmethod
+    def purchase_order_payload(request_instance, po_date=None) -> Dict[str, Any]:
+        """
+        Collects everything the PO renderer needs into plain data,
+        so rendering can run in a separate process.
+        """
         return {
-            "vendor_name": "Tech Corp Solutions",
-            "invoice_number": f"INV-{random.randint(1000, 9999)}",
-            "items": [
-                {"description": "Server Rack", "quantity": 1, "price": 1200.00},
-                {"description": "Cables", "quantity": 50, "price": 10.00}
-            ],
-            "extracted_total": 1700.00,
-            "confidence_score": 0.98
+            "id": request_instance.id,
+            "title": request_instance.title,
+            "amount": str(request_instance.amount),
+            "vendor_name": (request_instance.ai_metadata or {}).get('vendor_name', 'Unknown Vendor'),
+            "date": (po_date or date.today()).isoformat(),
         }
 
     @staticmethod
-    def validate_receipt(receipt_file, purchase_order_amount) -> Dict[str, Any]:
-        """Compares uploaded receipt against the system's PO data."""
-        is_match = random.choice([True, True, False]) 
-        
-        if is_match:
-            return {
-                "status": "MATCH",
-                "message": "Receipt matches Purchase Order perfectly.",
-                "discrepancies": []
-            }
-        else:
-            return {
-                "status": "MISMATCH",
-                "message": "Discrepancy detected in total amount.",
-                "discrepancies": ["Receipt total differs from PO total."]
-            }
+    def purchase_order_filename(po: Dict[str, Any]) -> str:
+        """
+        Content-addressed name of a PO: a hash of the `purchase_order_payload`
+        and the template version. Rendering is deterministic, so a file with
+        this name already holds exactly the PDF the payload would produce.
+        """
+        canonical = json.dumps(po, sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha256(f"{PO_TEMPLATE_VERSION}:{canonical}".encode()).hexdigest()
+        return f"PO-{po['id']:05d}-{digest[:16]}.pdf"
 
     @staticmethod
-    def generate_purchase_order_doc(request_instance):
+    def generate_purchase_order_doc(request_instance, po_date=None):
         """
         Generates a REAL PDF file using ReportLab.
         Returns: (filename, ContentFile)
         """
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(50, 750, "PURCHASE ORDER")
-        
-        p.setFont("Helvetica", 10)
-        p.drawString(50, 730, f"PO Number: PO-{request_instance.id:05d}")
-        p.drawString(50, 715, f"Date: {date.today()}")
-        p.drawString(50, 700, f"Vendor: {request_instance.ai_metadata.get('vendor_name', 'Unknown Vendor')}")
-        
-        p.line(50, 680, 550, 680)
-        
-        # Body
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(50, 650, "Item Description")
-        p.drawString(450, 650, "Amount")
-        
-        p.setFont("Helvetica", 12)
-        p.drawString(50, 625, request_instance.title)
-        p.drawString(450, 625, f"${request_instance.amount}")
-        
-        # Footer
-        p.line(50, 600, 550, 600)
-        p.setFont("Helvetica-Oblique", 10)
-        p.drawString(50, 580, "Authorized by: Finance Dept")
-        p.drawString(50, 565, "Generated automatically by P2P System")
-        # -------------------------
-        
-        p.showPage()
-        p.save()
-        filename = f"PO_{request_instance.id}_{int(time.time())}.pdf"
-        return filename, ContentFile(buffer.getvalue())
\ No newline at end of file
+        payload = DocumentProcessor.purchase_order_payload(request_instance, po_date=po_date)
+        filename = DocumentProcessor.purchase_order_filename(payload)
+        return filename, ContentFile(render_purchase_order_pdf(payload))
+
+
+# Name of the Form XObject holding the static parts of every PO page
+LETTERHEAD = 'po_letterhead'
+
+
+def _define_letterhead(p):
+    """
+    Draws the parts shared by every PO (heading, rules, column headers,
+    footer) once into a Form XObject. Each page then references it with
+    doForm instead of re-emitting the drawing operators.
+    """
+    p.beginForm(LETTERHEAD)
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(50, 750, "PURCHASE ORDER")
+    p.line(50, 680, 550, 680)
+
+    # Body
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(50, 650, "Item Description")
+    p.drawString(450, 650, "Amount")
+
+    # Footer
+    p.line(50, 600, 550, 600)
+    p.setFont("Helvetica-Oblique", 10)
+    p.drawString(50, 580, "Authorized by: Finance Dept")
+    p.drawString(50, 565, "Generated automatically by P2P System")
+    p.endForm()
+
+
+def _draw_purchase_order(p, po: Dict[str, Any]):
+    """Draws one PO page: the shared letterhead plus the request's fields."""
+    p.doForm(LETTERHEAD)
+
+    p.setFont("Helvetica", 10)
+    p.drawString(50, 730, f"PO Number: PO-{po['id']:05d}")
+    p.drawString(50, 715, f"Date: {po['date']}")
+    p.drawString(50, 700, f"Vendor: {po['vendor_name']}")
+
+    p.setFont("Helvetica", 12)
+    p.drawString(50, 625, po['title'])
+    p.drawString(450, 625, f"${po['amount']}")
+    p.showPage()
+
+
+def extract_proforma_document(path: str) -> Dict[str, Any]:
+    """
+    Extracts the proforma stored at `path`, without the extraction cache.
+    Module-level and free of ORM access so it can run in a process pool;
+    its pages are read one after the other there.
+    """
+    return DocumentProcessor._extract_proforma(path)
+
+
+def extraction_cacheable(result: Dict[str, Any]) -> bool:
+    """Results with pages that failed (errors, timeouts) are retried instead of cached."""
+    return not result.get('failed_pages')
+
+
+def render_purchase_order_pdf(po: Dict[str, Any]) -> bytes:
+    """
+    Renders a Purchase Order PDF from a `purchase_order_payload` dict.
+    Module-level and free of ORM access so it can run in a process pool.
+    """
+    buffer = io.BytesIO()
+    render_purchase_orders_pdf([po], buffer)
+    return buffer.getvalue()
+
+
+def render_purchase_orders_pdf(pos: Iterable[Dict[str, Any]], file_obj) -> int:
+    """
+    Renders many POs as consecutive pages of one PDF written to `file_obj`,
+    sharing a single letterhead form and font setup. Returns the page count.
+
+    Output is byte-for-byte reproducible: `invariant` pins the creation
+    date and document ID, and the metadata is fixed.
+    """
+    p = canvas.Canvas(file_obj, pagesize=letter, invariant=1)
+    p.setTitle("Purchase Order")
+    p.setAuthor("Finance Dept")
+    p.setCreator(f"P2P System (PO template {PO_TEMPLATE_VERSION})")
+    _define_letterhead(p)
+    pages = 0
+    for po in pos:
+        _draw_purchase_order(p, po)
+        pages += 1
+    p.save()
+    return pages
@@ -0,0 +1,203 @@
+import csv
+import importlib.util
+import io
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..policies import ApprovalPolicy
+from ..query_planner import RequestQueryPlanner
+from .documents import CHUNK_SIZE
+
+# output -> (content type, module the writer needs)
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', None),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'openpyxl'),
+    'parquet': ('application/vnd.apache.parquet', 'pyarrow'),
+}
+
+# Leading characters that make a spreadsheet evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def spreadsheet_safe(value):
+    """
+    `value`, with a ' in front when it is a string a spreadsheet would run
+    as a formula (CSV injection). Titles, descriptions and extracted vendor
+    and item text come from staff uploads.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _metadata(key):
+    return lambda req: (req.ai_metadata or {}).get(key)
+
+
+def _step(level, attribute):
+    def get(req):
+        step = req.steps_by_level.get(level)
+        if step is None:
+            return None
+        if attribute == 'approver':
+            return step.approver.username if step.approver else None
+        return getattr(step, attribute)
+    return get
+
+
+class AuditExport:
+    """
+    Finance audit export: one flat row per request, with the extracted
+    proforma fields and one group of columns per approval level.
+
+    Requests are read with a server-side iterator in chunks of
+    AUDIT_EXPORT_CHUNK_SIZE, their approval steps and approvers prefetched
+    per chunk, so memory stays flat whatever the row count. CSV is
+    streamed as rows are read, starting with the header before the first
+    query. XLSX and Parquet end with an index, so they are written chunk
+    by chunk to a spooled file and streamed once complete. CSV and XLSX
+    text cells go through spreadsheet_safe.
+    """
+
+    # (column, type, value of a request)
+    BASE_COLUMNS = (
+        ('id', int, lambda req: req.id),
+        ('title', str, lambda req: req.title),
+        ('description', str, lambda req: req.description),
+        ('amount', Decimal, lambda req: req.amount),
+        ('status', str, lambda req: req.status),
+        ('created_by', str, lambda req: req.created_by.username),
+        ('created_at', datetime, lambda req: req.created_at),
+        ('updated_at', datetime, lambda req: req.updated_at),
+        ('current_level', int, lambda req: req.current_level),
+        ('extraction_status', str, lambda req: req.extraction_status),
+        ('vendor_name', str, _metadata('vendor_name')),
+        ('invoice_number', str, _metadata('invoice_number')),
+        ('extracted_total', float, _metadata('extracted_total')),
+        ('confidence_score', float, _metadata('confidence_score')),
+        ('line_items', int, lambda req: len((req.ai_metadata or {}).get('items') or [])),
+        ('po_status', str, lambda req: req.po_status),
+        ('purchase_order', str, lambda req: req.purchase_order_doc.name or None),
+        ('receipt_status', str, lambda req: (req.receipt_validation_data or {}).get('status')),
+    )
+
+    @staticmethod
+    def available(output):
+        module = FORMATS[output][1]
+        return module is None or importlib.util.find_spec(module) is not None
+
+    @staticmethod
+    def columns():
+        """Base columns plus status, approver, review time and comments of every approval level."""
+        columns = list(AuditExport.BASE_COLUMNS)
+        for level in ApprovalPolicy.current().levels:
+            columns += [
+                (f'level_{level}_status', str, _step(level, 'status')),
+                (f'level_{level}_approver', str, _step(level, 'approver')),
+                (f'level_{level}_reviewed_at', datetime, _step(level, 'reviewed_at')),
+                (f'level_{level}_comments', str, _step(level, 'comments')),
+            ]
+        return columns
+
+    @staticmethod
+    def filter(queryset, status=None, since=None, until=None):
+        """
+        Requests created from `since` through `until` (dates, inclusive),
+        optionally in one status, in id order. Raises ValueError.
+        """
+        if status:
+            queryset = queryset.filter(status=status)
+        if since:
+            start = timezone.make_aware(datetime.combine(datetime.strptime(since, '%Y-%m-%d'), time.min))
+            queryset = queryset.filter(created_at__gte=start)
+        if until:
+            end = timezone.make_aware(datetime.combine(datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1), time.min))
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset.select_related('created_by').prefetch_related(
+            RequestQueryPlanner.STEPS_WITH_APPROVER
+        ).order_by('id')
+
+    @staticmethod
+    def rows(queryset, columns):
+        """Yields one list of typed values per request."""
+        for req in queryset.iterator(chunk_size=settings.AUDIT_EXPORT_CHUNK_SIZE):
+            req.steps_by_level = {step.level: step for step in req.approval_steps.all()}
+            yield [value(req) for _, _, value in columns]
+
+    @staticmethod
+    def stream(queryset, output):
+        return getattr(AuditExport, f'stream_{output}')(queryset, AuditExport.columns())
+
+    @staticmethod
+    def stream_csv(queryset, columns):
+        """Yields the CSV in blocks of about CHUNK_SIZE bytes."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([name for name, _, _ in columns])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+        for row in AuditExport.rows(queryset, columns):
+            writer.writerow([
+                '' if value is None else value.isoformat() if isinstance(value, datetime) else spreadsheet_safe(value)
+                for value in row
+            ])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode()
+
+    @staticmethod
+    def stream_xlsx(queryset, columns):
+        """One write-only worksheet (rows go straight to disk), streamed once saved."""
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Requests')
+        sheet.append([name for name, _, _ in columns])
+        for row in AuditExport.rows(queryset, columns):
+            # Excel has no time zones: write local time
+            sheet.append([
+                timezone.localtime(value).replace(tzinfo=None) if isinstance(value, datetime) else spreadsheet_safe(value)
+                for value in row
+            ])
+        yield from AuditExport._spooled(workbook.save)
+
+    @staticmethod
+    def stream_parquet(queryset, columns):
+        """Typed columns, one row group per AUDIT_EXPORT_CHUNK_SIZE rows."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            int: pa.int64(), float: pa.float64(), str: pa.string(),
+            Decimal: pa.decimal128(12, 2), datetime: pa.timestamp('us', tz='UTC'),
+        }
+        schema = pa.schema([(name, types[kind]) for name, kind, _ in columns])
+
+        def write(spool):
+            with pq.ParquetWriter(spool, schema) as writer:
+                batch = []
+                for row in AuditExport.rows(queryset, columns):
+                    batch.append(row)
+                    if len(batch) == settings.AUDIT_EXPORT_CHUNK_SIZE:
+                        writer.write_table(pa.Table.from_pylist([dict(zip(schema.names, r)) for r in batch], schema))
+                        batch = []
+                if batch:
+                    writer.write_table(pa.Table.from_pylist([dict(zip(schema.names, r)) for r in batch], schema))
+
+        yield from AuditExport._spooled(write)
+
+    @staticmethod
+    def _spooled(write):
+        """Runs write(file) against a temporary file, then yields the file in chunks."""
+        with tempfile.TemporaryFile() as spool:
+            write(spool)
+            spool.seek(0)
+            yield from iter(lambda: spool.read(CHUNK_SIZE), b'')
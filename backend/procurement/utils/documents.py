@@ -0,0 +1,62 @@
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+CHUNK_SIZE = 64 * 1024
+
+
+def local_path(file_obj):
+    """Filesystem path of an upload or stored file (or of a path), or None if it only exists as a stream."""
+    if isinstance(file_obj, (str, os.PathLike)):
+        return file_obj
+    if hasattr(file_obj, 'temporary_file_path'):
+        return file_obj.temporary_file_path()
+    try:
+        return file_obj.path
+    except (AttributeError, NotImplementedError, ValueError):
+        return None
+
+
+@contextmanager
+def document_path(file_obj):
+    """
+    Yields a local filesystem path of the document. Streams that are not
+    on local disk are spooled to a temporary file first.
+    """
+    path = local_path(file_obj)
+    if path is not None:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix='.upload') as spool:
+        file_obj.seek(0)
+        shutil.copyfileobj(file_obj, spool, CHUNK_SIZE)
+        spool.flush()
+        yield spool.name
+
+
+@contextmanager
+def document_view(file_obj):
+    """
+    Yields a read-only memory map of the document. Pages are loaded by the
+    OS on demand, so extractors can seek/slice it like bytes without the
+    file ever being read into process memory (see document_path).
+    """
+    with document_path(file_obj) as path, open(path, 'rb') as handle:
+        if handle.seek(0, 2) == 0:
+            # Empty files cannot be mapped
+            yield memoryview(b'')
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            yield view
+
+
+def iter_chunks(file_obj, chunk_size=CHUNK_SIZE):
+    """Iterates over a file in fixed-size chunks from the start."""
+    file_obj.seek(0)
+    if hasattr(file_obj, 'chunks'):
+        yield from file_obj.chunks(chunk_size)
+    else:
+        yield from iter(lambda: file_obj.read(chunk_size), b'')
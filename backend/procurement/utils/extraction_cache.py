@@ -0,0 +1,102 @@
+import hashlib
+from typing import Any, Callable, Dict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .documents import iter_chunks
+
+HASH_BLOCK_SIZE = 64 * 1024
+
+
+def sha256_file(file_obj) -> str:
+    """
+    SHA-256 of a file's bytes. Uses the digest computed while streaming the
+    upload when available; otherwise reads the file in blocks so large
+    documents are never held in memory.
+    """
+    precomputed = getattr(file_obj, 'sha256', None)
+    if precomputed:
+        return precomputed
+
+    digest = hashlib.sha256()
+    for chunk in iter_chunks(file_obj, HASH_BLOCK_SIZE):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Caches document extraction results by content hash.
+    Identical uploads (e.g. the same vendor quote on several requests) are
+    extracted once; entries from an older extractor version are ignored.
+    """
+    HITS_KEY = 'extraction:stats:hits'
+    MISSES_KEY = 'extraction:stats:misses'
+
+    @staticmethod
+    def backend():
+        return caches[settings.EXTRACTION_CACHE_ALIAS]
+
+    @staticmethod
+    def key(kind: str, digest: str, *extra) -> str:
+        parts = [kind, digest, *(str(value) for value in extra)]
+        return 'extraction:' + ':'.join(parts)
+
+    @staticmethod
+    def get_or_compute(kind: str, digest: str, version: str, compute: Callable[[], Dict[str, Any]], *extra,
+                       cache_if: Callable[[Dict[str, Any]], bool] = None):
+        """The cached result, or compute() (stored unless `cache_if` rejects it)."""
+        result = ExtractionCache.lookup(kind, digest, version, *extra)
+        if result is None:
+            result = compute()
+            if cache_if is None or cache_if(result):
+                ExtractionCache.store(kind, digest, version, result, *extra)
+        return result
+
+    @staticmethod
+    def lookup(kind: str, digest: str, version: str, *extra):
+        """The cached result for this version, or None (counted as a miss)."""
+        entry = ExtractionCache.backend().get(ExtractionCache.key(kind, digest, *extra))
+        if entry is not None and entry.get('version') == version:
+            ExtractionCache._incr(ExtractionCache.HITS_KEY)
+            return entry['result']
+
+        ExtractionCache._incr(ExtractionCache.MISSES_KEY)
+        return None
+
+    @staticmethod
+    def store(kind: str, digest: str, version: str, result: Dict[str, Any], *extra):
+        ExtractionCache.backend().set(ExtractionCache.key(kind, digest, *extra), {
+            'version': version,
+            'result': result,
+            'cached_at': timezone.now().isoformat(),
+        }, timeout=settings.EXTRACTION_CACHE_TIMEOUT)
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        cache = ExtractionCache.backend()
+        hits = cache.get(ExtractionCache.HITS_KEY, 0)
+        misses = cache.get(ExtractionCache.MISSES_KEY, 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    @staticmethod
+    def reset_stats():
+        ExtractionCache.backend().delete_many([ExtractionCache.HITS_KEY, ExtractionCache.MISSES_KEY])
+
+    @staticmethod
+    def _incr(key):
+        cache = ExtractionCache.backend()
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr(); counters are best effort
+            cache.set(key, 1, timeout=None)
@@ -0,0 +1,242 @@
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .timeouts import call_with_time_limit
+
+logger = logging.getLogger(__name__)
+
+# (text, confidence from 0 to 1) of one page
+Page = Tuple[str, float]
+
+# A page without readable text
+UNREADABLE_PAGE: Page = ('', 0.0)
+
+
+class ProformaExtractor:
+    """
+    Reads the text of a proforma or receipt, page by page (PROFORMA_EXTRACTOR).
+
+    Pages are read independently and possibly in other processes, so an
+    extractor must be picklable and `read_page` must open the document
+    itself. A page with no readable text is UNREADABLE_PAGE; `read_page`
+    raises when reading fails for a reason that may not last (a timeout,
+    an engine error), so the result is not cached and is retried.
+    """
+
+    def page_count(self, path) -> int:
+        raise NotImplementedError
+
+    def read_page(self, path, number: int) -> Page:
+        raise NotImplementedError
+
+
+class LocalExtractor(ProformaExtractor):
+    """
+    Offline extractor. PDF pages are read from their text layer with
+    pdfplumber; pages without one (scans) are rasterized with Pillow and
+    run through Tesseract OCR, as are image uploads (one page). OCR needs
+    pytesseract and the tesseract binary; without them scanned pages come
+    back empty, with confidence 0. Documents that cannot be opened have no
+    pages.
+
+    Confidence is 1.0 for a text layer and Tesseract's mean word
+    confidence for OCR.
+    """
+
+    # Text layers shorter than this are treated as scans
+    MIN_TEXT_CHARS = 20
+    OCR_RESOLUTION = 300  # dpi
+
+    def page_count(self, path):
+        if self._is_pdf(path):
+            import pdfplumber
+            try:
+                with pdfplumber.open(path) as pdf:
+                    return len(pdf.pages)
+            except Exception:
+                logger.warning("Unreadable PDF %s", path, exc_info=True)
+                return 0
+
+        from PIL import Image
+        try:
+            with Image.open(path) as image:
+                image.verify()
+            return 1
+        except Exception:
+            return 0
+
+    def read_page(self, path, number):
+        if not self._is_pdf(path):
+            from PIL import Image
+            with Image.open(path) as image:
+                return self.ocr(image)
+
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            page = pdf.pages[number]
+            text = page.extract_text() or ''
+            if len(text.strip()) >= self.MIN_TEXT_CHARS:
+                return text, 1.0
+            image = page.to_image(resolution=self.OCR_RESOLUTION).original
+        scanned = self.ocr(image)
+        return scanned if scanned[0].strip() else (text, 1.0 if text.strip() else 0.0)
+
+    def ocr(self, image) -> Page:
+        """
+        Text of a PIL image, one line per OCR line, and the mean word
+        confidence. Tesseract errors and timeouts raise.
+        """
+        try:
+            import pytesseract
+        except ImportError:
+            return UNREADABLE_PAGE
+        try:
+            # Tesseract is killed once the page's time is up
+            data = pytesseract.image_to_data(
+                image, output_type=pytesseract.Output.DICT, timeout=settings.EXTRACTION_PAGE_TIMEOUT
+            )
+        except pytesseract.TesseractNotFoundError:
+            logger.warning("OCR skipped: the tesseract binary is not installed")
+            return UNREADABLE_PAGE
+
+        lines, confidences = {}, []
+        for i, word in enumerate(data['text']):
+            confidence = float(data['conf'][i])
+            if not word.strip() or confidence < 0:
+                continue
+            lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(word)
+            confidences.append(confidence)
+        if not confidences:
+            return UNREADABLE_PAGE
+        text = '\n'.join(' '.join(words) for words in lines.values())
+        return text, sum(confidences) / len(confidences) / 100
+
+    @staticmethod
+    def _is_pdf(path):
+        with open(path, 'rb') as handle:
+            return handle.read(5) == b'%PDF-'
+
+
+def proforma_extractor() -> ProformaExtractor:
+    return import_string(settings.PROFORMA_EXTRACTOR)()
+
+
+def read_inline(func: Callable, items: Iterable, timeout=None, default=None) -> List:
+    """
+    Page mapper used outside the worker's process pool: one page after the
+    other, with the limits and failure handling of jobs.offload_each.
+    """
+    pages = []
+    for item in items:
+        try:
+            pages.append(call_with_time_limit(func, timeout, item))
+        except Exception:
+            logger.warning("Failed to read page %s", item, exc_info=True)
+            pages.append(default)
+    return pages
+
+
+# Lines of a proforma or receipt, matched case-insensitively
+MONEY = r'[$€£]?\s*(\d[\d,]*\.\d{2})'
+INVOICE_RE = re.compile(
+    r'\b(?:invoice|proforma|quote|quotation)\s*(?:no\.?|number|num|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9/-]*\d[A-Z0-9/-]*)',
+    re.IGNORECASE
+)
+INVOICE_TOKEN_RE = re.compile(r'\b(INV[-/ ]?\d+)\b', re.IGNORECASE)
+RECEIPT_RE = re.compile(
+    r'\b(?:receipt|transaction|order)\s*(?:no\.?|number|num|#)\s*[:#]?\s*([A-Z0-9][A-Z0-9/-]*\d[A-Z0-9/-]*)',
+    re.IGNORECASE
+)
+RECEIPT_TOKEN_RE = re.compile(r'\b(RC?T[-/ ]?\d+)\b', re.IGNORECASE)
+VENDOR_RE = re.compile(r'^(?:vendor|supplier|seller|from|company)\s*[:-]\s*(.+)$', re.IGNORECASE)
+TITLE_RE = re.compile(r'^(?:pro\s*-?\s*forma|invoice|quot(?:e|ation)|estimate|(?:sales\s+)?receipt)\b', re.IGNORECASE)
+TOTAL_RE = re.compile(rf'^(?:grand\s+)?total(?:\s+(?:due|amount|payable))?\s*[:-]?\s*{MONEY}', re.IGNORECASE)
+ITEM_RE = re.compile(
+    rf'^(?P<description>[^\W\d].*?)\s+(?P<quantity>\d+(?:\.\d+)?)\s*(?:x|pcs|units?)?\s+@?\s*{MONEY}(?:\s+{MONEY})?$',
+    re.IGNORECASE
+)
+# Summary lines that look like line items
+NOT_ITEMS_RE = re.compile(r'^(?:sub\s*-?\s*total|total|tax|vat|shipping|discount|balance)\b', re.IGNORECASE)
+
+
+def _money(value):
+    return float(value.replace(',', ''))
+
+
+def _parse(pages: List[Optional[Page]], number_patterns) -> Dict[str, Any]:
+    """
+    Fields found in the text of a document's pages: vendor, document
+    number (the first of `number_patterns` that matches), line items and
+    total. `confidence_score` is the mean page confidence scaled by the
+    share of those four fields that were found. Pages that failed to be
+    read are None; they count as unreadable and are reported in
+    `failed_pages`.
+    """
+    failed = sum(page is None for page in pages)
+    pages = [UNREADABLE_PAGE if page is None else page for page in pages]
+    lines = [line.strip() for text, _ in pages for line in text.splitlines() if line.strip()]
+    text = '\n'.join(lines)
+
+    number = next(filter(None, (pattern.search(text) for pattern in number_patterns)), None)
+    vendor = next((match.group(1).strip() for match in map(VENDOR_RE.match, lines) if match), None)
+    if vendor is None:
+        # Letterhead: the first line that is not the document's title
+        vendor = next((line for line in lines if not TITLE_RE.match(line) and re.search(r'[^\W\d]', line)), None)
+
+    items = []
+    for line in lines:
+        match = ITEM_RE.match(line)
+        if match and not NOT_ITEMS_RE.match(line):
+            items.append({
+                "description": match.group('description').strip(),
+                "quantity": float(match.group('quantity')),
+                "price": _money(match.group(3)),
+            })
+    totals = [_money(match.group(1)) for match in map(TOTAL_RE.match, lines) if match]
+    total = totals[-1] if totals else None
+    if total is None and items:
+        total = round(sum(item['quantity'] * item['price'] for item in items), 2)
+
+    read = sum(confidence for _, confidence in pages) / len(pages) if pages else 0.0
+    found = sum(bool(field) for field in (vendor, number, items, total is not None)) / 4
+    return {
+        "vendor_name": vendor,
+        "number": number.group(1) if number else None,
+        "items": items,
+        "total": total,
+        "confidence_score": round(read * found, 2),
+        "pages": len(pages),
+        "failed_pages": failed,
+    }
+
+
+def parse_proforma(pages: List[Optional[Page]]) -> Dict[str, Any]:
+    """Proforma fields found in the text of its pages (see `_parse`)."""
+    fields = _parse(pages, (INVOICE_RE, INVOICE_TOKEN_RE))
+    return {
+        "vendor_name": fields["vendor_name"],
+        "invoice_number": fields["number"],
+        "items": fields["items"],
+        "extracted_total": fields["total"],
+        "confidence_score": fields["confidence_score"],
+        "pages": fields["pages"],
+        "failed_pages": fields["failed_pages"],
+    }
+
+
+def parse_receipt(pages: List[Optional[Page]]) -> Dict[str, Any]:
+    """Receipt fields found in the text of its pages (see `_parse`)."""
+    fields = _parse(pages, (RECEIPT_RE, RECEIPT_TOKEN_RE, INVOICE_RE, INVOICE_TOKEN_RE))
+    return {
+        "vendor_name": fields["vendor_name"],
+        "receipt_number": fields["number"],
+        "items": fields["items"],
+        "total": fields["total"],
+        "confidence_score": fields["confidence_score"],
+        "pages": fields["pages"],
+        "failed_pages": fields["failed_pages"],
+    }
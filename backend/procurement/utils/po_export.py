@@ -0,0 +1,107 @@
+import io
+import tempfile
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import PurchaseRequest
+from ..query_planner import RequestQueryPlanner
+from ..services import WorkflowEngine
+from .ai_processor import render_purchase_order_pdf, render_purchase_orders_pdf
+from .documents import CHUNK_SIZE, iter_chunks
+
+
+class _ZipStream(io.RawIOBase):
+    """
+    Write-only sink for zipfile. It is not seekable, so zipfile writes data
+    descriptors instead of seeking back, and the bytes written so far can
+    be handed to the response after every entry.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class PurchaseOrderExport:
+    """
+    Streams the purchase orders approved in a month as one ZIP (the stored
+    PO files) or one combined PDF (re-rendered with the shared letterhead).
+    Rows are read with a server-side iterator; the ZIP holds at most one
+    PO in memory at a time.
+    """
+
+    @staticmethod
+    def month_range(month):
+        """'YYYY-MM' -> (start, end) aware datetimes. Raises ValueError."""
+        start = timezone.make_aware(datetime.strptime(month, '%Y-%m'))
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        return start, end
+
+    @staticmethod
+    def for_month(queryset, month):
+        """Approved requests whose final approval falls in `month`."""
+        start, end = PurchaseOrderExport.month_range(month)
+        return (
+            RequestQueryPlanner.with_approved_at(queryset.filter(status__in=PurchaseRequest.PURCHASED_STATUSES))
+            .filter(approved_at__gte=start, approved_at__lt=end)
+            .only('id', 'title', 'amount', 'ai_metadata', 'purchase_order_doc')
+            .order_by('approved_at', 'id')
+        )
+
+    @staticmethod
+    def payload(req):
+        """The payload the stored PO was rendered from (see WorkflowEngine.purchase_order_payload)."""
+        return WorkflowEngine.purchase_order_payload(req)
+
+    @staticmethod
+    def stream_zip(queryset):
+        """Yields a ZIP of every PO, one entry at a time."""
+        sink = _ZipStream()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for req in queryset.iterator(chunk_size=settings.PO_EXPORT_CHUNK_SIZE):
+                with archive.open(f"PO-{req.id:05d}.pdf", 'w') as entry:
+                    if req.purchase_order_doc:
+                        with req.purchase_order_doc.open('rb') as stored:
+                            for chunk in iter_chunks(stored):
+                                entry.write(chunk)
+                    else:
+                        # Not rendered yet (or rendering failed): render it now
+                        entry.write(render_purchase_order_pdf(PurchaseOrderExport.payload(req)))
+                yield sink.drain()
+        yield sink.drain()
+
+    @staticmethod
+    def stream_pdf(queryset):
+        """
+        Yields one PDF with a page per PO. ReportLab keeps the document
+        until save() writes the cross-reference table, so callers cap the
+        page count (PO_EXPORT_MAX_PDF_DOCUMENTS); the finished file is
+        spooled to disk and streamed in chunks.
+        """
+        payloads = (
+            PurchaseOrderExport.payload(req)
+            for req in queryset.iterator(chunk_size=settings.PO_EXPORT_CHUNK_SIZE)
+        )
+        with tempfile.TemporaryFile() as spool:
+            render_purchase_orders_pdf(payloads, spool)
+            spool.seek(0)
+            yield from iter(lambda: spool.read(CHUNK_SIZE), b'')
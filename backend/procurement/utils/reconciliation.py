@@ -0,0 +1,225 @@
+import re
+import zlib
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+# Bump whenever the matching rules change so stored results are recomputed
+# by `manage.py reconcile_receipts`.
+RECONCILIATION_VERSION = '2'
+
+# Width of the hashed character-trigram vectors used to compare descriptions
+FEATURE_DIM = 512
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# (expected_total, expected_items, receipt_data)
+Case = Tuple[Any, Sequence[Dict[str, Any]], Dict[str, Any]]
+
+
+def _trigram_buckets(text: str) -> List[int]:
+    normalized = f"  {_NON_ALNUM.sub(' ', str(text).lower()).strip()} "
+    return [zlib.crc32(normalized[i:i + 3].encode()) % FEATURE_DIM for i in range(len(normalized) - 2)]
+
+
+def description_vectors(descriptions: Sequence[str]) -> np.ndarray:
+    """
+    L2-normalised hashed trigram counts, one row per description. The dot
+    product of two rows is their cosine similarity (1.0 = same trigrams).
+    Each distinct description is only tokenised once.
+    """
+    unique, inverse = np.unique(np.asarray(descriptions, dtype=str), return_inverse=True)
+    matrix = np.zeros((len(unique), FEATURE_DIM), dtype=np.float32)
+    for row, text in enumerate(unique):
+        np.add.at(matrix[row], _trigram_buckets(text), 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix[inverse.reshape(-1)]
+
+
+def _flatten(item_lists: Sequence[Sequence[Dict[str, Any]]]):
+    """Concatenates per-case line items into (group, description, quantity, price) arrays."""
+    groups, descriptions, quantities, prices = [], [], [], []
+    for group, items in enumerate(item_lists):
+        for item in items or ():
+            groups.append(group)
+            descriptions.append(str(item.get('description', '')))
+            quantities.append(float(item.get('quantity') or 0))
+            prices.append(float(item.get('price') or 0))
+    return (
+        np.asarray(groups, dtype=np.int64),
+        descriptions,
+        np.asarray(quantities, dtype=np.float64),
+        np.asarray(prices, dtype=np.float64),
+    )
+
+
+def _exceeds_tolerance(actual, expected):
+    """Element-wise: does `actual` differ from `expected` by more than the allowed slack?"""
+    slack = np.maximum(settings.RECONCILIATION_ABSOLUTE_TOLERANCE,
+                       settings.RECONCILIATION_RELATIVE_TOLERANCE * np.abs(expected))
+    return np.abs(actual - expected) > slack
+
+
+def receipt_readable(receipt_data) -> bool:
+    """Whether extraction read the receipt fully and found its items or total."""
+    receipt_data = receipt_data or {}
+    return not receipt_data.get('failed_pages') and bool(
+        receipt_data.get('items') or receipt_data.get('total') is not None
+    )
+
+
+class ReconciliationEngine:
+    """
+    Reconciles extracted receipts against the purchase order they pay for.
+
+    A batch of receipts is flattened into line-item arrays so every check
+    (fuzzy description matching, quantity, unit price and total) runs as a
+    handful of NumPy operations for the whole batch instead of per receipt.
+    """
+
+    @staticmethod
+    def reconcile(expected_total, expected_items, receipt_data) -> Dict[str, Any]:
+        """Reconciles a single receipt. See `reconcile_batch`."""
+        return ReconciliationEngine.reconcile_batch([(expected_total, expected_items, receipt_data)])[0]
+
+    @staticmethod
+    def reconcile_batch(cases: Sequence[Case]) -> List[Dict[str, Any]]:
+        """
+        Each case is (expected_total, expected_items, receipt_data) where
+        expected_items are the PO line items (`ai_metadata['items']`) and
+        receipt_data is the output of `DocumentProcessor.extract_receipt_data`.
+        Returns one `receipt_validation_data` dict per case, in order.
+
+        Memory grows with (receipt lines x PO lines) of the batch, so callers
+        should keep batches bounded (RECONCILIATION_BATCH_SIZE).
+
+        A receipt that could not be read (no line items and no total, or
+        pages that failed) is UNVERIFIED, with no discrepancies: comparing
+        the PO against it would only report what extraction missed.
+        """
+        n = len(cases)
+        results = [{
+            "status": "MATCH",
+            "message": "",
+            "engine_version": RECONCILIATION_VERSION,
+            "expected_total": 0.0,
+            "receipt_total": 0.0,
+            "matched_items": [],
+            "discrepancies": [],
+        } for _ in range(n)]
+        if not n:
+            return results
+
+        # 1. Flatten PO and receipt line items of the whole batch
+        po_group, po_desc, po_qty, po_price = _flatten([items for _, items, _ in cases])
+        rc_group, rc_desc, rc_qty, rc_price = _flatten([(receipt or {}).get('items') for _, _, receipt in cases])
+
+        # 2. Totals: the stated receipt total, or the sum of its lines when absent
+        expected_total = np.asarray([float(total or 0) for total, _, _ in cases])
+        line_totals = np.bincount(rc_group, weights=rc_qty * rc_price, minlength=n)
+        stated = np.asarray([
+            np.nan if (receipt or {}).get('total') is None else float(receipt['total'])
+            for _, _, receipt in cases
+        ])
+        receipt_total = np.where(np.isnan(stated), line_totals, stated)
+        total_mismatch = _exceeds_tolerance(receipt_total, expected_total)
+
+        # 3. Fuzzy-match receipt lines to PO lines of the same case. A pair
+        #    matches when each is the other's most similar line and the
+        #    similarity clears the threshold, so no line is matched twice.
+        matched_rc = np.zeros(len(rc_group), dtype=bool)
+        matched_po = np.zeros(len(po_group), dtype=bool)
+        pairs_rc = pairs_po = np.empty(0, dtype=np.int64)
+        similarity = None
+        if len(rc_group) and len(po_group):
+            similarity = description_vectors(rc_desc) @ description_vectors(po_desc).T
+            similarity[rc_group[:, None] != po_group[None, :]] = -1.0
+            best_po = similarity.argmax(axis=1)
+            best_rc = similarity.argmax(axis=0)
+            rows = np.arange(len(rc_group))
+            mutual = (best_rc[best_po] == rows) & (
+                similarity[rows, best_po] >= settings.RECONCILIATION_MATCH_THRESHOLD
+            )
+            pairs_rc, pairs_po = rows[mutual], best_po[mutual]
+            matched_rc[pairs_rc] = True
+            matched_po[pairs_po] = True
+
+        # 4. Quantity and unit price checks on matched pairs
+        quantity_mismatch = rc_qty[pairs_rc] != po_qty[pairs_po]
+        price_mismatch = _exceeds_tolerance(rc_price[pairs_rc], po_price[pairs_po])
+
+        # 5. Unmatched lines; receipts are only itemised against POs that have items
+        has_po_items = np.bincount(po_group, minlength=n) > 0
+        unexpected = np.flatnonzero(~matched_rc & has_po_items[rc_group])
+        missing = np.flatnonzero(~matched_po)
+
+        # 6. Assemble per-case results (loops only touch matched/flagged lines)
+        for case in range(n):
+            results[case]["expected_total"] = round(float(expected_total[case]), 2)
+            results[case]["receipt_total"] = round(float(receipt_total[case]), 2)
+            if total_mismatch[case]:
+                results[case]["discrepancies"].append({
+                    "code": "TOTAL_MISMATCH",
+                    "item": None,
+                    "expected": round(float(expected_total[case]), 2),
+                    "actual": round(float(receipt_total[case]), 2),
+                    "message": f"Receipt total {receipt_total[case]:.2f} differs from PO total {expected_total[case]:.2f}.",
+                })
+
+        for k, (r, p) in enumerate(zip(pairs_rc, pairs_po)):
+            result = results[rc_group[r]]
+            result["matched_items"].append({
+                "receipt_item": rc_desc[r],
+                "po_item": po_desc[p],
+                "similarity": round(float(similarity[r, p]), 3),
+            })
+            if quantity_mismatch[k]:
+                result["discrepancies"].append({
+                    "code": "QUANTITY_MISMATCH",
+                    "item": po_desc[p],
+                    "expected": float(po_qty[p]),
+                    "actual": float(rc_qty[r]),
+                    "message": f"Quantity of '{po_desc[p]}' is {rc_qty[r]:g}, expected {po_qty[p]:g}.",
+                })
+            if price_mismatch[k]:
+                result["discrepancies"].append({
+                    "code": "PRICE_MISMATCH",
+                    "item": po_desc[p],
+                    "expected": round(float(po_price[p]), 2),
+                    "actual": round(float(rc_price[r]), 2),
+                    "message": f"Unit price of '{po_desc[p]}' is {rc_price[r]:.2f}, expected {po_price[p]:.2f}.",
+                })
+
+        for r in unexpected:
+            results[rc_group[r]]["discrepancies"].append({
+                "code": "UNEXPECTED_ITEM",
+                "item": rc_desc[r],
+                "expected": None,
+                "actual": float(rc_qty[r]),
+                "message": f"'{rc_desc[r]}' is on the receipt but not on the purchase order.",
+            })
+
+        for p in missing:
+            results[po_group[p]]["discrepancies"].append({
+                "code": "MISSING_ITEM",
+                "item": po_desc[p],
+                "expected": float(po_qty[p]),
+                "actual": None,
+                "message": f"'{po_desc[p]}' is on the purchase order but not on the receipt.",
+            })
+
+        for result, (_, _, receipt) in zip(results, cases):
+            count = len(result["discrepancies"])
+            if not receipt_readable(receipt):
+                result.update(
+                    status="UNVERIFIED", receipt_total=None, matched_items=[], discrepancies=[],
+                    message="The receipt could not be read, so it was not reconciled."
+                )
+            elif count:
+                result["status"] = "MISMATCH"
+                result["message"] = f"{count} discrepanc{'y' if count == 1 else 'ies'} found against the Purchase Order."
+            else:
+                result["message"] = "Receipt matches Purchase Order."
+        return results
@@ -0,0 +1,189 @@
+import csv
+import hashlib
+import io
+import json
+import os
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+from core.models import User
+from ..models import PurchaseRequest
+from ..serializers import PurchaseRequestSerializer
+from ..services import WorkflowEngine
+from ..upload_handlers import SNIFF_BYTES, sniff_content_type
+from .documents import CHUNK_SIZE
+
+FORMATS = ('csv', 'jsonl')
+
+# Columns read from every row; `created_by` only when the caller allows it
+FIELDS = ('title', 'description', 'amount')
+
+
+class RowError(Exception):
+    """A row that cannot be imported; `detail` is a message or serializer errors."""
+
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+def read_rows(stream, fmt):
+    """
+    Yields (line, row) pairs from a binary CSV (with a header) or JSONL
+    stream, one row at a time. A row that cannot be parsed is yielded as
+    a RowError instead of a dict.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line, raw in enumerate(text, 1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError as exc:
+            yield line, RowError(f"Invalid JSON: {exc}")
+            continue
+        yield line, row if isinstance(row, dict) else RowError("Each line must be a JSON object.")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class RequestImport:
+    """
+    Streams a CSV or JSONL file of purchase requests into the database.
+
+    Rows are read lazily and handled in chunks of REQUEST_IMPORT_CHUNK_SIZE:
+    each chunk is validated with PurchaseRequestSerializer, its proformas
+    are copied out of the optional ZIP archive (named by the row's
+    `proforma` column), and WorkflowEngine.create_requests inserts it with
+    one bulk_create per table and queues one batch extraction job. Memory
+    is bounded by the chunk, whatever the size of the input.
+
+    Each chunk commits on its own; rows that fail validation are reported
+    and skipped. Proformas stored for a chunk that then fails to commit are
+    left for gc_documents.
+    """
+
+    def __init__(self, owner, archive=None, owner_column=False, chunk_size=None):
+        self.owner = owner
+        self.archive = archive
+        self.owner_column = owner_column
+        self.chunk_size = chunk_size or settings.REQUEST_IMPORT_CHUNK_SIZE
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def run(self, stream, fmt):
+        for chunk in chunked(read_rows(stream, fmt), self.chunk_size):
+            self.import_chunk(chunk)
+        return self.summary()
+
+    def summary(self):
+        return {"created": self.created, "failed": self.failed, "errors": self.errors}
+
+    def fail(self, line, detail):
+        self.failed += 1
+        if len(self.errors) < settings.REQUEST_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "detail": detail})
+
+    def import_chunk(self, chunk):
+        owners = self.owners(chunk)
+        requests = []
+        for line, row in chunk:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                data, owner, proforma = self.validate(row, owners)
+            except RowError as exc:
+                self.fail(line, exc.detail)
+                continue
+            # One spooled proforma at a time: it is moved into storage right away
+            with proforma:
+                req = PurchaseRequest(**data, created_by=owner, proforma_sha256=proforma.sha256)
+                req.proforma_file.save(proforma.name, proforma, save=False)
+            requests.append(req)
+
+        if requests:
+            WorkflowEngine.create_requests(requests)
+            self.created += len(requests)
+
+    def owners(self, chunk):
+        """Creators named in this chunk's `created_by` column, with one query."""
+        if not self.owner_column:
+            return {}
+        usernames = {row.get('created_by') for _, row in chunk if isinstance(row, dict) and row.get('created_by')}
+        return {user.username: user for user in User.objects.filter(username__in=usernames)}
+
+    def validate(self, row, owners):
+        """(validated data, creator, spooled proforma) of a row, or RowError."""
+        owner = self.owner
+        if self.owner_column and row.get('created_by'):
+            owner = owners.get(row['created_by'])
+            if owner is None:
+                raise RowError(f"Unknown user '{row['created_by']}'.")
+        if owner is None:
+            raise RowError("No creator: set `created_by` or pass a default owner.")
+
+        proforma = self.proforma(row.get('proforma'))
+        serializer = PurchaseRequestSerializer(data={
+            **{field: row.get(field) for field in FIELDS if row.get(field) is not None},
+            'proforma_file': proforma,
+        })
+        if not serializer.is_valid():
+            proforma.close()
+            raise RowError({field: [str(error) for error in errors] for field, errors in serializer.errors.items()})
+        data = serializer.validated_data
+        data.pop('proforma_file', None)
+        return data, owner, proforma
+
+    def proforma(self, name):
+        """
+        Copies an archive member to a temporary upload in chunks, hashing
+        and sniffing it like a direct upload (same size and type limits).
+        """
+        if not name:
+            raise RowError("The `proforma` column is required.")
+        if self.archive is None:
+            raise RowError("Proformas must be uploaded as a ZIP archive.")
+        try:
+            info = self.archive.getinfo(name)
+        except KeyError:
+            raise RowError(f"'{name}' is not in the proforma archive.")
+        if info.file_size > settings.PROCUREMENT_MAX_UPLOAD_SIZE:
+            raise RowError(f"'{name}' exceeds the {settings.PROCUREMENT_MAX_UPLOAD_SIZE} byte upload limit.")
+
+        upload = TemporaryUploadedFile(os.path.basename(name), 'application/octet-stream', info.file_size, None)
+        digest = hashlib.sha256()
+        head = b''
+        received = 0
+        with self.archive.open(info) as member:
+            while block := member.read(CHUNK_SIZE):
+                received += len(block)
+                if received > settings.PROCUREMENT_MAX_UPLOAD_SIZE:
+                    # The archive understated the member's size
+                    upload.close()
+                    raise RowError(f"'{name}' exceeds the {settings.PROCUREMENT_MAX_UPLOAD_SIZE} byte upload limit.")
+                if len(head) < SNIFF_BYTES:
+                    head += block[:SNIFF_BYTES - len(head)]
+                digest.update(block)
+                upload.write(block)
+        upload.seek(0)
+        upload.sha256 = digest.hexdigest()
+        upload.content_type = sniff_content_type(head)
+        if upload.content_type not in settings.PROCUREMENT_ALLOWED_DOCUMENT_TYPES:
+            upload.close()
+            raise RowError(
+                f"'{name}' is not a supported document ({', '.join(settings.PROCUREMENT_ALLOWED_DOCUMENT_TYPES)})."
+            )
+        return upload
@@ -0,0 +1,35 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+async def aiterate(iterable):
+    """
+    Async iterator over a sync one, reading one chunk at a time in Django's
+    sync thread (where the request's database connection lives). Under
+    ASGI, Django 5.0 collects a sync streaming_content into a list before
+    sending anything; this keeps the response streamed.
+    """
+    iterator = iter(iterable)
+    pull = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await pull(iterator, _DONE)) is not _DONE:
+            yield chunk
+    finally:
+        # Client gone or stream done: release the generator's cursor and files
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_response(request, iterable, content_type):
+    """
+    StreamingHttpResponse of a sync iterator that stays streamed under both
+    servers: async (see aiterate) for ASGI requests, as-is for WSGI ones.
+    """
+    request = getattr(request, '_request', request)
+    if isinstance(request, ASGIRequest):
+        iterable = aiterate(iterable)
+    return StreamingHttpResponse(iterable, content_type=content_type)
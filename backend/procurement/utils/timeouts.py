@@ -0,0 +1,29 @@
+import signal
+import threading
+
+
+class TimeLimitExceeded(Exception):
+    """Raised inside a call that ran past its time limit."""
+
+
+def call_with_time_limit(func, seconds, *args):
+    """
+    Returns func(*args), interrupting it with TimeLimitExceeded once it has
+    run `seconds` (measured from when the call starts, not from when it was
+    queued). Uses SIGALRM, which only reaches the main thread: in other
+    threads (the worker's job threads when it has no process pool) the call
+    runs without a limit. Model-free so it can run in a process pool.
+    """
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        return func(*args)
+
+    def expire(signum, frame):
+        raise TimeLimitExceeded(f"{getattr(func, '__name__', func)} ran longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
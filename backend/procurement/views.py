@@ -1,12 +1,43 @@
-from rest_framework import viewsets, status, filters
+import asyncio
+import hashlib
+import json
+import time
+import zipfile
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from rest_framework import viewsets, status, filters, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
+from .events import StreamTickets, hub
 from .models import PurchaseRequest, ApprovalStep
-from .serializers import PurchaseRequestSerializer
+from .serializers import (
+    PurchaseRequestSerializer, PurchaseRequestListSerializer,
+    JobSerializer, BulkReviewSerializer, RequestFlagSerializer
+)
+from .pagination import PurchaseRequestCursorPagination
+from .policies import ApprovalPolicy
 from .services import WorkflowEngine
+from .query_planner import RequestQueryPlanner
+from .search import RequestSearch
+from .upload_handlers import StreamingDocumentUploadHandler
+from .utils.audit_export import FORMATS as EXPORT_FORMATS, AuditExport
+from .utils.po_export import PurchaseOrderExport
+from .utils.request_import import FORMATS as IMPORT_FORMATS, RequestImport
+from .utils.streaming import streaming_response
+from core.authentication import ClaimsJWTAuthentication
 from core.models import User
 
 class PurchaseRequestViewSet(viewsets.ModelViewSet):
@@ -18,15 +49,23 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     
+    pagination_class = PurchaseRequestCursorPagination
     filter_backends = [filters.OrderingFilter]
-    ordering_fields = ['created_at', 'status']
+    ordering_fields = ['created_at']
+    ordering = ('-created_at', '-id')
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Stream uploads to disk with hashing, type sniffing and size caps
+        max_size = None
+        if self.action_map.get(request.method.lower()) == 'import_requests':
+            max_size = settings.REQUEST_IMPORT_MAX_UPLOAD_SIZE
+        request.upload_handlers = [StreamingDocumentUploadHandler(request, max_size=max_size)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def get_queryset(self):
         """
-        Role-Based Data Filtering:
-        - Staff: See only their own requests.
-        - Approvers: See ALL requests relevant to their level (Pending OR History).
-        - Finance: See all APPROVED requests.
+        Role-Based Data Filtering plus the eager-loading plan for the
+        current action (see RequestQueryPlanner).
         """
     
         if getattr(self, 'swagger_fake_view', False):
@@ -34,33 +73,63 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
 
         user = self.request.user
         
-        # 2. Safety check for anonymous users
+        # Safety check for anonymous users
         if not user.is_authenticated:
             return PurchaseRequest.objects.none()
 
-        # 3. Role-Based Filtering
-        if user.role == User.Role.STAFF:
-            return PurchaseRequest.objects.filter(created_by=user)
-        
-        elif user.role == User.Role.APPROVER_L1:
-            # L1 sees any request that HAS a level 1 step.
-            return PurchaseRequest.objects.filter(approval_steps__level=1)
-            
-        elif user.role == User.Role.APPROVER_L2:
-            # L2 sees requests where L1 is already Approved AND an L2 step exists.
-            return PurchaseRequest.objects.filter(
-                approval_steps__level=1,
-                approval_steps__status=ApprovalStep.Status.APPROVED
-            ).filter(
-                approval_steps__level=2
-            )
-            
-        elif user.role == User.Role.FINANCE:
-            # Finance sees everything that has been fully approved
-            return PurchaseRequest.objects.filter(status=PurchaseRequest.Status.APPROVED)
-            
-        # Default: See nothing
-        return PurchaseRequest.objects.none()
+        queryset = RequestQueryPlanner.build(user, self.action)
+
+        # Optional ?status= filter for list pages (e.g. an approver's pending inbox)
+        status_filter = self.request.query_params.get('status')
+        if self.action == 'list' and status_filter in PurchaseRequest.Status.values:
+            queryset = queryset.filter(status=status_filter)
+
+        # Optional ?q= full-text search over requests and their extracted data, most relevant first
+        search = self.request.query_params.get('q', '').strip()
+        if self.action == 'list' and search:
+            queryset = RequestSearch.ranked(queryset, search)
+
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return PurchaseRequestListSerializer
+        return PurchaseRequestSerializer
+
+    @staticmethod
+    def _etag(*parts):
+        return quote_etag(hashlib.sha256(repr(parts).encode()).hexdigest()[:32])
+
+    @staticmethod
+    def _conditional(request, etag, render):
+        """
+        Answers 304 when the client's copy still matches `etag`; otherwise
+        builds the response with `render()`. Either way the response is
+        marked private and must be revalidated before reuse.
+        """
+        response = get_conditional_response(request, etag=etag) or render()
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """
+        Conditional list: the ETag comes from one aggregate over the caller's
+        role query (latest updated_at and row count), so an unchanged list
+        costs that query and a 304 instead of a page query and serialization.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        validator = queryset.order_by().aggregate(latest=Max('updated_at'), count=Count('id'))
+        etag = self._etag('list', request.user.id, request.GET.urlencode(), validator['latest'], validator['count'])
+        return self._conditional(request, etag, lambda: super(PurchaseRequestViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Conditional detail: the ETag covers the request row and its (prefetched) approval steps."""
+        instance = self.get_object()
+        steps_changed = max((step.updated_at for step in instance.approval_steps.all()), default=None)
+        etag = self._etag('detail', instance.pk, instance.updated_at, steps_changed)
+        return self._conditional(request, etag, lambda: Response(self.get_serializer(instance).data))
 
     def create(self, request, *args, **kwargs):
         """Override create to use WorkflowEngine service."""
@@ -94,11 +163,44 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_requests(self, request):
+        """
+        Bulk import for Staff: creates a request per row of a CSV or JSONL
+        file, owned by the caller, streamed and inserted in chunks.
+        Multipart: file=<requests.csv|.jsonl>, proformas=<proformas.zip>
+        (columns: title, description, amount, proforma = file name in the ZIP).
+        Returns the counts and the first REQUEST_IMPORT_MAX_ERRORS row errors.
+        """
+        if request.user.role != User.Role.STAFF:
+            return Response({"detail": "Only staff can import requests."}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"detail": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = upload.name.rsplit('.', 1)[-1].lower()
+        if fmt not in IMPORT_FORMATS:
+            return Response({"detail": "Upload a .csv or .jsonl file."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with ExitStack() as stack:
+            archive = None
+            if 'proformas' in request.FILES:
+                try:
+                    archive = stack.enter_context(zipfile.ZipFile(request.FILES['proformas']))
+                except zipfile.BadZipFile:
+                    return Response({"detail": "Proformas must be a ZIP archive."}, status=status.HTTP_400_BAD_REQUEST)
+            stream = stack.enter_context(open(upload.temporary_file_path(), 'rb'))
+            summary = RequestImport(request.user, archive).run(stream, fmt)
+        return Response(summary)
+
     @action(detail=True, methods=['patch'], url_path='review')
     def review_request(self, request, pk=None):
         """
         Endpoint for Approvers to Approve or Reject.
-        Body: { "action": "approve" | "reject", "comment": "..." }
+        Body: { "action": "approve" | "reject", "comment": "...", "version": 3 }
+        `version` is optional: the request version the approver saw. If the
+        request moved on since, or another approver acted first, the
+        answer is 409 Conflict.
         """
         obj = self.get_object()
         action_type = request.data.get('action')
@@ -110,23 +212,30 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        version = request.data.get('version')
+        if version is not None:
+            # Parsed like a serializer field: rejects JSON booleans, fractions and negatives
+            try:
+                version = serializers.IntegerField(min_value=0).run_validation(version)
+            except serializers.ValidationError:
+                return Response({"detail": "Invalid version."}, status=status.HTTP_400_BAD_REQUEST)
+
         # Determine approval level based on User Role
-        if request.user.role == User.Role.APPROVER_L1:
-            required_level = 1
-        elif request.user.role == User.Role.APPROVER_L2:
-            required_level = 2
-        else:
+        required_level = self._approval_level(request.user)
+        if required_level is None:
             return Response(
                 {"detail": "You are not an authorized approver."},
                 status=status.HTTP_403_FORBIDDEN
             )
         
         try:
-            # Find the specific approval step for this user level
-            step = obj.approval_steps.get(level=required_level)
+            # Find the specific approval step for this user level (and the level after it)
+            step = RequestQueryPlanner.with_next_level(obj.approval_steps.all()).get(level=required_level)
             
             # Call Service Layer to handle logic (DB updates, PDF generation)
-            WorkflowEngine.process_approval(step, request.user, action_type, comment)
+            WorkflowEngine.process_approval(
+                step, request.user, action_type, comment, version=version
+            )
             
             return Response({"detail": f"Request {action_type}ed successfully."})
             
@@ -138,6 +247,54 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'], url_path='bulk-review')
+    def bulk_review(self, request):
+        """
+        Endpoint for Approvers to Approve or Reject many requests at once.
+        Body: { "ids": [1, 2, ...], "action": "approve" | "reject", "comment": "..." }
+        Returns a per-item result for every requested id.
+        """
+        required_level = self._approval_level(request.user)
+        if required_level is None:
+            return Response(
+                {"detail": "You are not an authorized approver."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = BulkReviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        action_type = serializer.validated_data['action']
+
+        # Only requests visible to this approver may be reviewed
+        visible_ids = set(
+            self.get_queryset().filter(id__in=ids).values_list('id', flat=True).distinct()
+        )
+
+        outcome = WorkflowEngine.process_bulk_approval(
+            [pk for pk in ids if pk in visible_ids],
+            request.user,
+            required_level,
+            action_type,
+            serializer.validated_data['comment']
+        )
+
+        results = []
+        for pk in ids:
+            ok, detail = outcome.get(pk, (False, "Not found."))
+            results.append({"id": pk, "success": ok, "detail": detail})
+
+        return Response({
+            "processed": sum(1 for r in results if r['success']),
+            "failed": sum(1 for r in results if not r['success']),
+            "results": results
+        })
+
+    @staticmethod
+    def _approval_level(user):
+        """Approval level an approver acts on, or None for non-approvers."""
+        return ApprovalPolicy.current().level_of(user.role)
+
     @action(detail=True, methods=['post'], url_path='submit-receipt')
     def submit_receipt(self, request, pk=None):
         """Endpoint for Staff to upload receipt after approval."""
@@ -156,4 +313,158 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
         # Call Service Layer
         updated_req = WorkflowEngine.submit_receipt(obj, receipt)
         
-        return Response(PurchaseRequestSerializer(updated_req).data)
\ No newline at end of file
+        return Response(PurchaseRequestSerializer(updated_req).data)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_requests(self, request):
+        """
+        Finance audit export of the requests it can see, one flattened row
+        per request (see AuditExport), streamed.
+        Query: ?output=csv|xlsx|parquet&status=&since=YYYY-MM-DD&until=YYYY-MM-DD
+        (`since` and `until` bound the creation date, inclusive).
+        """
+        if request.user.role != User.Role.FINANCE:
+            return Response({"detail": "Only finance can export requests."}, status=status.HTTP_403_FORBIDDEN)
+
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({"detail": "Invalid output. Use 'csv', 'xlsx' or 'parquet'."}, status=status.HTTP_400_BAD_REQUEST)
+        if not AuditExport.available(output):
+            return Response({"detail": f"The {output} export is not available on this server."}, status=status.HTTP_400_BAD_REQUEST)
+        status_filter = request.query_params.get('status')
+        if status_filter and status_filter not in PurchaseRequest.Status.values:
+            return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = AuditExport.filter(
+                self.get_queryset(), status_filter,
+                request.query_params.get('since'), request.query_params.get('until')
+            )
+        except ValueError:
+            return Response({"detail": "Invalid date. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = streaming_response(request, AuditExport.stream(queryset, output), EXPORT_FORMATS[output][0])
+        response['Content-Disposition'] = f'attachment; filename="requests.{output}"'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='purchase-orders/export')
+    def export_purchase_orders(self, request):
+        """
+        Finance download of every PO approved in a month, streamed.
+        Query: ?month=YYYY-MM&bundle=zip|pdf (zip: the stored PO files;
+        pdf: one combined document, capped at PO_EXPORT_MAX_PDF_DOCUMENTS).
+        """
+        if request.user.role != User.Role.FINANCE:
+            return Response({"detail": "Only finance can export purchase orders."}, status=status.HTTP_403_FORBIDDEN)
+
+        month = request.query_params.get('month', '')
+        bundle = request.query_params.get('bundle', 'zip')
+        if bundle not in ('zip', 'pdf'):
+            return Response({"detail": "Invalid bundle. Use 'zip' or 'pdf'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = PurchaseOrderExport.for_month(self.get_queryset(), month)
+        except ValueError:
+            return Response({"detail": "Invalid month. Use YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+
+        count = queryset.count()
+        if not count:
+            return Response({"detail": "No purchase orders were approved in this month."}, status=status.HTTP_404_NOT_FOUND)
+        if bundle == 'pdf' and count > settings.PO_EXPORT_MAX_PDF_DOCUMENTS:
+            return Response(
+                {"detail": f"{count} purchase orders exceed the combined PDF limit of "
+                           f"{settings.PO_EXPORT_MAX_PDF_DOCUMENTS}; use bundle=zip."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if bundle == 'zip':
+            response = streaming_response(request, PurchaseOrderExport.stream_zip(queryset), 'application/zip')
+        else:
+            response = streaming_response(request, PurchaseOrderExport.stream_pdf(queryset), 'application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="purchase-orders-{month}.{bundle}"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='jobs')
+    def jobs(self, request, pk=None):
+        """Background job state for a request (polled by the frontend)."""
+        obj = self.get_object()
+        return Response(JobSerializer(obj.jobs.all(), many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='flags')
+    def flags(self, request, pk=None):
+        """Possible duplicates or split purchases of a request, for reviewers (see DuplicateDetector)."""
+        if request.user.role == User.Role.STAFF:
+            return Response({"detail": "Only reviewers can see detection flags."}, status=status.HTTP_403_FORBIDDEN)
+        obj = self.get_object()
+        return Response(RequestFlagSerializer(obj.flags.select_related('related'), many=True).data)
+
+
+class EventTicketView(APIView):
+    """Issues a single-use ticket for opening the events stream (see StreamTickets)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # The stream lasts as long as the access token the ticket was requested with
+        if request.auth is not None and 'exp' in request.auth:
+            stream_until = datetime.fromtimestamp(request.auth['exp'], tz=dt_timezone.utc)
+        else:
+            stream_until = timezone.now() + jwt_settings.ACCESS_TOKEN_LIFETIME
+        ticket = StreamTickets.issue(request.user, stream_until)
+        return Response(
+            {"ticket": ticket, "expires_in": settings.EVENTS_TICKET_TTL}, status=status.HTTP_201_CREATED
+        )
+
+
+async def request_events(request):
+    """
+    Server-sent events feed of request changes visible to the caller's role
+    (see RequestEvents). Clients refetch a request, or the list on a
+    'resync' event, instead of polling /api/requests/.
+
+    Needs an ASGI server. EventSource cannot send headers, so browsers
+    open it with a single-use ?ticket= from POST /api/events/ticket/;
+    other clients may send the access token in the Authorization header.
+    The stream ends when that access token expires, and a reconnect
+    needs a new ticket.
+    """
+    # 1. Authenticate from the header or a stream ticket, never a token in the URL
+    authenticator = ClaimsJWTAuthentication()
+    header = authenticator.get_header(request)
+    ticket = request.GET.get('ticket')
+    if header:
+        try:
+            token = authenticator.get_validated_token(authenticator.get_raw_token(header))
+            user = await sync_to_async(authenticator.get_user)(token)
+        except (InvalidToken, AuthenticationFailed) as exc:
+            return JsonResponse({"detail": str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        stream_until = token['exp']
+    elif ticket:
+        redeemed = await sync_to_async(StreamTickets.redeem)(ticket)
+        if redeemed is None:
+            return JsonResponse({"detail": "Invalid or expired stream ticket."}, status=status.HTTP_401_UNAUTHORIZED)
+        user, stream_until = redeemed[0], redeemed[1].timestamp()
+    else:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=status.HTTP_401_UNAUTHORIZED)
+
+    async def stream():
+        subscription = hub.subscribe(user, asyncio.get_running_loop())
+        try:
+            yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+            while True:
+                remaining = stream_until - time.time()
+                if remaining <= 0:
+                    return
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), min(settings.EVENTS_HEARTBEAT, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -6,6 +6,7 @@ import clsx from 'clsx';
 
 export default function Dashboard() {
   const [requests, setRequests] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
@@ -16,7 +17,8 @@ export default function Dashboard() {
   const fetchRequests = async () => {
     try {
       const res = await api.get('/requests/');
-      setRequests(res.data);
+      setRequests(res.data.results);
+      setNextPage(res.data.next);
     } catch (err) {
       console.error(err);
     } finally {
@@ -24,6 +26,17 @@ export default function Dashboard() {
     }
   };
 
+  // Cursor pagination: the API returns the absolute URL of the next page
+  const loadMore = async () => {
+    try {
+      const res = await api.get(nextPage);
+      setRequests(prev => [...prev, ...res.data.results]);
+      setNextPage(res.data.next);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
   const getStatusColor = (status) => {
     switch (status) {
       case 'APPROVED': return 'bg-emerald-100 text-emerald-700 border-emerald-200';
@@ -132,6 +145,14 @@ export default function Dashboard() {
                 </div>
               </div>
             ))}
+            {nextPage && (
+              <button
+                onClick={loadMore}
+                className="w-full p-4 text-indigo-600 font-bold text-sm hover:bg-indigo-50 transition-colors"
+              >
+                Load more
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -21,6 +21,15 @@ export default function RequestDetail() {
     fetchDetail();
   }, [id]);
 
+  // Poll while background jobs (AI extraction, PO rendering) are still running
+  const extractionRunning = ['PENDING', 'PROCESSING'].includes(request?.extraction_status);
+  const poRendering = ['QUEUED', 'RENDERING'].includes(request?.po_status);
+  useEffect(() => {
+    if (!extractionRunning && !poRendering) return;
+    const timer = setTimeout(fetchDetail, 2000);
+    return () => clearTimeout(timer);
+  }, [request, extractionRunning, poRendering]);
+
   const fetchDetail = async () => {
     try {
       const res = await api.get(`/requests/${id}/`);
@@ -107,7 +116,13 @@ export default function RequestDetail() {
             </div>
 
             {/* AI Insights Section */}
-            {request.ai_metadata && (
+            {extractionRunning && (
+              <div className="bg-gradient-to-br from-indigo-50 to-purple-50 rounded-2xl p-6 border border-indigo-100/50 flex items-center gap-2 animate-pulse">
+                <BrainCircuit className="w-5 h-5 text-indigo-600" />
+                <span className="font-bold text-indigo-900">AI Document Analysis in progress...</span>
+              </div>
+            )}
+            {request.extraction_status === 'COMPLETED' && request.ai_metadata && (
               <div className="bg-gradient-to-br from-indigo-50 to-purple-50 rounded-2xl p-6 border border-indigo-100/50">
                 <div className="flex items-center gap-2 mb-4">
                   <BrainCircuit className="w-5 h-5 text-indigo-600" />
@@ -154,6 +169,17 @@ export default function RequestDetail() {
                       <p className="text-xs text-slate-400">Original Upload</p>
                    </div>
                 </a>
+                {poRendering && (
+                  <div className="flex items-center gap-4 p-4 border border-slate-200 rounded-2xl bg-white min-w-[200px] animate-pulse">
+                    <div className="w-10 h-10 rounded-full bg-slate-100 flex items-center justify-center text-slate-400">
+                      <Download className="w-5 h-5" />
+                    </div>
+                    <div>
+                      <p className="text-sm font-bold text-slate-800">Generating PO...</p>
+                      <p className="text-xs text-slate-400">Available shortly</p>
+                    </div>
+                  </div>
+                )}
                 {request.purchase_order_doc && (
                   <a href={request.purchase_order_doc} target="_blank" rel="noreferrer" 
                       className="flex items-center gap-4 p-4 border border-emerald-200 bg-emerald-50/30 rounded-2xl hover:bg-emerald-50 transition-all hover:shadow-md min-w-[200px] group">